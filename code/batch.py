@@ -0,0 +1,268 @@
+#!/usr/bin/python3
+
+import argparse
+import glob
+import json
+import os
+import signal
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, wait
+from concurrent.futures.process import BrokenProcessPool
+
+import solver
+from bench import parse_config, load_manifest
+from dimacs import load_cnf, split_codec
+from pool import Pool, stop
+from stats import Stats
+from verify import verify
+
+# statuses of a finished job; jobs that ended with 'error' are retried on resume
+FINAL_STATUSES = ('SAT', 'NONSAT', 'UNKNOWN')
+
+# files in a directory or glob source that are not formulas: solutions, manifests and logs
+SKIPPED_SUFFIXES = ('_solution.txt', '.json', '.jsonl')
+
+def read_jobs(source):
+    '''Turns a job source into job dictionaries.
+    A source is a directory (every file in it), a glob pattern, a DIMACS file,
+    a JSONL file ('-' for stdin) with one job per line:
+    {"path", "id", "config", "timeout", "solution"}, only "path" required and
+    relative to the JSONL file, or a JSON manifest of bench.py (as written by
+    generator.py and randgen.py), whose files become jobs named after their
+    instances. Files of directories and glob patterns ending with one of
+    SKIPPED_SUFFIXES (compressed or not) are skipped.
+    :param source - string as given on the command line
+
+    :returns an iterator over job dictionaries
+    '''
+    if source == '-' or source.endswith('.jsonl'):
+        base = '' if source == '-' else os.path.dirname(source)
+        file_handle = sys.stdin if source == '-' else open(source, 'r')
+        try:
+            for line in file_handle:
+                if line.strip():
+                    job = json.loads(line)
+                    job['path'] = os.path.join(base, job['path'])
+                    yield job
+        finally:
+            if file_handle is not sys.stdin:
+                file_handle.close()
+        return
+    if source.endswith('.json'):
+        # generated instances without a file cannot be batch jobs
+        for instance in load_manifest(source):
+            if 'path' in instance:
+                yield {'path' : instance['path'], 'id' : instance.get('name', instance['path'])}
+        return
+    if os.path.isdir(source):
+        paths = sorted(os.path.join(source, name) for name in os.listdir(source))
+    else:
+        paths = sorted(glob.glob(source))
+    for path in paths:
+        if os.path.isfile(path) and not split_codec(path)[0].endswith(SKIPPED_SUFFIXES):
+            yield {'path' : path}
+
+def finished_jobs(file_name):
+    '''Returns the ids of the jobs with a final result in a results file.
+    A line cut short by a crash is ignored.
+    '''
+    done = set()
+    if not os.path.exists(file_name):
+        return done
+    with open(file_name, 'r') as file_handle:
+        for line in file_handle:
+            try:
+                result = json.loads(line)
+            except ValueError:
+                continue
+            if result.get('status') in FINAL_STATUSES:
+                done.add(result['id'])
+    return done
+
+def ends_with_newline(file_name):
+    '''Tells whether a non-empty file ends with a newline.'''
+    with open(file_name, 'rb') as file_handle:
+        file_handle.seek(-1, os.SEEK_END)
+        return file_handle.read(1) == b'\n'
+
+def solution_path(job, solution_dir):
+    '''Returns where the solution of a job goes: job["solution"] or <stem>_solution.txt in solution_dir.
+    The stem is the file name without its extension and that of a codec (a.cnf.gz has stem a).
+    '''
+    if 'solution' in job:
+        return job['solution']
+    stem = os.path.splitext(os.path.basename(split_codec(job['path'])[0]))[0]
+    return os.path.join(solution_dir, stem + '_solution.txt')
+
+def init_worker():
+    # the parent handles interrupts and terminates the workers
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+
+def solve_job(job, config, timeout, solution_dir):
+    '''Solves one job in a worker process.
+    The time limit is a stats.Stats time budget, so a job out of time ends
+    with status UNKNOWN and the worker moves on to the next job.
+    :param job - a job dictionary, see read_jobs
+    :param config - default configuration, see bench.parse_config
+    :param timeout - default time limit in seconds
+    :param solution_dir - directory of the solution files
+
+    :returns a result dictionary: id, path, status (SAT, NONSAT, UNKNOWN or error), reason,
+    seconds, parse_seconds, solution (path of the solution file), valid and stats
+    '''
+    result = {'id' : job['id'], 'path' : job['path'], 'status' : 'error', 'reason' : None,
+              'seconds' : None, 'parse_seconds' : None, 'solution' : None, 'valid' : None, 'stats' : None}
+    time_begin = time.perf_counter()
+    try:
+        config = parse_config(job.get('config', config))
+        stats = Stats(max_seconds=job.get('timeout', timeout))
+        flat = load_cnf(job['path'])
+        result['parse_seconds'] = time.perf_counter() - time_begin
+        sat, vals = solver.solve(flat.to_sets(), config['engine'], config['unit_prop'], config['purelit_elim'],
+                                 stats=stats, **config['options'])
+        result['stats'] = stats.as_dict()
+        if sat is solver.UNKNOWN:
+            result.update(status='UNKNOWN', reason=stats.reason)
+        else:
+            result['status'] = 'SAT' if sat else 'NONSAT'
+            if sat:
+                falsified, _ = verify(flat, vals)
+                result['valid'] = not falsified
+            result['solution'] = solution_path(job, solution_dir)
+            solver.make_solution_file(result['solution'], vals)
+    except Exception as exc:
+        result['reason'] = '{}: {}'.format(type(exc).__name__, exc)
+    result['seconds'] = time.perf_counter() - time_begin
+    return result
+
+def run_batch(jobs, out, workers=None, config=solver.DEFAULT_ENGINE, timeout=60, solution_dir='.',
+              order='completion', skip=(), log=None):
+    '''Solves the jobs with a bounded pool of worker processes and writes one JSON line per job.
+    Only a few jobs per worker are queued at a time, so job streams of any
+    length are read lazily. Each line is flushed as soon as it is written,
+    so a crashed run can be resumed by skipping the ids already written.
+    :param jobs - an iterable of job dictionaries, see read_jobs
+    :param out - file object the results are written to
+    :param workers - number of worker processes, os.cpu_count() if None
+    :param config - default configuration, see bench.parse_config
+    :param timeout - default time limit of a job in seconds
+    :param solution_dir - directory of the solution files
+    :param order - 'completion' writes results as jobs finish, 'input' in the order of the jobs
+    :param skip - ids of jobs not to run
+    :param log - function called with every result, None to stay silent
+
+    :returns a dictionary {status : number of jobs}
+    '''
+    workers = workers or os.cpu_count()
+    counts = {}
+    # results waiting for an earlier job when writing in input order
+    waiting = {}
+    next_index = 0
+    # indices of the jobs already resubmitted after a worker died
+    retried = {}
+
+    def write(result):
+        out.write(json.dumps(result) + '\n')
+        out.flush()
+        counts[result['status']] = counts.get(result['status'], 0) + 1
+        if log:
+            log(result)
+
+    def finish(index, result):
+        nonlocal next_index
+        if order == 'completion':
+            write(result)
+            return
+        waiting[index] = result
+        while next_index in waiting:
+            write(waiting.pop(next_index))
+            next_index += 1
+
+    todo = (job for job in jobs if job.setdefault('id', job['path']) not in skip)
+    todo = enumerate(todo)
+    executor = Pool(workers, initializer=init_worker)
+    pending = {}
+    try:
+        while True:
+            for index, job in todo:
+                pending[executor.submit(solve_job, job, config, timeout, solution_dir)] = (index, job)
+                if len(pending) >= 2 * workers:
+                    break
+            if not pending:
+                break
+            finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+            broken = []
+            for future in finished:
+                index, job = pending.pop(future)
+                try:
+                    result = future.result()
+                except BrokenProcessPool:
+                    broken.append((index, job))
+                    continue
+                finish(index, result)
+            if broken:
+                # a worker died (e.g. killed for memory), which takes the whole pool and all its jobs down;
+                # the jobs are retried once in a new pool, a job that dies again is recorded as an error
+                executor.shutdown(wait=True)
+                broken.extend(pending.values())
+                executor = Pool(workers, initializer=init_worker)
+                pending = {}
+                for index, job in broken:
+                    if retried.get(index):
+                        finish(index, {'id' : job['id'], 'path' : job['path'], 'status' : 'error', 'reason' : 'worker died'})
+                        continue
+                    retried[index] = True
+                    pending[executor.submit(solve_job, job, config, timeout, solution_dir)] = (index, job)
+    finally:
+        stop(executor)
+    return counts
+
+def main():
+    '''Main body of the program. Gets automatically called if this script is called from the command line.
+    '''
+    cli_parser = argparse.ArgumentParser(description='Solves many DIMACS files with a pool of worker processes.')
+    cli_parser.add_argument('sources', help='directory, glob pattern, DIMACS file, JSONL job file (- for stdin) or JSON manifest', metavar='source', nargs='+')
+    cli_parser.add_argument('-o', '--output', help='JSONL results file, results.jsonl by default', default='results.jsonl')
+    cli_parser.add_argument('-s', '--solution-dir', help='directory of the solution files, the directory of the results file by default')
+    cli_parser.add_argument('-c', '--config', help='default configuration, e.g. cdcl or dpll:nP (see bench.py)', default=solver.DEFAULT_ENGINE)
+    cli_parser.add_argument('-t', '--timeout', help='default time limit of a job in seconds, 60 by default', type=float, default=60)
+    cli_parser.add_argument('-j', '--jobs', help='number of worker processes, all CPUs by default', metavar='N', type=int)
+    cli_parser.add_argument('--order', help='write results as jobs finish (default) or in input order', choices=['completion', 'input'], default='completion')
+    cli_parser.add_argument('-r', '--resume', help='append to the results file, skipping jobs that already have a result', action='store_true')
+    cli_parser.add_argument('-q', '--quiet', help='do not print a line per job', action='store_true')
+    cli_args = cli_parser.parse_args()
+
+    parse_config(cli_args.config)
+    solution_dir = cli_args.solution_dir or os.path.dirname(cli_args.output) or '.'
+    os.makedirs(solution_dir, exist_ok=True)
+    skip = finished_jobs(cli_args.output) if cli_args.resume else set()
+    if skip:
+        print('Skipping {} jobs with results in {}'.format(len(skip), cli_args.output))
+    jobs = (job for source in cli_args.sources for job in read_jobs(source))
+
+    def log(result):
+        print('{:8} {:>10} {}{}'.format(result['status'],
+                                        '{:.3f} s'.format(result['seconds']) if result.get('seconds') is not None else '-',
+                                        result['id'], ' ({})'.format(result['reason']) if result.get('reason') else ''),
+              flush=True)
+
+    # SIGTERM stops the batch like Ctrl-C: finished results are kept for --resume
+    signal.signal(signal.SIGTERM, signal.default_int_handler)
+    time_begin = time.time()
+    with open(cli_args.output, 'a' if cli_args.resume else 'w') as out:
+        if out.tell() and not ends_with_newline(cli_args.output):
+            # the last line was cut short by a crash
+            out.write('\n')
+        try:
+            counts = run_batch(jobs, out, cli_args.jobs, cli_args.config, cli_args.timeout, solution_dir,
+                               cli_args.order, skip, None if cli_args.quiet else log)
+        except KeyboardInterrupt:
+            print('Interrupted, rerun with --resume to continue.')
+            sys.exit(130)
+    print('{} jobs in {:f} seconds: {}'.format(sum(counts.values()), time.time() - time_begin,
+                                               ', '.join('{} {}'.format(counts[status], status) for status in sorted(counts)) or '-'))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,253 @@
+#!/usr/bin/python3
+
+import argparse
+import json
+import multiprocessing as mp
+import os
+import platform
+import random as rd
+import resource
+import statistics
+import sys
+import time
+
+import solver
+from dimacs import load_cnf
+import generator
+import randgen
+from stats import Stats
+
+# instances from the test directories and small generated families
+DEFAULT_MANIFEST = [
+    {'name' : 'basic', 'path' : os.path.join('..', 'test', 'basic.txt')},
+    {'name' : 'trivial-nonsat', 'path' : os.path.join('..', 'test', 'trivial-nonsat.txt')},
+    {'name' : 'cbs-k3-n100', 'path' : os.path.join('..', 'test', 'CBS_k3_n100_m403_b10_0.cnf')},
+    {'name' : 'cla-37-53', 'path' : os.path.join('..', 'test', 'cla_37_53.txt')},
+    {'name' : 'cla-43-53', 'path' : os.path.join('..', 'test', 'cla_43_53.txt')},
+    {'name' : 'kar-97-103', 'path' : os.path.join('..', 'test', 'kar_97_103.txt')},
+    {'name' : 'colouring-3750', 'path' : os.path.join('..', 'test', '3750_141000_6133286406985140739.txt')},
+    {'name' : 'colouring-4000', 'path' : os.path.join('..', 'test', '4000_159410_-7349411764705733428.txt')},
+    {'name' : 'colouring-4350', 'path' : os.path.join('..', 'test', '4350_163507_-4336599675638513225.txt')},
+    {'name' : 'colouring-40v-4c-s1', 'family' : 'colouring', 'vertices' : 40, 'colours' : 4, 'seed' : 1},
+    {'name' : 'colouring-60v-5c-s2', 'family' : 'colouring', 'vertices' : 60, 'colours' : 5, 'seed' : 2},
+    {'name' : 'components-6x20v-6c-s1', 'family' : 'components', 'graphs' : 6, 'vertices' : 20, 'colours' : 6, 'seed' : 1},
+    {'name' : 'components-8x40v-9c-s1', 'family' : 'components', 'graphs' : 8, 'vertices' : 40, 'colours' : 9, 'seed' : 1},
+    {'name' : 'components-4x25v-5c-s1', 'family' : 'components', 'graphs' : 4, 'vertices' : 25, 'colours' : 5, 'seed' : 1},
+    {'name' : 'random-200v-800c-s1', 'family' : 'random', 'vars' : 200, 'clauses' : 800, 'size' : 3, 'seed' : 1},
+    {'name' : 'random-500v-2000c-s2', 'family' : 'random', 'vars' : 500, 'clauses' : 2000, 'size' : 4, 'seed' : 2},
+    {'name' : 'ksat-50v-213c-s1', 'family' : 'ksat', 'vars' : 50, 'clauses' : 213, 'size' : 3, 'seed' : 1},
+]
+
+def load_manifest(file_name):
+    '''Reads a manifest: a JSON list of instances.
+    An instance is either {"name", "path"} of a DIMACS or binary CNF file (relative to
+    the manifest) or {"name", "family", ...} of a generated formula, with
+    family "colouring" (vertices, colours, seed, optional symmetry and amo),
+    "components" (colouring of random graphs side by side: graphs, vertices,
+    colours, seed), "random" (vars, clauses, size, seed) or "ksat" (uniform
+    random k-SAT: vars, clauses, size, seed). The manifests written by
+    generator.py and randgen.py list files together with these fields.
+    :param file_name - path of the manifest
+
+    :returns a list of instance dictionaries
+    '''
+    with open(file_name, 'r') as file_handle:
+        instances = json.load(file_handle)
+    base = os.path.dirname(file_name)
+    for instance in instances:
+        if 'path' in instance:
+            instance['path'] = os.path.join(base, instance['path'])
+    return instances
+
+def load_instance(instance):
+    '''Returns the cnf of a manifest instance as a list of sets.'''
+    if 'path' in instance:
+        return load_cnf(instance['path']).to_sets()
+    rd.seed(instance['seed'])
+    if instance['family'] == 'colouring':
+        V, E = generator.generate_graph(instance['vertices'])
+        return generator.gen(V, E, instance['colours'], instance.get('symmetry'), instance.get('amo'))
+    if instance['family'] == 'components':
+        V, E = generator.disjoint_union([generator.generate_graph(instance['vertices']) for _ in range(instance['graphs'])])
+        return generator.gen(V, E, instance['colours'])
+    if instance['family'] == 'random':
+        return randgen.generate_cnf(instance['vars'], instance['clauses'], instance['size'])
+    if instance['family'] == 'ksat':
+        return randgen.generate_ksat(instance['vars'], instance['clauses'], instance['size'])
+    raise ValueError('unknown instance family {}'.format(instance['family']))
+
+def parse_config(spec):
+    '''Parses a configuration of the form engine[:option,...].
+    Options are nU (no unit propagation), nP (no pure literal elimination),
+    branch=NAME, phase_saving=on/off, components (solve the components
+    separately), split (dpll: also after every decision) and jobs=N (worker
+    processes for the components), e.g. "cdcl:branch=jw,nP" or "dpll:components,split".
+
+    :returns a dictionary with the keys name, engine, unit_prop, purelit_elim and options
+    '''
+    engine, _, rest = spec.partition(':')
+    if engine not in solver.ENGINES:
+        raise ValueError('unknown engine {}'.format(engine))
+    config = {'name' : spec, 'engine' : engine, 'unit_prop' : True, 'purelit_elim' : True, 'options' : {}}
+    for option in filter(None, rest.split(',')):
+        key, _, value = option.partition('=')
+        if key == 'nU':
+            config['unit_prop'] = False
+        elif key == 'nP':
+            config['purelit_elim'] = False
+        elif key == 'branch':
+            config['options']['branch'] = value
+        elif key == 'phase_saving':
+            config['options']['phase_saving'] = value == 'on'
+        elif key == 'components':
+            config['options']['components'] = True
+        elif key == 'split':
+            config['options']['split'] = True
+        elif key == 'jobs':
+            config['options']['workers'] = int(value)
+        else:
+            raise ValueError('unknown option {}'.format(option))
+    return config
+
+def run_child(instance, config, conn):
+    '''Runs one measurement in a fresh process and sends the record through conn.'''
+    cnf = load_instance(instance)
+    stats = Stats()
+    time_begin = time.time()
+    sat, vals = solver.solve(cnf, config['engine'], config['unit_prop'], config['purelit_elim'], stats=stats, **config['options'])
+    time_end = time.time()
+    conn.send({'status' : 'UNKNOWN' if sat is solver.UNKNOWN else 'SAT' if sat else 'NONSAT',
+               'valid' : solver.verify_solution(cnf, vals) if sat else None,
+               'seconds' : time_end - time_begin,
+               'peak_rss' : resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024,
+               'counters' : stats.as_dict()})
+    conn.close()
+
+def measure(instance, config, timeout):
+    '''Solves an instance in a separate process, killing it after timeout seconds.
+
+    :returns a record dictionary with status SAT, NONSAT, timeout or error
+    '''
+    ctx = mp.get_context('spawn')
+    receiver, sender = ctx.Pipe(duplex=False)
+    process = ctx.Process(target=run_child, args=(instance, config, sender))
+    time_begin = time.time()
+    process.start()
+    sender.close()
+    record = None
+    if receiver.poll(timeout):
+        try:
+            record = receiver.recv()
+        except EOFError:
+            pass
+    if process.is_alive():
+        process.terminate()
+    process.join()
+    if record is None:
+        timed_out = time.time() - time_begin >= timeout
+        record = {'status' : 'timeout' if timed_out else 'error', 'valid' : None,
+                  'seconds' : time.time() - time_begin, 'peak_rss' : None, 'counters' : {}}
+    record.update({'instance' : instance['name'], 'config' : config['name']})
+    return record
+
+def run(instances, configs, timeout=60, reps=1, log=sys.stdout):
+    '''Runs every configuration reps times on every instance.
+
+    :returns a result dictionary with the machine description and the list of records
+    '''
+    records = []
+    for instance in instances:
+        for config in configs:
+            for rep in range(reps):
+                record = measure(instance, config, timeout)
+                record['rep'] = rep
+                records.append(record)
+                if log:
+                    print('{:<24} {:<22} {:>3} {:<8} {:>10.3f} {:>10}'.format(
+                        instance['name'], config['name'], rep, record['status'], record['seconds'],
+                        '-' if record['peak_rss'] is None else '{:.1f}'.format(record['peak_rss'] / 2**20)), file=log, flush=True)
+    return {'created' : time.strftime('%Y-%m-%dT%H:%M:%S'), 'python' : platform.python_version(),
+            'platform' : platform.platform(), 'timeout' : timeout, 'reps' : reps, 'records' : records}
+
+def summarize(result):
+    '''Groups the records by (instance, config).
+
+    :returns a dictionary mapping (instance, config) to (statuses, median seconds)
+    '''
+    groups = {}
+    for record in result['records']:
+        groups.setdefault((record['instance'], record['config']), []).append(record)
+    return {key : ({record['status'] for record in records}, statistics.median(record['seconds'] for record in records))
+            for key, records in groups.items()}
+
+def compare(old, new, threshold=0.2, min_seconds=0.05):
+    '''Compares two result dictionaries.
+    A pair regresses if its median time grew by more than threshold (and
+    by at least min_seconds), if it newly timed out or failed, or if the
+    answer changed.
+
+    :returns a list of (instance, config, message) regressions
+    '''
+    old_summary = summarize(old)
+    new_summary = summarize(new)
+    regressions = []
+    for key, (statuses, seconds) in sorted(new_summary.items()):
+        if key not in old_summary:
+            continue
+        old_statuses, old_seconds = old_summary[key]
+        answers = {'SAT', 'NONSAT'}
+        if statuses & answers and old_statuses & answers and statuses & answers != old_statuses & answers:
+            regressions.append((*key, 'answer changed from {} to {}'.format('/'.join(sorted(old_statuses)), '/'.join(sorted(statuses)))))
+        elif statuses - answers and not old_statuses - answers:
+            regressions.append((*key, 'now {}'.format('/'.join(sorted(statuses - answers)))))
+        elif seconds > old_seconds * (1 + threshold) and seconds - old_seconds >= min_seconds:
+            regressions.append((*key, 'median {:.3f}s -> {:.3f}s (+{:.0%})'.format(old_seconds, seconds, seconds / old_seconds - 1)))
+    return regressions
+
+def main():
+    '''Main body of the program. Gets automatically called if this script is called from the command line.
+    '''
+    cli_parser = argparse.ArgumentParser(description='Benchmarks the solving engines and compares the results.')
+    commands = cli_parser.add_subparsers(dest='command', required=True)
+
+    run_parser = commands.add_parser('run', help='run the benchmark and write the results to a JSON file')
+    run_parser.add_argument('-m', '--manifest', help='JSON manifest of instances, the test directories and generated families by default')
+    run_parser.add_argument('-c', '--configs', help='configurations engine[:nU,nP,branch=NAME,phase_saving=on/off,components,split,jobs=N], dpll by default', nargs='+', default=['dpll'])
+    run_parser.add_argument('-t', '--timeout', help='seconds per run, 60 by default', type=float, default=60)
+    run_parser.add_argument('-r', '--reps', help='repetitions per instance and configuration, 1 by default', type=int, default=1)
+    run_parser.add_argument('-i', '--instances', help='only run the instances with these names', nargs='+')
+    run_parser.add_argument('-o', '--output', help='result file, bench_<time>.json by default')
+
+    compare_parser = commands.add_parser('compare', help='flag regressions between two result files')
+    compare_parser.add_argument('old', help='baseline result file')
+    compare_parser.add_argument('new', help='new result file')
+    compare_parser.add_argument('--threshold', help='relative slowdown counted as a regression, 0.2 by default', type=float, default=0.2)
+    compare_parser.add_argument('--min-seconds', help='smaller absolute slowdowns are ignored, 0.05 by default', type=float, default=0.05)
+    cli_args = cli_parser.parse_args()
+
+    if cli_args.command == 'run':
+        instances = load_manifest(cli_args.manifest) if cli_args.manifest else DEFAULT_MANIFEST
+        if cli_args.instances:
+            instances = [instance for instance in instances if instance['name'] in cli_args.instances]
+        configs = [parse_config(spec) for spec in cli_args.configs]
+        out_file_path = cli_args.output or 'bench_{}.json'.format(time.strftime('%Y%m%d_%H%M%S'))
+
+        print('{:<24} {:<22} {:>3} {:<8} {:>10} {:>10}'.format('instance', 'config', 'rep', 'status', 'seconds', 'RSS MiB'))
+        result = run(instances, configs, cli_args.timeout, cli_args.reps)
+        with open(out_file_path, 'w') as file_handle:
+            json.dump(result, file_handle, indent=1)
+        print('Results written to {}'.format(out_file_path))
+
+    else:
+        with open(cli_args.old, 'r') as file_handle:
+            old = json.load(file_handle)
+        with open(cli_args.new, 'r') as file_handle:
+            new = json.load(file_handle)
+        regressions = compare(old, new, cli_args.threshold, cli_args.min_seconds)
+        for instance, config, message in regressions:
+            print('REGRESSION {:<24} {:<22} {}'.format(instance, config, message))
+        print('{} regressions'.format(len(regressions)))
+        sys.exit(1 if regressions else 0)
+
+if __name__ == '__main__':
+    main()
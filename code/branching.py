@@ -0,0 +1,350 @@
+#!/usr/bin/python3
+
+class ActivityHeap:
+    '''Binary max-heap of variables ordered by a score list, with positions for increase-key.'''
+
+    def __init__(self, score, variables=()):
+        '''
+        :param score - a list of scores indexed by variable, shared with the heuristic
+        :param variables - the variables to insert
+        '''
+        self.score = score
+        self.heap = []
+        self.index = [-1] * len(score)
+        for var in variables:
+            self.insert(var)
+
+    def __len__(self):
+        return len(self.heap)
+
+    def __contains__(self, var):
+        return self.index[var] >= 0
+
+    def up(self, pos):
+        heap = self.heap
+        index = self.index
+        score = self.score
+        var = heap[pos]
+        while pos > 0:
+            parent = (pos - 1) >> 1
+            if score[heap[parent]] >= score[var]:
+                break
+            heap[pos] = heap[parent]
+            index[heap[pos]] = pos
+            pos = parent
+        heap[pos] = var
+        index[var] = pos
+
+    def down(self, pos):
+        heap = self.heap
+        index = self.index
+        score = self.score
+        var = heap[pos]
+        size = len(heap)
+        while True:
+            child = 2 * pos + 1
+            if child >= size:
+                break
+            if child + 1 < size and score[heap[child + 1]] > score[heap[child]]:
+                child += 1
+            if score[heap[child]] <= score[var]:
+                break
+            heap[pos] = heap[child]
+            index[heap[pos]] = pos
+            pos = child
+        heap[pos] = var
+        index[var] = pos
+
+    def insert(self, var):
+        if self.index[var] >= 0:
+            return
+        self.heap.append(var)
+        self.up(len(self.heap) - 1)
+
+    def increased(self, var):
+        '''Restores the heap order after the score of var went up.'''
+        if self.index[var] >= 0:
+            self.up(self.index[var])
+
+    def pop(self):
+        '''Removes and returns the variable with the highest score.'''
+        heap = self.heap
+        top = heap[0]
+        last = heap.pop()
+        self.index[top] = -1
+        if heap:
+            heap[0] = last
+            self.index[last] = 0
+            self.down(0)
+        return top
+
+
+class Heuristic:
+    '''Base class of the branching heuristics.
+
+    A heuristic is attached to a trail based engine (trail.TrailSolver and
+    its subclasses) and is told about new decision levels, backtracking and
+    conflicts, so that picking a branching literal never has to rescan the
+    formula. With phase saving, a variable is retried with the value it
+    had when it was last unassigned.
+    '''
+
+    # 1 tries True first, -1 tries False first
+    initial_phase = 1
+
+    def __init__(self, engine, phase_saving=True):
+        '''
+        :param engine - the trail based engine
+        :param phase_saving - flag to turn on/off phase saving, True by default
+        '''
+        self.engine = engine
+        self.phase_saving = phase_saving
+        self.phase = [self.initial_phase] * (engine.n_vars + 1)
+
+    def polarity(self, var):
+        return var if self.phase[var] > 0 else -var
+
+    def pick(self):
+        '''Returns the literal to branch on, 0 if there is nothing left to branch on.'''
+        raise NotImplementedError
+
+    def new_level(self):
+        '''Called before a decision opens a new decision level.'''
+        pass
+
+    def backtrack(self, level, lits):
+        '''Called when the literals lits (assigned above level) are undone.'''
+        if self.phase_saving:
+            phase = self.phase
+            for lit in lits:
+                phase[abs(lit)] = 1 if lit > 0 else -1
+
+    def bump(self, var):
+        '''Called for every variable taking part in a conflict.'''
+        pass
+
+    def decay(self):
+        '''Called once after every conflict.'''
+        pass
+
+    def grow(self, n_vars):
+        '''Called when the engine grows to n_vars variables.'''
+        self.phase.extend([self.initial_phase] * (n_vars + 1 - len(self.phase)))
+
+
+class FirstClause(Heuristic):
+    '''Branches on the first unassigned literal of the first unsatisfied clause, like solver.select_lit.
+
+    Clauses before the head are satisfied at the current decision level, so
+    the scan resumes at the head, which is saved at every decision level.
+    The literal is tried with the sign it has in the clause unless phase
+    saving remembers another value.
+    '''
+
+    def __init__(self, engine, phase_saving=False):
+        super().__init__(engine, phase_saving)
+        self.head = 0
+        self.head_lim = []
+        self.saved = [False] * (engine.n_vars + 1)
+
+    def pick(self):
+        clauses = self.engine.clauses
+        value = self.engine.value
+        head = self.head
+        while head < len(clauses):
+            clause = clauses[head]
+            branch_lit = 0
+            for lit in clause:
+                val = value[lit]
+                if val == 1:
+                    break
+                if val == 0 and branch_lit == 0:
+                    branch_lit = lit
+            else:
+                if branch_lit:
+                    self.head = head
+                    if self.saved[abs(branch_lit)]:
+                        return self.polarity(abs(branch_lit))
+                    return branch_lit
+            head += 1
+        self.head = head
+        return 0
+
+    def new_level(self):
+        self.head_lim.append(self.head)
+
+    def grow(self, n_vars):
+        super().grow(n_vars)
+        self.saved.extend([False] * (n_vars + 1 - len(self.saved)))
+
+    def backtrack(self, level, lits):
+        self.head = self.head_lim[level]
+        del self.head_lim[level:]
+        if self.phase_saving:
+            phase = self.phase
+            saved = self.saved
+            for lit in lits:
+                var = abs(lit)
+                phase[var] = 1 if lit > 0 else -1
+                saved[var] = True
+
+
+class ScoreOrder(Heuristic):
+    '''Branches on the unassigned variable with the highest score, kept in an ActivityHeap.
+
+    Assigned variables are dropped lazily when they reach the top of the
+    heap and put back when they are unassigned, so a pick costs
+    O(log n) amortised.
+    '''
+
+    def __init__(self, engine, phase_saving=True):
+        super().__init__(engine, phase_saving)
+        self.score = [0.0] * (engine.n_vars + 1)
+        self.init_scores()
+        self.heap = ActivityHeap(self.score, engine.order)
+
+    def init_scores(self):
+        '''Fills self.score and self.phase.'''
+        pass
+
+    def pick(self):
+        value = self.engine.value
+        heap = self.heap
+        while len(heap):
+            var = heap.pop()
+            if value[var] == 0:
+                return self.polarity(var)
+        return 0
+
+    def backtrack(self, level, lits):
+        phase = self.phase
+        heap = self.heap
+        phase_saving = self.phase_saving
+        for lit in lits:
+            var = abs(lit)
+            if phase_saving:
+                phase[var] = 1 if lit > 0 else -1
+            heap.insert(var)
+
+    def grow(self, n_vars):
+        old = len(self.score)
+        super().grow(n_vars)
+        self.score.extend([0.0] * (n_vars + 1 - old))
+        self.heap.index.extend([-1] * (n_vars + 1 - old))
+        for var in range(old, n_vars + 1):
+            self.heap.insert(var)
+
+    def input_clauses(self):
+        '''Clauses of the original formula: stored clauses plus the units.'''
+        yield from self.engine.clauses
+        for lit in self.engine.units:
+            yield (lit,)
+
+
+class VSIDS(ScoreOrder):
+    '''Variable state independent decaying sum: variables in recent conflicts are preferred.
+
+    Every variable in a conflict gets its activity bumped by an increment
+    that grows geometrically after each conflict, which is the same as
+    decaying all the other activities. Variables start with False.
+    '''
+
+    initial_phase = -1
+
+    def __init__(self, engine, phase_saving=True, decay_factor=0.95):
+        self.inc = 1.0
+        self.decay_factor = decay_factor
+        super().__init__(engine, phase_saving)
+
+    def bump(self, var):
+        score = self.score
+        score[var] += self.inc
+        if score[var] > 1e100:
+            for k in range(len(score)):
+                score[k] *= 1e-100
+            self.inc *= 1e-100
+        self.heap.increased(var)
+
+    def decay(self):
+        self.inc /= self.decay_factor
+
+
+class MOMS(ScoreOrder):
+    '''Maximum occurrences in clauses of minimum size, computed once on the input formula.
+
+    The score of a variable is (f(x) + f(-x)) * 2^4 + f(x) * f(-x), where f
+    counts occurrences in the shortest non-unit clauses.
+    '''
+
+    def init_scores(self):
+        clauses = [clause for clause in self.input_clauses() if len(clause) > 1]
+        if not clauses:
+            return
+        min_size = min(len(clause) for clause in clauses)
+        count = {}
+        for clause in clauses:
+            if len(clause) == min_size:
+                for lit in clause:
+                    count[lit] = count.get(lit, 0) + 1
+        for var in self.engine.order:
+            pos, neg = count.get(var, 0), count.get(-var, 0)
+            self.score[var] = (pos + neg) * 16 + pos * neg
+            self.phase[var] = 1 if pos >= neg else -1
+
+
+class JeroslowWang(ScoreOrder):
+    '''Two sided Jeroslow-Wang rule, computed once on the input formula.
+
+    J(l) sums 2^-|c| over the clauses c containing l; variables are ordered
+    by J(x) + J(-x) and tried with the sign of the larger side.
+    '''
+
+    def init_scores(self):
+        weight = {}
+        for clause in self.input_clauses():
+            w = 2.0 ** -len(clause)
+            for lit in clause:
+                weight[lit] = weight.get(lit, 0.0) + w
+        for var in self.engine.order:
+            pos, neg = weight.get(var, 0.0), weight.get(-var, 0.0)
+            self.score[var] = pos + neg
+            self.phase[var] = 1 if pos >= neg else -1
+
+
+class DLIS(ScoreOrder):
+    '''Dynamic largest individual sum, with the literal counts taken once on the input formula.
+
+    The variable with the most frequent literal is tried with that literal
+    first.
+    '''
+
+    def init_scores(self):
+        count = {}
+        for clause in self.input_clauses():
+            for lit in clause:
+                count[lit] = count.get(lit, 0) + 1
+        for var in self.engine.order:
+            pos, neg = count.get(var, 0), count.get(-var, 0)
+            self.score[var] = max(pos, neg)
+            self.phase[var] = 1 if pos >= neg else -1
+
+
+HEURISTICS = {
+    'first' : FirstClause,
+    'vsids' : VSIDS,
+    'moms' : MOMS,
+    'jw' : JeroslowWang,
+    'dlis' : DLIS,
+}
+
+def make_heuristic(name, engine, phase_saving=None):
+    '''Creates a registered heuristic for an engine.
+    :param name - name of the heuristic in HEURISTICS
+    :param engine - the trail based engine
+    :param phase_saving - flag to turn on/off phase saving, None for the heuristic's default
+
+    :returns the heuristic object
+    '''
+    if phase_saving is None:
+        return HEURISTICS[name](engine)
+    return HEURISTICS[name](engine, phase_saving)
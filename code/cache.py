@@ -0,0 +1,130 @@
+#!/usr/bin/python3
+
+import hashlib
+import json
+import os
+import time
+
+# a fixed place, so running the tools from another directory neither misses the cache nor leaves one behind
+CACHE_PATH = os.path.join(os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache'), 'sat_solver')
+
+# default size limit of the cache directory in bytes
+DEFAULT_MAX_BYTES = 64 * 2**20
+
+def fingerprint(cnf):
+    '''Returns a canonical fingerprint of a formula.
+    Every clause is reduced to its sorted distinct literals and the clauses
+    are sorted (duplicates dropped), so the order of clauses and of literals
+    within clauses does not matter. The fingerprint is the SHA-256 of that
+    normalized formula written out as DIMACS clauses, which is the same in
+    every process, unlike the salted built-in hash.
+    :param cnf - an iterable of disjunctions (iterables of literals)
+
+    :returns a string of 64 hexadecimal digits
+    '''
+    clauses = sorted({tuple(sorted(set(dis))) for dis in cnf})
+    digest = hashlib.sha256()
+    for clause in clauses:
+        digest.update((' '.join(map(str, clause)) + ' 0\n').encode('ascii'))
+    return digest.hexdigest()
+
+class ResultCache:
+    '''On-disk cache of solver results keyed by formula fingerprint.
+
+    Every entry is a small JSON file holding the answer, the model and the
+    search counters. Reading an entry marks it as recently used (its
+    modification time); when the directory grows past max_bytes the least
+    recently used entries are deleted.
+    '''
+
+    def __init__(self, path=CACHE_PATH, max_bytes=DEFAULT_MAX_BYTES):
+        '''
+        :param path - the cache directory, created if missing
+        :param max_bytes - size limit of all entries together
+        '''
+        self.path = path
+        self.max_bytes = max_bytes
+        os.makedirs(path, exist_ok=True)
+
+    def entry_path(self, key):
+        return os.path.join(self.path, key + '.json')
+
+    def get(self, key):
+        '''Looks up a fingerprint.
+
+        :returns None if the formula is not cached, otherwise a dictionary with
+        sat (boolean), vals (a dictionary {variable : boolean}, None if sat is False),
+        seconds (solving time when it was cached) and stats (the counters or None)
+        '''
+        path = self.entry_path(key)
+        try:
+            with open(path, 'r') as file_handle:
+                entry = json.load(file_handle)
+            os.utime(path)
+        except (OSError, ValueError):
+            return None
+        model = entry['model']
+        entry['vals'] = {abs(lit) : lit > 0 for lit in model} if model is not None else None
+        return entry
+
+    def put(self, key, sat, vals, seconds=None, stats=None):
+        '''Stores a result (only SAT and NONSAT answers belong here) and evicts old entries if needed.
+        :param key - the fingerprint of the formula
+        :param sat - boolean denoting the satisfiability of the formula
+        :param vals - a dictionary {variable : boolean}, None if sat is False
+        :param seconds - solving time
+        :param stats - a dictionary of counters (e.g. Stats.as_dict()), None by default
+        '''
+        model = sorted((var if value else -var for var, value in vals.items()), key=abs) if sat else None
+        entry = {'sat' : bool(sat), 'model' : model, 'seconds' : seconds, 'stats' : stats, 'created' : time.time()}
+        # written under a temporary name first, so readers never see half an entry
+        path = self.entry_path(key)
+        temp_path = '{}.{}.tmp'.format(path, os.getpid())
+        with open(temp_path, 'w') as file_handle:
+            json.dump(entry, file_handle)
+        os.replace(temp_path, path)
+        self.evict()
+
+    def evict(self):
+        '''Deletes the least recently used entries until the cache fits in max_bytes.'''
+        entries = []
+        total = 0
+        with os.scandir(self.path) as scan:
+            for dir_entry in scan:
+                if dir_entry.name.endswith('.json'):
+                    stat = dir_entry.stat()
+                    entries.append((stat.st_mtime, stat.st_size, dir_entry.path))
+                    total += stat.st_size
+        if total <= self.max_bytes:
+            return
+        for _, size, path in sorted(entries):
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+            if total <= self.max_bytes:
+                break
+
+def solve_cached(result_cache, key, solve):
+    '''Takes the result of a formula from the cache, or solves it and caches the answer.
+    :param result_cache - a ResultCache, None to always solve
+    :param key - the fingerprint of the formula
+    :param solve - function without arguments returning (sat, vals, stats), stats a dictionary or None;
+    UNKNOWN (None) answers are not cached
+
+    :returns sat - True, False or UNKNOWN
+    :returns vals - a dictionary containing one satisfiable valuation, None if sat is not True
+    :returns seconds - the solving time (from when it was cached on a hit)
+    :returns hit - True if the result came from the cache
+    '''
+    if result_cache is not None:
+        entry = result_cache.get(key)
+        if entry is not None:
+            return entry['sat'], entry['vals'], entry['seconds'], True
+    time_begin = time.time()
+    sat, vals, stats = solve()
+    seconds = time.time() - time_begin
+    if result_cache is not None and sat is not None:
+        result_cache.put(key, sat, vals, seconds, stats)
+    return sat, vals, seconds, False
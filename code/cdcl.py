@@ -0,0 +1,282 @@
+#!/usr/bin/python3
+
+import time
+
+from trail import TrailSolver, stats_phase
+
+def luby(i):
+    '''Returns the i-th element (starting with 0) of the Luby sequence 1 1 2 1 1 2 4 1 1 2 ...'''
+    size, seq = 1, 0
+    while size < i + 1:
+        seq += 1
+        size = 2 * size + 1
+    while size - 1 != i:
+        size = (size - 1) >> 1
+        seq -= 1
+        i = i % size
+    return 1 << seq
+
+
+class CDCLSolver(TrailSolver):
+    '''Conflict driven clause learning on top of the trail engine.
+
+    Conflicts are analysed up to the first unique implication point, the
+    learned clause is added to the database and the search jumps back to
+    the second highest decision level of that clause. The search restarts
+    on a Luby schedule and periodically deletes half of the learned
+    clauses, worst literal block distance (LBD) first.
+    '''
+
+    default_branch = 'vsids'
+
+    def __init__(self, cnf, unit_prop=True, purelit_elim=True, branch=None, phase_saving=None,
+                 restart_base=100, reduce_base=2000, reduce_inc=300):
+        '''Builds the clause database, see TrailSolver.
+        :param cnf - a list of sets (each set one disjunction)
+        :param unit_prop - ignored, conflict analysis needs unit propagation
+        :param purelit_elim - flag to turn on/off pure literal elimination (done once at the root), True by default
+        :param branch - name of the branching heuristic in branching.HEURISTICS, 'vsids' if None
+        :param phase_saving - flag to turn on/off phase saving, None for the heuristic's default
+        :param restart_base - number of conflicts in one unit of the Luby restart schedule
+        :param reduce_base - number of conflicts before the first learned clause deletion
+        :param reduce_inc - increment of the deletion interval after every deletion
+        '''
+        super().__init__(cnf, True, purelit_elim, branch, phase_saving)
+        self.restart_base = restart_base
+        self.reduce_base = reduce_base
+        self.reduce_inc = reduce_inc
+
+        self.learnts = []
+        self.learnt_lbd = []
+        self.marked = [False] * (self.n_vars + 1)
+
+        self.restarts = 0
+        self.learned = 0
+        self.deleted = 0
+        # the assumptions responsible for the last unsatisfiable answer
+        self.failed = []
+
+    def grow(self, n_vars):
+        self.marked.extend([False] * (n_vars + 1 - len(self.marked)))
+        super().grow(n_vars)
+
+    def analyze(self, conflict):
+        '''First UIP conflict analysis.
+        :param conflict - the clause falsified by the current assignment
+
+        :returns learnt - the learned clause, asserting literal first and the literal of the backjump level second
+        :returns back_level - the decision level to jump back to
+        '''
+        marked = self.marked
+        level = self.level
+        reason = self.reason
+        trail = self.trail
+        cur_level = self.decision_level()
+
+        learnt = [0]
+        counter = 0
+        idx = len(trail) - 1
+        clause = conflict
+        start = 0
+        while True:
+            for k in range(start, len(clause)):
+                lit = clause[k]
+                var = abs(lit)
+                if not marked[var] and level[var] > 0:
+                    marked[var] = True
+                    self.heuristic.bump(var)
+                    if level[var] >= cur_level:
+                        counter += 1
+                    else:
+                        learnt.append(lit)
+            # next marked literal on the trail
+            while not marked[abs(trail[idx])]:
+                idx -= 1
+            lit = trail[idx]
+            idx -= 1
+            var = abs(lit)
+            marked[var] = False
+            counter -= 1
+            if counter == 0:
+                break
+            clause = reason[var]
+            # the implied literal of a reason clause is always its first literal
+            start = 1
+        learnt[0] = -lit
+
+        # drop literals implied by the other literals of the clause
+        kept = [learnt[0]]
+        for lit in learnt[1:]:
+            clause = reason[abs(lit)]
+            if clause is None or not all(marked[abs(q)] or level[abs(q)] == 0 for q in clause[1:]):
+                kept.append(lit)
+        for lit in learnt[1:]:
+            marked[abs(lit)] = False
+        learnt = kept
+
+        back_level = 0
+        if len(learnt) > 1:
+            best = 1
+            for k in range(2, len(learnt)):
+                if level[abs(learnt[k])] > level[abs(learnt[best])]:
+                    best = k
+            learnt[1], learnt[best] = learnt[best], learnt[1]
+            back_level = level[abs(learnt[1])]
+        return learnt, back_level
+
+    def analyze_final(self, lit):
+        '''Finds the assumptions that force an assumption to be false.
+        Every decision below the current level is an assumption, so they are
+        the assignments without a reason reached backwards from lit.
+        :param lit - the assumption made false by the assignments on the trail
+
+        :returns the list of the assumptions responsible, lit included
+        '''
+        failed = [lit]
+        var = abs(lit)
+        if self.level[var] == 0:
+            return failed
+        marked = self.marked
+        level = self.level
+        reason = self.reason
+        trail = self.trail
+        marked[var] = True
+        for idx in range(len(trail) - 1, self.trail_lim[0] - 1, -1):
+            var = abs(trail[idx])
+            if not marked[var]:
+                continue
+            marked[var] = False
+            clause = reason[var]
+            if clause is None:
+                failed.append(trail[idx])
+                continue
+            for q in clause[1:]:
+                if level[abs(q)] > 0:
+                    marked[abs(q)] = True
+        return failed
+
+    def lbd(self, clause):
+        '''Returns the literal block distance (number of distinct decision levels) of a clause.'''
+        level = self.level
+        return len({level[abs(lit)] for lit in clause})
+
+    def learn(self, learnt):
+        '''Adds the learned clause after backjumping and asserts its first literal.'''
+        self.learned += 1
+        if len(learnt) == 1:
+            self.enqueue(learnt[0])
+            return
+        self.watches[learnt[0]].append(learnt)
+        self.watches[learnt[1]].append(learnt)
+        self.learnts.append(learnt)
+        self.learnt_lbd.append(self.lbd(learnt))
+        self.enqueue(learnt[0], learnt)
+
+    def reduce_db(self):
+        '''Deletes half of the learned clauses, highest LBD first.
+
+        Glue clauses (LBD at most 2) and clauses that are the reason of a
+        current assignment are always kept.
+        '''
+        value = self.value
+        reason = self.reason
+        order = sorted(range(len(self.learnts)), key=lambda k : -self.learnt_lbd[k])
+        limit = len(order) // 2
+        dead = set()
+        for k in order:
+            if len(dead) >= limit:
+                break
+            clause = self.learnts[k]
+            if self.learnt_lbd[k] <= 2:
+                break
+            if value[clause[0]] == 1 and reason[abs(clause[0])] is clause:
+                continue
+            dead.add(id(clause))
+        if not dead:
+            return
+        keep = [k for k in range(len(self.learnts)) if id(self.learnts[k]) not in dead]
+        self.learnts = [self.learnts[k] for k in keep]
+        self.learnt_lbd = [self.learnt_lbd[k] for k in keep]
+        for ws in self.watches:
+            if ws:
+                ws[:] = [clause for clause in ws if id(clause) not in dead]
+        self.deleted += len(dead)
+
+    def solve(self, assumptions=()):
+        '''CDCL search with backjumping, restarts and learned clause deletion.
+        :param assumptions - literals decided True (in this order) before any other decision
+
+        :returns sat - boolean denoting the satisfiability of the formula under the assumptions
+        :returns vals - a dictionary containing one satisfiable valuation, None if sat is False
+        (self.failed then holds the assumptions responsible, empty if the formula itself is unsatisfiable)
+        '''
+        self.failed = []
+        self.backtrack(0)
+        # a conflict at the root holds for good, also for later calls
+        if not self.simplify_root():
+            self.empty = True
+            return False, None
+
+        restart_limit = luby(self.restarts) * self.restart_base
+        restart_conflicts = 0
+        reduce_limit = self.reduce_base
+        reduce_conflicts = 0
+        stats = self.stats
+        if stats is not None:
+            mark = time.perf_counter()
+        while True:
+            conflict = self.propagate()
+            if stats is not None:
+                mark = stats_phase(stats, 'propagate', mark)
+                stats.propagations = self.propagations
+                stats.tick()
+            if conflict is not None:
+                if stats is not None:
+                    stats.conflict()
+                if self.decision_level() == 0:
+                    self.empty = True
+                    return False, None
+                learnt, back_level = self.analyze(conflict)
+                self.backtrack(back_level)
+                self.learn(learnt)
+                self.heuristic.decay()
+
+                restart_conflicts += 1
+                reduce_conflicts += 1
+                if reduce_conflicts >= reduce_limit:
+                    reduce_conflicts = 0
+                    reduce_limit += self.reduce_inc
+                    self.reduce_db()
+                if restart_conflicts >= restart_limit:
+                    restart_conflicts = 0
+                    self.restarts += 1
+                    restart_limit = luby(self.restarts) * self.restart_base
+                    self.backtrack(0)
+                if stats is not None:
+                    mark = stats_phase(stats, 'analyze', mark)
+                continue
+
+            # every assumption gets its own decision level, even when it is already true
+            lit = 0
+            while self.decision_level() < len(assumptions):
+                assumption = assumptions[self.decision_level()]
+                if self.value[assumption] == -1:
+                    self.failed = self.analyze_final(assumption)
+                    return False, None
+                self.new_decision_level()
+                if self.value[assumption] == 0:
+                    lit = assumption
+                    break
+            if lit != 0:
+                self.enqueue(lit)
+                continue
+
+            lit = self.pick_branch_lit()
+            if lit == 0:
+                return True, self.model()
+            self.decisions += 1
+            self.new_decision_level()
+            self.enqueue(lit)
+            if stats is not None:
+                stats.decision(self.decision_level())
+                mark = stats_phase(stats, 'branching', mark)
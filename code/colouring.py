@@ -0,0 +1,211 @@
+#!/usr/bin/python3
+
+import argparse
+import time
+
+import solver
+from dimacs import open_file
+from generator import AMO_ENCODINGS, SYMMETRY_BREAKING, gen, greedy_clique, dsatur, chromatic_number, random_graph
+from stats import Stats, BudgetExhausted
+
+def read_graph(file_handle):
+    '''Reads a graph line by line, in the DIMACS .col format ("p edge N M" and
+    "e U V" lines) or as an edge list (one "U V" pair per line, any labels).
+    Comment lines start with # or %, or with c before the first edge of an
+    edge list (after that c can be a vertex). Duplicate edges are dropped.
+    :param file_handle - a file opened in text mode
+
+    :returns V - the vertices, numbered from 1
+    :returns E - a list of edges (i, j) with i < j
+    :returns names - the label of every vertex of an edge list ({vertex : label}), None for a .col file
+    '''
+    n_ver = 0
+    labels = {}
+    edges = set()
+    for line in file_handle:
+        tokens = line.split()
+        if not tokens or (tokens[0] == 'c' and not labels) or tokens[0][0] in '#%':
+            continue
+        if tokens[0] == 'p':
+            # p edge N M (some files write col instead of edge)
+            n_ver = int(tokens[2])
+            labels = None
+            continue
+        if tokens[0] == 'e':
+            tokens = tokens[1:]
+        if labels is None:
+            i, j = int(tokens[0]), int(tokens[1])
+        else:
+            i = labels.setdefault(tokens[0], len(labels) + 1)
+            j = labels.setdefault(tokens[1], len(labels) + 1)
+        if i == j:
+            raise ValueError('vertex {} is adjacent to itself and cannot be coloured'.format(tokens[0]))
+        edges.add((i, j) if i < j else (j, i))
+    if labels is None:
+        n_ver = max(n_ver, max((j for _, j in edges), default=0))
+        names = None
+    else:
+        n_ver = len(labels)
+        names = {i : label for label, i in labels.items()}
+    return [*range(1, n_ver + 1)], sorted(edges), names
+
+def load_graph(file_name):
+    '''Reads a graph file, compressed or not, see read_graph.'''
+    with open_file(file_name, 'r') as file_handle:
+        return read_graph(file_handle)
+
+def write_graph(V, E, file_name, comment=''):
+    '''Writes a graph in the DIMACS .col format, compressed if the name ends with one of dimacs.CODECS.'''
+    lines = ['c ' + line for line in comment.splitlines()]
+    lines.append('p edge {} {}'.format(len(V), len(E)))
+    lines.extend('e {} {}'.format(i, j) for i, j in E)
+    with open_file(file_name, 'w') as file_handle:
+        file_handle.write('\n'.join(lines) + '\n')
+
+def decode_colouring(vals, V, k):
+    '''Reads the colouring out of a model of gen(V, E, k).
+    A vertex gets its smallest colour whose variable is true, or else one the
+    model leaves unassigned (it can be made true without breaking a clause).
+    :param vals - a dictionary {variable : boolean}
+    :param V - set of vertices
+    :param k - number of colours of the formula
+
+    :returns colouring - a dictionary {vertex : colour}, vertices without a colour left out
+    '''
+    colouring = {}
+    for i in V:
+        base = (i - 1) * k
+        colour = next((j for j in range(1, k + 1) if vals.get(base + j)), None)
+        if colour is None:
+            colour = next((j for j in range(1, k + 1) if base + j not in vals), None)
+        if colour is not None:
+            colouring[i] = colour
+    return colouring
+
+def check_colouring(V, E, colouring, k=None):
+    '''Checks a colouring against the edges.
+    :param V - set of vertices
+    :param E - set of edges
+    :param colouring - a dictionary {vertex : colour}
+    :param k - number of colours allowed (1 to k), None for any
+
+    :returns conflicts - a list of edges whose ends share a colour
+    :returns uncoloured - a list of vertices without an allowed colour
+    '''
+    conflicts = [(i, j) for i, j in E if i in colouring and colouring[i] == colouring.get(j)]
+    uncoloured = [i for i in V if i not in colouring or (k is not None and not 1 <= colouring[i] <= k)]
+    return conflicts, uncoloured
+
+def colour_bounds(V, E):
+    '''Bounds the chromatic number without a solver.
+
+    :returns lower - the size of a greedy clique
+    :returns upper - the number of colours of a DSATUR colouring
+    :returns colouring - that DSATUR colouring
+    '''
+    colouring = dsatur(V, E)
+    return len(greedy_clique(V, E)), max(colouring.values(), default=0), colouring
+
+def colour(V, E, k, engine=solver.DEFAULT_ENGINE, symmetry='clique', amo=None, stats=None, bounds=None, **options):
+    '''Finds a k-colouring of the graph (V, E).
+    The clique and DSATUR bounds settle the easy cases without a solver: a
+    DSATUR colouring with at most k colours is returned as it is, and a clique
+    of more than k vertices means there is none. Otherwise the formula is built
+    in memory (gen) and solved, and the model is decoded and checked.
+    :param V - set of vertices
+    :param E - set of edges
+    :param k - number of colours
+    :param engine - name of the engine in solver.ENGINES
+    :param symmetry - colour symmetry breaking of gen, clique by default
+    :param amo - at-most-one encoding of gen, None by default
+    :param stats - a stats.Stats object, also holding the budgets, None by default
+    :param bounds - the result of colour_bounds if it is known already, None to compute it
+    :param options - keyword arguments of solver.solve
+
+    :returns sat - True, False or solver.UNKNOWN if a budget ran out
+    :returns colouring - a dictionary {vertex : colour}, None if sat is not True
+    :returns method - how the answer was found: dsatur, clique or solver
+    '''
+    lower, upper, colouring = bounds or colour_bounds(V, E)
+    if upper <= k:
+        return True, colouring, 'dsatur'
+    if lower > k:
+        return False, None, 'clique'
+    cnf = gen(V, E, k, symmetry, amo)
+    sat, vals = solver.solve(cnf, engine, True, True, stats=stats, **options)
+    if not sat:
+        return sat, None, 'solver'
+    colouring = decode_colouring(vals, V, k)
+    conflicts, uncoloured = check_colouring(V, E, colouring, k)
+    if conflicts or uncoloured:
+        raise RuntimeError('the model is not a colouring: {} conflicting edges, {} uncoloured vertices'.format(len(conflicts), len(uncoloured)))
+    return True, colouring, 'solver'
+
+def write_colouring(file_name, colouring, names=None):
+    '''Writes one "vertex colour" line per vertex, with the labels of the input file if there are any.'''
+    lines = ['{} {}'.format(names[i] if names else i, colouring[i]) for i in sorted(colouring)]
+    with open_file(file_name, 'w') as file_handle:
+        file_handle.write('\n'.join(lines) + '\n')
+
+def main():
+    '''Main body of the program. Gets automatically called if this script is called from the command line.
+    '''
+    cli_parser = argparse.ArgumentParser()
+    cli_parser.add_argument('graph', help='graph file, DIMACS .col or edge list, may be compressed', nargs='?')
+    cli_parser.add_argument('-g', '--random', help='colour a G(N, P) random graph instead of a file', metavar=('N', 'P'), nargs=2)
+    cli_parser.add_argument('--seed', help='seed of the random graph', type=int)
+    cli_parser.add_argument('-k', '--colours', help='number of colours, the chromatic number is searched for if not given', type=int)
+    cli_parser.add_argument('-e', '--engine', help='solving engine, {} by default'.format(solver.DEFAULT_ENGINE), choices=solver.ENGINES, default=solver.DEFAULT_ENGINE)
+    cli_parser.add_argument('-s', '--symmetry', help='colour symmetry breaking, clique by default', choices=SYMMETRY_BREAKING, default='clique')
+    cli_parser.add_argument('-a', '--amo', help='at-most-one-colour-per-vertex encoding', choices=AMO_ENCODINGS)
+    cli_parser.add_argument('-t', '--time-budget', help='give up with UNKNOWN after SECONDS', metavar='SECONDS', type=float)
+    cli_parser.add_argument('-d', '--decision-budget', help='give up with UNKNOWN after N decisions', metavar='N', type=int)
+    cli_parser.add_argument('-o', '--output', help='write the colouring to a file, one "vertex colour" line per vertex', metavar='output-file')
+    cli_parser.add_argument('-w', '--write-graph', help='write the graph to a DIMACS .col file', metavar='graph-file')
+    cli_args = cli_parser.parse_args()
+    if (cli_args.graph is None) == (cli_args.random is None):
+        cli_parser.error('give either a graph file or --random N P')
+
+    time_begin = time.time()
+    if cli_args.graph:
+        V, E, names = load_graph(cli_args.graph)
+    else:
+        V, E = random_graph(int(cli_args.random[0]), float(cli_args.random[1]), cli_args.seed)
+        names = None
+    print('Graph: {} vertices, {} edges ({:f} seconds)'.format(len(V), len(E), time.time() - time_begin))
+    if cli_args.write_graph:
+        write_graph(V, E, cli_args.write_graph, 'G({}, {}) seed {}'.format(*cli_args.random, cli_args.seed) if cli_args.random else '')
+
+    time_begin = time.time()
+    bounds = colour_bounds(V, E)
+    lower, upper, _ = bounds
+    print('Bounds: clique {}, DSATUR {} ({:f} seconds)'.format(lower, upper, time.time() - time_begin))
+
+    stats = None
+    if cli_args.time_budget or cli_args.decision_budget:
+        stats = Stats(max_seconds=cli_args.time_budget, max_decisions=cli_args.decision_budget)
+    time_begin = time.time()
+    if cli_args.colours is None:
+        try:
+            k, colouring, calls = chromatic_number(V, E, stats)
+        except BudgetExhausted as exc:
+            print('UNKNOWN ({}) after {:f} seconds'.format(exc.reason, time.time() - time_begin))
+            return
+        print('Chromatic number: {} ({} incremental calls, {:f} seconds)'.format(k, calls, time.time() - time_begin))
+    else:
+        k = cli_args.colours
+        sat, colouring, method = colour(V, E, k, cli_args.engine, cli_args.symmetry, cli_args.amo, stats, bounds)
+        if sat is solver.UNKNOWN:
+            print('UNKNOWN ({}) after {:f} seconds'.format(stats.reason, time.time() - time_begin))
+            return
+        print('{}-colourable: {} (decided by {}, {:f} seconds)'.format(k, 'yes' if sat else 'no', method, time.time() - time_begin))
+    if colouring is not None:
+        conflicts, uncoloured = check_colouring(V, E, colouring, k)
+        print('Colouring checked: {}'.format('valid' if not conflicts and not uncoloured else
+                                              '{} conflicting edges, {} uncoloured vertices'.format(len(conflicts), len(uncoloured))))
+        if cli_args.output:
+            write_colouring(cli_args.output, colouring, names)
+            print('Colouring written to {}'.format(cli_args.output))
+
+if __name__ == '__main__':
+    main()
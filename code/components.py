@@ -0,0 +1,122 @@
+#!/usr/bin/python3
+
+import signal
+from concurrent.futures import FIRST_COMPLETED, wait
+
+import solver
+from pool import Pool, stop
+
+def find_components(cnf):
+    '''Splits a cnf into variable-disjoint parts with union-find.
+    Two clauses end up in the same part if they are linked by a chain of
+    clauses sharing variables, so the parts can be solved independently.
+    :param cnf - a list of sets (each set one disjunction)
+
+    :returns a list of cnfs (lists of sets), smallest first
+    '''
+    parent = {}
+
+    def find(var):
+        root = parent.setdefault(var, var)
+        while root != parent[root]:
+            # path halving
+            parent[root] = parent[parent[root]]
+            root = parent[root]
+        return root
+
+    for dis in cnf:
+        lits = iter(dis)
+        first = find(abs(next(lits, 0)))
+        for lit in lits:
+            root = find(abs(lit))
+            if root != first:
+                parent[root] = first
+
+    parts = {}
+    for dis in cnf:
+        parts.setdefault(find(abs(next(iter(dis), 0))), []).append(dis)
+    return sorted(parts.values(), key=len)
+
+def simplify(cnf, unit_prop=True, purelit_elim=True):
+    '''Runs unit propagation and pure literal elimination on the cnf until neither changes it.
+    Components often only fall apart once these have assigned the literals linking them.
+    :param cnf - a list of sets (each set one disjunction)
+    :param unit_prop - flag to turn on/off unit propagation, True by default
+    :param purelit_elim - flag to turn on/off pure literal elimination, True by default
+
+    :returns cnf - the simplified cnf as a list of sets, None if it contains an empty clause
+    :returns assign - a dictionary of the assignments made
+    '''
+    assign = {}
+    while True:
+        new_assign = {}
+        if unit_prop:
+            cnf, units = solver.assign_unit_clauses(cnf)
+            new_assign.update(units)
+        if purelit_elim and not any(len(dis) == 0 for dis in cnf):
+            cnf, pure = solver.assign_pure_literals(cnf)
+            new_assign.update(pure)
+        assign.update(new_assign)
+        if any(len(dis) == 0 for dis in cnf):
+            return None, assign
+        if not new_assign:
+            return [set(dis) for dis in cnf], assign
+
+def init_worker():
+    # the parent handles interrupts and terminates the workers
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+
+def solve_component(cnf, engine, unit_prop, purelit_elim, options):
+    '''Solves one component in a worker process, see solver.solve.'''
+    return solver.solve(cnf, engine, unit_prop, purelit_elim, **options)
+
+def solve_components(cnf, engine=None, unit_prop=True, purelit_elim=True, workers=None, stats=None, **options):
+    '''Simplifies the cnf at the root, splits it into components and solves them one by one.
+    The smallest components go first, and the first unsatisfiable one
+    decides the whole formula, so a failure in one component never makes
+    the others be solved again. The models of the components are merged.
+    :param cnf - a list of sets (each set one disjunction)
+    :param engine - name of the engine in solver.ENGINES that solves the components, solver.DEFAULT_ENGINE if None
+    :param unit_prop - flag to turn on/off unit propagation, True by default
+    :param purelit_elim - flag to turn on/off pure literal elimination, True by default
+    :param workers - number of worker processes solving components in parallel, None or 1 to solve them in this process
+    :param stats - a stats.Stats object collecting the counters, None by default (not passed to worker processes)
+    :param options - keyword arguments of the engine
+
+    :returns sat - boolean denoting the satisfiability of the formula
+    :returns vals - a dictionary containing one satisfiable valuation, None if sat is not True
+    '''
+    engine = engine or solver.DEFAULT_ENGINE
+    cnf, assign = simplify(cnf, unit_prop, purelit_elim)
+    if cnf is None:
+        if stats is not None:
+            stats.conflict()
+        return False, None
+    parts = find_components(cnf)
+    if stats is not None:
+        stats.propagations += len(assign)
+
+    if not workers or workers == 1 or len(parts) < 2:
+        for part in parts:
+            sat, vals = solver.ENGINES[engine](part, unit_prop, purelit_elim, stats=stats, **options)
+            if not sat:
+                return False, None
+            assign.update(vals)
+        return True, assign
+
+    executor = Pool(min(workers, len(parts)), initializer=init_worker)
+    pending = {executor.submit(solve_component, part, engine, unit_prop, purelit_elim, options) for part in parts}
+    try:
+        while pending:
+            finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in finished:
+                sat, vals = future.result()
+                if not sat:
+                    return sat, None
+                assign.update(vals)
+        # every worker is idle, so they can exit on their own
+        executor.shutdown(wait=True)
+        return True, assign
+    finally:
+        stop(executor)
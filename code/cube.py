@@ -0,0 +1,183 @@
+#!/usr/bin/python3
+
+import os
+import signal
+from concurrent.futures import FIRST_COMPLETED, wait
+
+import solver
+from pool import Pool, stop
+from stats import CHECK_INTERVAL, Stats, BudgetExhausted
+from trail import TrailSolver
+
+def lookahead(engine, candidates):
+    '''Picks the variable whose two branches propagate the most, march style.
+    Both literals of every candidate are propagated on the engine's trail
+    and the variable with the largest product of implied literal counts
+    wins. A literal whose propagation fails is a failed literal and its
+    negation is fixed at the current level right away.
+    :param engine - a TrailSolver with no pending propagation
+    :param candidates - variables to try, most frequent first
+
+    :returns the variable to split on, 0 if no candidate is unassigned, None if the node is refuted
+    '''
+    value = engine.value
+    level = engine.decision_level()
+    best, best_score = 0, -1
+    for var in candidates:
+        if value[var]:
+            continue
+        implied = []
+        for lit in (var, -var):
+            engine.new_decision_level()
+            before = len(engine.trail)
+            engine.enqueue(lit)
+            implied.append(len(engine.trail) - before if engine.propagate() is None else None)
+            engine.backtrack(level)
+        pos, neg = implied
+        if pos is None and neg is None:
+            return None
+        if pos is None or neg is None:
+            engine.enqueue(-var if pos is None else var)
+            if engine.propagate() is not None:
+                return None
+            continue
+        score = pos * neg + pos + neg
+        if score > best_score:
+            best, best_score = var, score
+    if best and value[best]:
+        # fixed by a failed literal found after it
+        return lookahead(engine, candidates)
+    return best
+
+def make_cubes(cnf, depth=6, max_candidates=40):
+    '''Splits the cnf into cubes by lookahead up to the given depth.
+    A cube is the list of literals on the trail at a leaf of the split
+    tree: the decisions together with everything they imply. Branches
+    refuted by propagation are dropped, so the cnf is unsatisfiable
+    exactly when all returned cubes are.
+    :param cnf - a list of sets (each set one disjunction)
+    :param depth - number of splits on each branch, at most 2**depth cubes
+    :param max_candidates - number of the most frequent free variables tried by each lookahead
+
+    :returns cubes - a list of cubes (lists of literals)
+    :returns refuted - number of branches refuted while splitting
+    '''
+    engine = TrailSolver(cnf, purelit_elim=False)
+    if not engine.simplify_root():
+        return [], 1
+
+    occurrences = [0] * (engine.n_vars + 1)
+    for dis in cnf:
+        for lit in dis:
+            occurrences[abs(lit)] += 1
+    order = sorted(engine.order, key=lambda var : occurrences[var], reverse=True)
+
+    cubes = []
+    refuted = 0
+
+    def split(depth):
+        nonlocal refuted
+        value = engine.value
+        candidates = [var for var in order if not value[var]][:max_candidates]
+        var = lookahead(engine, candidates) if depth and candidates else 0
+        if var is None:
+            refuted += 1
+            return
+        if not var:
+            cubes.append(list(engine.trail))
+            return
+        level = engine.decision_level()
+        for lit in (var, -var):
+            engine.new_decision_level()
+            engine.enqueue(lit)
+            if engine.propagate() is None:
+                split(depth - 1)
+            else:
+                refuted += 1
+            engine.backtrack(level)
+
+    split(depth)
+    return cubes, refuted
+
+# the formula and the budgets (keyword arguments of Stats, None for no counters) of a worker process, set once by init_worker
+worker_cnf = None
+worker_budgets = None
+
+def init_worker(cnf, budgets=None):
+    global worker_cnf, worker_budgets
+    # the parent handles interrupts and terminates the workers
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    worker_cnf = cnf
+    worker_budgets = budgets
+
+def solve_cube(cube, engine):
+    '''Solves the worker's formula under a cube.
+    Clauses satisfied by the cube are dropped and its false literals are
+    removed before the formula is handed to the engine.
+    :param cube - a list of literals
+    :param engine - name of the engine in solver.ENGINES
+
+    :returns sat - True, False or solver.UNKNOWN if a budget ran out
+    :returns vals - a dictionary containing one satisfiable valuation, None if sat is not True
+    :returns counters - the counters of the run (Stats.as_dict), None if the worker has no budgets
+    '''
+    assigned = set(cube)
+    sub_cnf = [{lit for lit in dis if -lit not in assigned} for dis in worker_cnf if assigned.isdisjoint(dis)]
+    stats = Stats(**worker_budgets) if worker_budgets is not None else None
+    sat, vals = solver.solve(sub_cnf, engine, True, True, stats=stats)
+    counters = stats.as_dict() if stats is not None else None
+    if not sat:
+        return sat, None, counters
+    vals = dict(vals)
+    vals.update((abs(lit), lit > 0) for lit in cube)
+    return True, vals, counters
+
+def solve_cubes(cnf, depth=6, workers=None, engine='dpll', progress=None, stats=None):
+    '''Cube and conquer: splits the cnf by lookahead and solves the cubes in a process pool.
+    The formula is sent to each worker once, then only cubes travel. The
+    first satisfiable cube stops all workers; the cnf is unsatisfiable only
+    when every cube is refuted. With stats, the counters of the finished
+    cubes are added to it. Its time budget is checked while waiting for the
+    cubes, its memory budget in every worker, and its decision budget caps
+    every cube and the sum over the finished ones.
+    :param cnf - a list of sets (each set one disjunction)
+    :param depth - split depth, see make_cubes
+    :param workers - number of worker processes, os.cpu_count() if None
+    :param engine - name of the engine in solver.ENGINES that solves the cubes, dpll by default
+    :param progress - function called with (done, total) after every finished cube, None to stay silent
+    :param stats - a stats.Stats object collecting the counters and holding the budgets, None by default
+
+    :returns sat - boolean denoting the satisfiability of the formula
+    :returns vals - a dictionary containing one satisfiable valuation, None if sat is False
+    :raises stats.BudgetExhausted if a budget ran out
+    '''
+    cubes, _ = make_cubes(cnf, depth)
+    if not cubes:
+        return False, None
+
+    budgets = stats.budgets() if stats is not None else None
+    executor = Pool(workers or os.cpu_count(), initializer=init_worker, initargs=(cnf, budgets))
+    pending = {executor.submit(solve_cube, cube, engine) for cube in cubes}
+    done = 0
+    try:
+        while pending:
+            finished, pending = wait(pending, timeout=CHECK_INTERVAL if stats is not None else None, return_when=FIRST_COMPLETED)
+            if stats is not None:
+                stats.tick()
+            for future in finished:
+                sat, vals, counters = future.result()
+                done += 1
+                if progress:
+                    progress(done, len(cubes))
+                if counters is not None:
+                    stats.merge(counters)
+                    if sat is solver.UNKNOWN:
+                        raise BudgetExhausted(counters['reason'])
+                    if stats.max_decisions is not None and stats.decisions > stats.max_decisions:
+                        raise BudgetExhausted('decision budget')
+                if sat:
+                    return True, vals
+        return False, None
+    finally:
+        stop(executor)
@@ -0,0 +1,366 @@
+#!/usr/bin/python3
+
+import bz2
+import gzip
+import lzma
+import mmap
+import os
+import re
+import struct
+import sys
+from array import array
+
+# comment and problem lines, wherever they are in the file
+SKIP_LINES = re.compile(rb'^[ \t]*[cp].*$', re.MULTILINE)
+# SATLIB files end with a line holding only %
+END_MARK = re.compile(rb'^[ \t]*%', re.MULTILINE)
+HEADER = re.compile(rb'^[ \t]*p[ \t]+cnf:?[ \t]+(\d+)[ \t]+(\d+)', re.MULTILINE)
+
+# binary format: header, clause offset table (int64), literals (int32), all little-endian
+BINARY_EXTENSION = '.bcnf'
+BINARY_MAGIC = b'BCNF'
+BINARY_VERSION = 1
+# magic, version, number of variables, number of clauses, number of literals
+BINARY_HEADER = struct.Struct('<4sIQQQ')
+
+# compressed files: extension, magic bytes at the start of the file and the function opening them
+CODECS = {
+    '.gz' : (b'\x1f\x8b', gzip.open),
+    '.bz2' : (b'BZh', bz2.open),
+    '.xz' : (b'\xfd7zXZ\x00', lzma.open),
+}
+MAGIC_SIZE = max(len(magic) for magic, _ in CODECS.values())
+
+# bytes read at once when streaming
+CHUNK_SIZE = 1 << 24
+
+def split_codec(file_name):
+    '''Splits the extension of a compression codec off a file name.
+
+    :returns base - the file name without that extension
+    :returns codec - the extension (a key of CODECS), None if the name has none
+    '''
+    base, extension = os.path.splitext(file_name)
+    if extension in CODECS:
+        return base, extension
+    return file_name, None
+
+def sniff(file_handle):
+    '''Tells the codec of an open binary file from its first bytes without consuming them.
+
+    :returns the extension of the codec (a key of CODECS), None for an uncompressed or text file
+    '''
+    if hasattr(file_handle, 'peek'):
+        head = file_handle.peek(MAGIC_SIZE)[:MAGIC_SIZE]
+    elif file_handle.seekable():
+        position = file_handle.tell()
+        head = file_handle.read(MAGIC_SIZE)
+        file_handle.seek(position)
+    else:
+        return None
+    if not isinstance(head, bytes):
+        return None
+    return next((codec for codec, (magic, _) in CODECS.items() if head.startswith(magic)), None)
+
+def open_file(file_name, mode='r'):
+    '''Opens a file like open, compressed or not.
+    Files read are decompressed if their first bytes are the magic bytes of
+    a codec, whatever their name; files written are compressed if their
+    name ends with the extension of a codec.
+    :param file_name - path of the file
+    :param mode - 'r', 'w', 'a' with 'b' for binary (text by default)
+
+    :returns a file object
+    '''
+    if 'r' in mode:
+        with open(file_name, 'rb') as file_handle:
+            codec = sniff(file_handle)
+    else:
+        _, codec = split_codec(file_name)
+    if codec is None:
+        return open(file_name, mode)
+    return CODECS[codec][1](file_name, mode if 'b' in mode else mode + 't')
+
+class FlatCNF:
+    '''A cnf formula stored in two flat arrays, CSR style.
+
+    lits holds the literals of all clauses one after another (without the
+    terminating zeros) and clause i is lits[offsets[i]:offsets[i+1]].
+    '''
+
+    def __init__(self, lits, offsets, n_vars=None):
+        '''
+        :param lits - array('i') of the literals of all clauses
+        :param offsets - array('q') of clause start positions, one more than the number of clauses
+        :param n_vars - number of variables, the largest variable in lits if None
+        '''
+        self.lits = lits
+        self.offsets = offsets
+        if n_vars is None:
+            n_vars = max(max(lits, default=0), -min(lits, default=0))
+        self.n_vars = n_vars
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def clause(self, i):
+        '''Returns the literals of clause i as an array slice.'''
+        return self.lits[self.offsets[i]:self.offsets[i + 1]]
+
+    def __iter__(self):
+        lits = self.lits
+        offsets = self.offsets
+        for i in range(len(offsets) - 1):
+            yield lits[offsets[i]:offsets[i + 1]]
+
+    def to_sets(self):
+        '''Converts to the list of sets used by solver.dpll.
+
+        :returns cnf - a list of sets (each set one disjunction)
+        '''
+        lits = self.lits.tolist()
+        offsets = self.offsets
+        return [set(lits[offsets[i]:offsets[i + 1]]) for i in range(len(offsets) - 1)]
+
+    @classmethod
+    def from_sets(cls, cnf):
+        '''Converts a list of sets (each set one disjunction) to a FlatCNF.'''
+        lits = array('i')
+        offsets = array('q', [0])
+        for dis in cnf:
+            lits.extend(dis)
+            offsets.append(len(lits))
+        return cls(lits, offsets)
+
+    @classmethod
+    def join(cls, flats):
+        '''Puts the clauses of several FlatCNFs (e.g. the pieces of stream_dimacs) into one.'''
+        lits = array('i')
+        offsets = array('q', [0])
+        n_vars = 0
+        for flat in flats:
+            base = len(lits)
+            lits.extend(flat.lits)
+            offsets.extend(base + offset for offset in flat.offsets[1:])
+            n_vars = max(n_vars, flat.n_vars)
+        return cls(lits, offsets, n_vars)
+
+
+def split_clauses(tokens, keep_last=True):
+    '''Splits a token array at its zeros into the arrays of a FlatCNF.
+    :param tokens - array('i') of literals and terminating zeros
+    :param keep_last - flag to keep a last clause without its terminating zero as a clause
+
+    :returns lits - array('i') of the literals of the complete clauses
+    :returns offsets - array('q') of clause start positions
+    :returns rest - array('i') of the tokens after the last zero (empty if keep_last)
+    '''
+    # clause k ends at the k-th zero, which is k positions further in tokens than in lits
+    ends = [pos for pos, lit in enumerate(tokens) if not lit]
+    rest = array('i')
+    if not keep_last:
+        cut = ends[-1] + 1 if ends else 0
+        tokens, rest = tokens[:cut], tokens[cut:]
+    lits = array('i', filter(None, tokens))
+    offsets = array('q', [0])
+    offsets.extend(pos - k for k, pos in enumerate(ends))
+    if tokens and tokens[-1] != 0:
+        offsets.append(len(lits))
+    return lits, offsets, rest
+
+def tokenize(data):
+    '''Parses the text of a DIMACS file in bulk.
+    Any whitespace separates tokens, comment lines may appear anywhere,
+    the problem line may be written as "p cnf" or "p cnf:" and a line
+    starting with % ends the formula. A last clause without its
+    terminating zero is kept.
+    :param data - bytes (or str) content of a DIMACS file
+
+    :returns flat - a FlatCNF
+    '''
+    if isinstance(data, str):
+        data = data.encode()
+    n_vars = None
+    header = HEADER.search(data)
+    if header:
+        n_vars = int(header.group(1))
+    end = END_MARK.search(data)
+    if end:
+        data = data[:end.start()]
+    tokens = array('i', map(int, SKIP_LINES.sub(b'', data).split()))
+    lits, offsets, _ = split_clauses(tokens)
+
+    flat = FlatCNF(lits, offsets)
+    if n_vars is not None and n_vars > flat.n_vars:
+        flat.n_vars = n_vars
+    return flat
+
+def stream_dimacs(file_handle, chunk_size=CHUNK_SIZE):
+    '''Parses a DIMACS file piece by piece, for files too big to hold at once.
+    The file is read in chunks of about chunk_size bytes cut at line ends,
+    and a clause running over the end of a chunk is carried over to the
+    next one. Accepts the same input as tokenize.
+    :param file_handle - a binary file handle
+    :param chunk_size - number of bytes read at once
+
+    :returns a generator of FlatCNF objects holding consecutive clauses
+    '''
+    carry = b''
+    pending = array('i')
+    n_vars = None
+    last = False
+    while not last:
+        data = file_handle.read(chunk_size)
+        if isinstance(data, str):
+            data = data.encode()
+        last = not data
+        data = carry + data
+        carry = b''
+        if not last:
+            cut = data.rfind(b'\n') + 1
+            if not cut:
+                carry = data
+                continue
+            data, carry = data[:cut], data[cut:]
+        if n_vars is None:
+            header = HEADER.search(data)
+            if header:
+                n_vars = int(header.group(1))
+        end = END_MARK.search(data)
+        if end:
+            data = data[:end.start()]
+            last = True
+        tokens = pending + array('i', map(int, SKIP_LINES.sub(b'', data).split()))
+        lits, offsets, pending = split_clauses(tokens, keep_last=last)
+        flat = FlatCNF(lits, offsets)
+        if n_vars is not None and n_vars > flat.n_vars:
+            flat.n_vars = n_vars
+        yield flat
+
+def read_dimacs(file_handle, chunk_size=CHUNK_SIZE):
+    '''Parses an open DIMACS file, see tokenize.
+    An uncompressed file is read at once. A compressed one (see CODECS) is
+    decompressed while it is parsed, chunk_size bytes at a time, so the
+    decompressed text is never held in memory or written out as a whole.
+    :param file_handle - a binary (or text) file handle
+    :param chunk_size - number of decompressed bytes parsed at once
+
+    :returns flat - a FlatCNF
+    '''
+    codec = sniff(file_handle)
+    if codec is None:
+        return tokenize(file_handle.read())
+    with CODECS[codec][1](file_handle, 'rb') as stream:
+        return FlatCNF.join(stream_dimacs(stream, chunk_size))
+
+def load_dimacs(file_name):
+    '''Reads a DIMACS file, compressed or not, and parses it, see read_dimacs.
+    :param file_name - path of the DIMACS file
+
+    :returns flat - a FlatCNF
+    '''
+    with open(file_name, 'rb') as file_handle:
+        return read_dimacs(file_handle)
+
+def write_dimacs(flat, file_name, comment=''):
+    '''Writes a FlatCNF as a DIMACS file, in bulk.
+    :param flat - a FlatCNF
+    :param file_name - the name of the file we want to create
+    :param comment - text of the comment lines at the top, none if empty
+    '''
+    lines = ['c ' + line for line in comment.splitlines()]
+    lines.append('p cnf {} {}'.format(flat.n_vars, len(flat)))
+    lits = flat.lits.tolist()
+    offsets = flat.offsets
+    lines.extend(' '.join(map(str, lits[offsets[i]:offsets[i + 1]] + [0])) for i in range(len(flat)))
+    with open_file(file_name, 'w') as file_handle:
+        file_handle.write('\n'.join(lines) + '\n')
+
+def write_binary(flat, file_name):
+    '''Writes a FlatCNF in the binary format: a header (BINARY_HEADER), the
+    offset table as int64 and the literals as int32, all little-endian, so a
+    reader can map the file and use both tables without copying.
+    :param flat - a FlatCNF
+    :param file_name - the name of the file we want to create
+    '''
+    lits = array('i', flat.lits)
+    offsets = array('q', flat.offsets)
+    if sys.byteorder == 'big':
+        lits.byteswap()
+        offsets.byteswap()
+    with open_file(file_name, 'wb') as file_handle:
+        file_handle.write(BINARY_HEADER.pack(BINARY_MAGIC, BINARY_VERSION, flat.n_vars, len(offsets) - 1, len(lits)))
+        file_handle.write(offsets.tobytes())
+        file_handle.write(lits.tobytes())
+
+def load_binary(file_name):
+    '''Maps a binary CNF file into memory.
+    The arrays of the returned FlatCNF are views of the mapped file, so
+    nothing is parsed or copied until the clauses are used. A compressed
+    file cannot be mapped and is decompressed into memory instead.
+    :param file_name - path of the binary file
+
+    :returns flat - a FlatCNF
+    '''
+    with open(file_name, 'rb') as file_handle:
+        codec = sniff(file_handle)
+        if codec is None:
+            data = mmap.mmap(file_handle.fileno(), 0, access=mmap.ACCESS_READ)
+        else:
+            with CODECS[codec][1](file_handle, 'rb') as stream:
+                data = stream.read()
+    if len(data) < BINARY_HEADER.size:
+        raise ValueError('{} is not a binary CNF file'.format(file_name))
+    magic, version, n_vars, n_clauses, n_lits = BINARY_HEADER.unpack_from(data)
+    if magic != BINARY_MAGIC or version != BINARY_VERSION:
+        raise ValueError('{} is not a binary CNF file of version {}'.format(file_name, BINARY_VERSION))
+    start = BINARY_HEADER.size
+    middle = start + 8 * (n_clauses + 1)
+    end = middle + 4 * n_lits
+    if len(data) < end:
+        raise ValueError('{} is truncated'.format(file_name))
+    view = memoryview(data)
+    offsets = view[start:middle].cast('q')
+    lits = view[middle:end].cast('i')
+    if sys.byteorder == 'big':
+        offsets = array('q', offsets)
+        lits = array('i', lits)
+        offsets.byteswap()
+        lits.byteswap()
+    return FlatCNF(lits, offsets, n_vars)
+
+def is_binary(file_name):
+    '''Tells whether a file name has the extension of the binary format (before that of a codec, if any).'''
+    return split_codec(file_name)[0].endswith(BINARY_EXTENSION)
+
+def load_cnf(file_name):
+    '''Reads a formula in the format given by the file extension: binary for
+    BINARY_EXTENSION, DIMACS otherwise. Either may be compressed (see CODECS).
+
+    :returns flat - a FlatCNF
+    '''
+    return load_binary(file_name) if is_binary(file_name) else load_dimacs(file_name)
+
+def save_cnf(flat, file_name, comment=''):
+    '''Writes a formula in the format given by the file extension (see load_cnf).
+    The binary format has no room for comments.
+    '''
+    if is_binary(file_name):
+        write_binary(flat, file_name)
+    else:
+        write_dimacs(flat, file_name, comment)
+
+def main():
+    '''Converts between DIMACS and the binary format, by the file extensions.
+    '''
+    if len(sys.argv) != 3:
+        print('Usage: {} <input-file> <output-file>'.format(sys.argv[0]))
+        print('Files ending with {} are binary, all others DIMACS. Names ending with {} are compressed.'.format(
+            BINARY_EXTENSION, ', '.join(CODECS)))
+        return
+    flat = load_cnf(sys.argv[1])
+    save_cnf(flat, sys.argv[2], 'converted from ' + os.path.basename(sys.argv[1]))
+    print('{} variables, {} clauses written to {}'.format(flat.n_vars, len(flat), sys.argv[2]))
+
+if __name__ == '__main__':
+    main()
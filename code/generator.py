@@ -1,20 +1,97 @@
 import argparse
+import heapq
+import math
 import random as rd
+import signal
 import sys
 import time
 import os
 
+import genpool
 import solver
+from incremental import Solver
+from dimacs import FlatCNF, BINARY_EXTENSION, CODECS, is_binary, write_binary, open_file
+
+# NumPy is optional, without it random graphs are sampled in pure Python
+try:
+    import numpy as np
+except ImportError:
+    np = None
 
 GRAPH_PATH = os.path.join('..', 'graphs')
+# edge probability from which drawing every pair beats drawing the gaps between edges
+DENSE_PROBABILITY = 0.15
+
+def random_graph(n, p, seed=None, portable=False):
+    '''Samples a G(n, p) random graph: every pair of vertices is an edge with probability p.
+    With NumPy every row of the adjacency matrix is drawn in one call. Without
+    it, p = 1/2 takes a row of random bits per call, and other dense graphs (p
+    of at least DENSE_PROBABILITY) get one random number per pair, drawn row by
+    row in a comprehension. In sparse graphs the gaps between edges are drawn
+    instead (Batagelj and Brandes), so the work grows with the number of edges,
+    not n^2. NumPy and pure Python give different graphs for the same seed.
+    :param n - number of vertices
+    :param p - edge probability
+    :param seed - seed of the graph, None for a random one
+    :param portable - flag to sample in pure Python even with NumPy, so a seed gives the same graph everywhere
 
-def generate_graph(n):
+    :returns V, E - the vertices numbered from 1 and the edges (i, j), i < j
+    '''
     V = [*range(1, n + 1)]
+    if p <= 0:
+        return V, []
+    if p >= 1:
+        return V, [(i, j) for i in range(1, n) for j in range(i + 1, n + 1)]
+    E = []
+    if np is not None and not portable:
+        generator = np.random.default_rng(seed)
+        for i in range(1, n):
+            neighbours = np.flatnonzero(generator.random(n - i) < p) + (i + 1)
+            E.extend([(i, j) for j in neighbours.tolist()])
+        return V, E
+    if p == 0.5:
+        # one random bit per pair, a whole row of bits per call
+        getrandbits = rd.Random(seed).getrandbits
+        for i in range(1, n):
+            row = format(getrandbits(n - i), '0{}b'.format(n - i))
+            E.extend([(i, j) for j, bit in zip(range(i + 1, n + 1), row) if bit == '1'])
+        return V, E
+    random = rd.Random(seed).random
+    if p >= DENSE_PROBABILITY:
+        for i in range(1, n):
+            E.extend([(i, j) for j in range(i + 1, n + 1) if random() < p])
+        return V, E
+    log_q = math.log(1 - p)
+    # pair (w, v) with w < v, 0-based, walked row by row
+    v, w = 1, -1
+    while v < n:
+        w += 1 + int(math.log(1 - random()) / log_q)
+        while w >= v and v < n:
+            w -= v
+            v += 1
+        if v < n:
+            E.append((w + 1, v + 1))
+    return V, E
+
+def generate_graph(n, p=0.5):
+    '''Samples a G(n, p) random graph from a seed drawn from the random module, which the callers seed.
+    The graph is sampled in pure Python (see random_graph), so bench.py regenerates the same
+    instance from its seed with or without NumPy.
+    '''
+    return random_graph(n, p, rd.getrandbits(64), portable=True)
+
+def disjoint_union(graphs):
+    '''Puts graphs side by side as the components of one graph.
+    :param graphs - a list of (V, E) pairs, vertices numbered from 1
+
+    :returns V, E - the vertices of each graph renumbered after those of the graphs before it
+    '''
+    V = []
     E = []
-    for i in range(1, n):
-        for j in range(i + 1, n + 1):
-            if bool(rd.getrandbits(1)):
-                E.append((i, j))
+    for V_part, E_part in graphs:
+        offset = len(V)
+        V.extend(i + offset for i in V_part)
+        E.extend((i + offset, j + offset) for i, j in E_part)
     return V, E
 
 def to_dimacs(i, j, k):
@@ -22,100 +99,334 @@ def to_dimacs(i, j, k):
     # vertex i is colored with color j, k is the number of all colors
     return (i - 1) * k + j
 
-def gen(V, E, k):
+def amo_pairwise(lits, new_var):
+    '''At most one of lits is true: one binary clause per pair, no new variables.'''
+    return [{-lits[a], -lits[b]} for a in range(len(lits)) for b in range(a + 1, len(lits))]
+
+def amo_sequential(lits, new_var):
+    '''At most one of lits is true: sequential counter (Sinz), 3n-4 clauses and n-1 new variables.'''
+    if len(lits) < 2:
+        return []
+    # s[j] is true if one of lits[0..j] is
+    s = [new_var() for _ in range(len(lits) - 1)]
+    cnf = [{-lits[0], s[0]}]
+    for j in range(1, len(lits) - 1):
+        cnf.append({-lits[j], s[j]})
+        cnf.append({-s[j - 1], s[j]})
+        cnf.append({-lits[j], -s[j - 1]})
+    cnf.append({-lits[-1], -s[-1]})
+    return cnf
+
+def amo_commander(lits, new_var, group_size=3):
+    '''At most one of lits is true: commander encoding (Klieber and Kwon).
+    The literals are split into groups, each with a commander variable implied by
+    every literal of the group; at most one per group and at most one commander.
+    '''
+    if len(lits) <= group_size + 1:
+        return amo_pairwise(lits, new_var)
+    cnf = []
+    commanders = []
+    for g in range(0, len(lits), group_size):
+        group = lits[g:g + group_size]
+        commander = new_var()
+        commanders.append(commander)
+        cnf.extend(amo_pairwise(group, new_var))
+        cnf.extend({-lit, commander} for lit in group)
+    cnf.extend(amo_commander(commanders, new_var, group_size))
+    return cnf
+
+# at most one colour per vertex, None leaves it out (any extra colour can be dropped from a solution)
+AMO_ENCODINGS = {
+    'pairwise' : amo_pairwise,
+    'sequential' : amo_sequential,
+    'commander' : amo_commander,
+}
+
+SYMMETRY_BREAKING = ['clique', 'ordered']
+
+def neighbourhoods(V, E):
+    '''Returns a dictionary {vertex : set of its neighbours}.'''
+    neighbours = {i : set() for i in V}
+    for (i, j) in E:
+        neighbours[i].add(j)
+        neighbours[j].add(i)
+    return neighbours
+
+def greedy_clique(V, E):
+    '''Grows a clique greedily, highest degree first.
+
+    :returns clique - a list of pairwise adjacent vertices
+    '''
+    neighbours = neighbourhoods(V, E)
+    clique = []
+    candidates = set(V)
+    while candidates:
+        i = max(candidates, key=lambda i : (len(neighbours[i] & candidates), -i))
+        clique.append(i)
+        candidates &= neighbours[i]
+    return clique
+
+def gen(V, E, k, symmetry=None, amo=None):
     '''Generates a cnf to solve the k-colourability problem for the graph (V,E).
+    Variable to_dimacs(i, j, k) means vertex i has colour j, extra variables of
+    the at-most-one encodings are numbered after them.
     :param V - set of vertices
     :param E - set of edges
     :param k - number of colours we want to use
+    :param symmetry - colour symmetry breaking, one of SYMMETRY_BREAKING or None:
+    'clique' gives the vertices of a greedy clique colours 1, 2, ..., 'ordered'
+    lets the m-th vertex use only colours up to m
+    :param amo - name of the at-most-one-colour-per-vertex encoding in AMO_ENCODINGS, None for none
 
     :returns cnf - a list of sets (each set one disjunction)
     '''
-    cnf = []
+    # variable to_dimacs(i, j, k) is (i - 1) * k + j, computed per vertex instead of per literal
     # each node of the graph has to be colored by one of k colors
-    for i in V:
-        vi = set()
-        for j in range(1, k + 1):
-            vi.add(to_dimacs(i, j, k + 1))
-        cnf.append(vi)
+    cnf = [set(range((i - 1) * k + 1, i * k + 1)) for i in V]
     # no two adjacent vertices have the same coloring
     for (i, j) in E:
-        for l in range(1, k + 1):
-            vij = set()
-            vij.add(-to_dimacs(i, l, k))
-            vij.add(-to_dimacs(j, l, k))
-            cnf.append(vij)
+        di = (i - 1) * k
+        dj = (j - 1) * k
+        cnf.extend({-di - l, -dj - l} for l in range(1, k + 1))
+
+    # every colouring can be renamed to fix these, so they do not change satisfiability
+    if symmetry == 'clique':
+        for colour, i in enumerate(greedy_clique(V, E)[:k], 1):
+            cnf.append({to_dimacs(i, colour, k)})
+    elif symmetry == 'ordered':
+        # colours numbered in order of first use: the m-th vertex sees at most m-1 before it
+        for m, i in enumerate(V, 1):
+            for j in range(m + 1, k + 1):
+                cnf.append({-to_dimacs(i, j, k)})
+    elif symmetry is not None:
+        raise ValueError('unknown symmetry breaking: {}'.format(symmetry))
+
+    if amo is not None:
+        n_vars = max(V, default=0) * k
+        def new_var():
+            nonlocal n_vars
+            n_vars += 1
+            return n_vars
+        for i in V:
+            cnf.extend(AMO_ENCODINGS[amo]([to_dimacs(i, j, k) for j in range(1, k + 1)], new_var))
     return cnf
 
+def encoding_sizes(V, E, k):
+    '''Counts the variables and clauses of every encoding option of gen.
+
+    :returns a list of (symmetry, amo, number of variables, number of clauses)
+    '''
+    sizes = []
+    for symmetry in [None] + SYMMETRY_BREAKING:
+        for amo in [None] + list(AMO_ENCODINGS):
+            cnf = gen(V, E, k, symmetry, amo)
+            n_vars = max((abs(lit) for dis in cnf for lit in dis), default=0)
+            sizes.append((symmetry, amo, n_vars, len(cnf)))
+    return sizes
+
+def greedy_colouring(V, E):
+    '''Colours the vertices greedily, highest degree first.
+
+    :returns colouring - a dictionary {vertex : colour}, colours numbered from 1
+    '''
+    neighbours = neighbourhoods(V, E)
+    colouring = {}
+    for i in sorted(V, key=lambda i : -len(neighbours[i])):
+        used = {colouring[j] for j in neighbours[i] if j in colouring}
+        colouring[i] = next(c for c in range(1, len(used) + 2) if c not in used)
+    return colouring
+
+def dsatur(V, E):
+    '''Colours the vertices with DSATUR (Brelaz): the next vertex is the one
+    whose neighbours already use the most distinct colours, ties broken by
+    degree, and it gets the smallest colour they do not use. It usually needs
+    fewer colours than greedy_colouring.
+
+    :returns colouring - a dictionary {vertex : colour}, colours numbered from 1
+    '''
+    neighbours = neighbourhoods(V, E)
+    # saturation[i] is the set of colours next to the uncoloured vertex i
+    saturation = {i : set() for i in V}
+    # a heap of (-saturation, -degree, vertex), entries left behind by updates are skipped
+    heap = [(0, -len(neighbours[i]), i) for i in V]
+    heapq.heapify(heap)
+    colouring = {}
+    while heap:
+        _, _, i = heapq.heappop(heap)
+        if i in colouring:
+            continue
+        used = saturation.pop(i)
+        colour = next(c for c in range(1, len(used) + 2) if c not in used)
+        colouring[i] = colour
+        for j in neighbours[i]:
+            if j in saturation and colour not in saturation[j]:
+                saturation[j].add(colour)
+                heapq.heappush(heap, (-len(saturation[j]), -len(neighbours[j]), j))
+    return colouring
+
+def chromatic_number(V, E, stats=None):
+    '''Finds the chromatic number of the graph (V,E) with a single incremental solver.
+
+    The formula (with clique symmetry breaking) allows as many colours as the
+    better of the greedy and DSATUR colourings uses, colour j only while its
+    selector variable is true. The search stops at the size of a greedy clique. Every query assumes the
+    selector of the highest remaining colour false; once a colouring is found
+    the colours it does not need are removed with unit clauses, and the
+    clauses learned so far are reused for the next, smaller bound.
+    :param V - set of vertices
+    :param E - set of edges
+    :param stats - a stats.Stats object shared by all queries, None by default
+
+    :returns k - the chromatic number
+    :returns colouring - a dictionary {vertex : colour} using k colours
+    :returns calls - the number of solver calls
+    '''
+    colouring = min(greedy_colouring(V, E), dsatur(V, E), key=lambda colouring : max(colouring.values(), default=0))
+    if not colouring:
+        return 0, colouring, 0
+    n_col = max(colouring.values())
+    # no colouring has fewer colours than a clique has vertices
+    lower = max(1, len(greedy_clique(V, E)))
+    if n_col == lower:
+        return n_col, colouring, 0
+    incremental = Solver(gen(V, E, n_col, 'clique'), stats=stats)
+    first_selector = incremental.n_vars
+    selector = lambda j : first_selector + j
+    for i in V:
+        for j in range(1, n_col + 1):
+            incremental.add_clause([-to_dimacs(i, j, n_col), selector(j)])
+
+    k = n_col
+    while k > lower:
+        # a (k-1)-colouring exists iff one exists without colour k
+        sat, vals = incremental.solve([-selector(k)])
+        if not sat:
+            break
+        found = {i : next(j for j in range(1, k) if vals[to_dimacs(i, j, n_col)]) for i in V}
+        used = sorted(set(found.values()))
+        colouring = {i : used.index(j) + 1 for i, j in found.items()}
+        # renumbered, the colouring needs no colour above len(used): those are dropped for good
+        for j in range(len(used) + 1, k + 1):
+            incremental.add_clause([-selector(j)])
+        k = len(used)
+    return k, colouring, incremental.calls
+
 def cnf_to_dimacs(cnf, n_lits, n_clauses, file_name, params=''):
     '''Creates a dimacs file from a given cnf.
     :param cnf - a list of sets (each set one disjunction)
     :param n_lits - number of literals we want in the formula (some may be skipped)
     :param n_clauses - number of clauses we want the formula to contain
-    :param file_name - the name of the file we want to create
+    :param file_name - the name of the file we want to create, binary if it ends with dimacs.BINARY_EXTENSION, compressed if it ends with one of dimacs.CODECS
     :param params - additional information we want to add as a comment, empty by default
 
     :returns None
     '''
-    dimacs = open(file_name, 'w+')
-    dimacs.write('c This file was generated automatically by generator.py\n')
-    dimacs.write('c\n')
-    dimacs.write('c params: ' + params + '\n')
-    dimacs.write('p cnf: {0} {1}\n'.format(str(n_lits), str(n_clauses)))
-    for dis in cnf:
-        for lit in dis:
-            dimacs.write(str(lit) + ' ')
-        dimacs.write('0\n')
-    dimacs.close()
+    if is_binary(file_name):
+        # the binary format has no room for the comments
+        flat = FlatCNF.from_sets(cnf)
+        flat.n_vars = max(flat.n_vars, n_lits)
+        write_binary(flat, file_name)
+        return
+    lines = ['c This file was generated automatically by generator.py', 'c', 'c params: ' + params,
+             'p cnf: {0} {1}'.format(str(n_lits), str(n_clauses))]
+    lines.extend(' '.join(map(str, [*dis, 0])) for dis in cnf)
+    with open_file(file_name, 'w') as dimacs:
+        dimacs.write('\n'.join(lines) + '\n')
+
+def make_case(params, n_ver, seed):
+    '''Generates one case for genpool.generate: the colouring formula of a random graph.
+    :param params - a dictionary with colours, symmetry, amo (see gen), chromatic (flag to
+    also find the chromatic number) and report (flag to also count the encoding sizes)
+    :param n_ver - number of vertices
+    :param seed - seed of the case
+
+    :returns cnf - a list of sets (each set one disjunction)
+    :returns meta - the description of the case, see genpool.run_case
+    '''
+    k = params['colours']
+    # bench.py regenerates the formula from vertices, colours, symmetry, amo and seed
+    rd.seed(seed)
+    V, E = generate_graph(n_ver)
+    cnf = gen(V, E, k, params['symmetry'], params['amo'])
+    n_lits = max(to_dimacs(n_ver, k, k), max((abs(lit) for dis in cnf for lit in dis), default=0))
+    meta = {'name' : '{}_{}'.format(n_lits, len(cnf)), 'family' : 'colouring', 'vertices' : n_ver, 'colours' : k,
+            'symmetry' : params['symmetry'], 'amo' : params['amo'], 'n_vars' : n_lits,
+            'comment' : 'This file was generated automatically by generator.py\n\nparams: vertices={} colours={} symmetry={} amo={} seed={}'.format(
+                n_ver, k, params['symmetry'], params['amo'], seed)}
+    if params['chromatic']:
+        time_begin = time.time()
+        meta['chromatic'], _, meta['incremental_calls'] = chromatic_number(V, E)
+        meta['chromatic_seconds'] = time.time() - time_begin
+    if params['report']:
+        meta['encodings'] = encoding_sizes(V, E, k)
+    return cnf, meta
 
 def main():
     '''Main body of the program. Gets automatically called if this script is called from the command line.
     '''
-    # create directory for dumping
-    if not os.path.exists(GRAPH_PATH):
-        os.mkdir(GRAPH_PATH)
-
     # parse command line arguments
     cli_parser = argparse.ArgumentParser()
-    cli_parser.add_argument('num_ver', help='number of vertices', metavar='num-ver')
+    cli_parser.add_argument('num_ver', help='number of vertices, where the search starts with --adapt', metavar='num-ver')
     cli_parser.add_argument('num_col', help='number of colors', metavar='num-col')
-    cli_parser.add_argument('repeat', help='number of repetitions', metavar='rep')
+    cli_parser.add_argument('repeat', help='number of cases generated', metavar='rep')
+    cli_parser.add_argument('-e', '--engine', help='solving engine, {} by default'.format(solver.DEFAULT_ENGINE), choices=solver.ENGINES, default=solver.DEFAULT_ENGINE)
+    cli_parser.add_argument('-t', '--time-budget', help='discard cases not solved within SECONDS', metavar='SECONDS', type=float)
+    cli_parser.add_argument('-d', '--decision-budget', help='discard cases needing more than N decisions', metavar='N', type=int)
+    cli_parser.add_argument('-b', '--binary', help='write the formulas in the binary format ({})'.format(BINARY_EXTENSION), action='store_true')
+    cli_parser.add_argument('-z', '--compress', help='compress the formula and solution files', choices=[codec[1:] for codec in CODECS])
+    cli_parser.add_argument('--no-cache', help='do not look up or store results in the result cache', action='store_true')
+    cli_parser.add_argument('-c', '--chromatic', help='also find the chromatic number of every graph', action='store_true')
+    cli_parser.add_argument('-s', '--symmetry', help='colour symmetry breaking', choices=SYMMETRY_BREAKING)
+    cli_parser.add_argument('-a', '--amo', help='at-most-one-colour-per-vertex encoding', choices=AMO_ENCODINGS)
+    cli_parser.add_argument('-r', '--report', help='print the variable and clause counts of every encoding option', action='store_true')
+    cli_parser.add_argument('-j', '--jobs', help='number of worker processes, all cores by default', metavar='N', type=int)
+    cli_parser.add_argument('--seed', help='seed of the run, 0 by default; case i always gets the same graph', type=int, default=0)
+    cli_parser.add_argument('-w', '--window', help='keep only cases solved within MIN to MAX seconds', metavar=('MIN', 'MAX'), type=float, nargs=2)
+    cli_parser.add_argument('--adapt', help='adapt the number of vertices until cases are solved within the window', action='store_true')
+    cli_parser.add_argument('--keep-nonsat', help='also keep cases that cannot be coloured', action='store_true')
+    cli_parser.add_argument('-n', '--accept', help='stop once N cases are kept', metavar='N', type=int)
+    cli_parser.add_argument('-o', '--output-dir', help='directory of the kept cases, the manifest and the failure log, {} by default'.format(GRAPH_PATH), default=GRAPH_PATH)
     cli_args = cli_parser.parse_args()
+    if cli_args.adapt and not cli_args.window:
+        cli_parser.error('--adapt needs a --window')
 
     n_ver = int(cli_args.num_ver)
     k = int(cli_args.num_col)
     rep = int(cli_args.repeat)
 
-    for i in range(rep):
-        try:
-            print('Case {0}/{1}: '.format(str(i+1), str(rep)), end='')
-            V, E = generate_graph(n_ver)
-            cnf = gen(V, E, k)
-            n_lits = to_dimacs(n_ver, k, k)
-            n_clauses = len(cnf)
-
-            time_begin = time.time()
-            sat, vals = solver.dpll(cnf, {}, True, True)
-            time_end = time.time()
-
-            print("DPLL algorithm ran for {:f} seconds: ".format(time_end-time_begin), end='')
-
-            if sat:
-                print("SAT")
-                check = solver.verify_solution(cnf,vals)
-                if check:
-                    print("Solution is valid.")
-                    base_name = str(n_lits) + '_' + str(n_clauses) + '_' + str(hash(str(cnf)))
-                    file_name = os.path.join(GRAPH_PATH, base_name)
-                    cnf_to_dimacs(cnf, n_lits, n_clauses, file_name + '.txt', '')
-                    solver.make_solution_file(file_name + '_solution.txt', vals)
-                    print("Solution written to {}".format(file_name + '_solution.txt'))
-                else:
-                    print("Solution NOT valid!")
-
-            else:
-                print("NONSAT")
-        except:
-            continue
+    params = {'colours' : k, 'symmetry' : cli_args.symmetry, 'amo' : cli_args.amo, 'chromatic' : cli_args.chromatic, 'report' : cli_args.report}
+    search = genpool.SizeSearch(n_ver, *cli_args.window, min_size=2) if cli_args.adapt else None
+    extension = BINARY_EXTENSION if cli_args.binary else '.txt'
+    codec = '.' + cli_args.compress if cli_args.compress else ''
+
+    def log(record):
+        print(genpool.format_record(record))
+        if 'chromatic' in record:
+            print('    chromatic number {} ({} incremental calls, {:f} seconds)'.format(
+                record['chromatic'], record['incremental_calls'], record['chromatic_seconds']))
+        for symmetry, amo, n_vars, n_clauses in record.get('encodings', []):
+            print('    symmetry {:8} amo {:11} {:7} variables {:8} clauses'.format(
+                str(symmetry), str(amo), n_vars, n_clauses))
+        if record['status'] == 'error':
+            print(record['traceback'], end='')
+
+    # SIGTERM stops the run like Ctrl-C: the manifest still lists the cases kept so far
+    signal.signal(signal.SIGTERM, signal.default_int_handler)
+    try:
+        accepted, counts = genpool.generate(make_case, params, rep, n_ver, cli_args.accept, cli_args.jobs, cli_args.seed, cli_args.engine,
+                                            cli_args.time_budget, cli_args.decision_budget, cli_args.window,
+                                            ('SAT', 'NONSAT') if cli_args.keep_nonsat else ('SAT',), search,
+                                            cli_args.output_dir, extension + codec, codec, not cli_args.no_cache, log)
+    except KeyboardInterrupt:
+        print('Interrupted, the manifest lists the cases kept so far.')
+        sys.exit(130)
+    print('Colourable: ' + str(counts.get('SAT', 0)))
+    print('Not colourable: ' + str(counts.get('NONSAT', 0)))
+    print('Discarded as too hard: ' + str(counts.get('UNKNOWN', 0)))
+    print('Errors: ' + str(counts.get('error', 0) + counts.get('invalid', 0)))
+    if search:
+        print('Number of vertices reached: ' + str(search.size))
+    print('{} cases kept, manifest written to {}'.format(len(accepted), os.path.join(cli_args.output_dir, genpool.MANIFEST_NAME)))
 
 if __name__ == '__main__':
     main()
@@ -0,0 +1,223 @@
+#!/usr/bin/python3
+
+import hashlib
+import json
+import os
+import signal
+import traceback
+from concurrent.futures import FIRST_COMPLETED, wait
+
+import solver
+from cache import ResultCache, fingerprint, solve_cached
+from dimacs import FlatCNF, save_cnf
+from pool import Pool, stop
+from stats import Stats
+
+MANIFEST_NAME = 'manifest.json'
+FAILURES_NAME = 'failures.jsonl'
+
+def case_seed(seed, index):
+    '''Derives the seed of one case from the seed of the run.
+    It only depends on the two numbers, so a case comes out the same in
+    every worker process and every run, whatever order the cases run in.
+    '''
+    digest = hashlib.sha256('{}:{}'.format(seed, index).encode('ascii')).digest()
+    return int.from_bytes(digest[:8], 'little')
+
+class SizeSearch:
+    '''Adaptive search for the instance size whose cases solve within a time window.
+
+    Every finished case of the current size moves the size: up by step if
+    it solved faster than min_seconds, down if it was slower than
+    max_seconds or ran out of budget. The step halves whenever the
+    direction reverses, so the size settles where the cases are as hard as
+    wanted. Results of cases started with an older size are ignored.
+    '''
+
+    def __init__(self, size, min_seconds, max_seconds, min_size=1, max_size=None):
+        '''
+        :param size - size to start with
+        :param min_seconds - cases solved faster are too easy
+        :param max_seconds - cases solved slower (or not at all) are too hard
+        :param min_size - smallest size tried
+        :param max_size - largest size tried, None for no limit
+        '''
+        self.size = size
+        self.min_seconds = min_seconds
+        self.max_seconds = max_seconds
+        self.min_size = min_size
+        self.max_size = max_size
+        self.step = max(1, size // 4)
+        self.direction = 0
+
+    def update(self, record):
+        '''Moves the size after a case, see the class description.'''
+        if record['search_size'] != self.size or record['status'] not in ('SAT', 'NONSAT', 'UNKNOWN'):
+            return
+        if record['status'] == 'UNKNOWN' or record['seconds'] > self.max_seconds:
+            direction = -1
+        elif record['seconds'] < self.min_seconds:
+            direction = 1
+        else:
+            return
+        if self.direction and direction != self.direction:
+            self.step = max(1, self.step // 2)
+        self.direction = direction
+        size = max(self.min_size, self.size + direction * self.step)
+        self.size = min(size, self.max_size) if self.max_size is not None else size
+
+def init_worker():
+    # the parent handles interrupts and terminates the workers
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+
+def run_case(make_case, task):
+    '''Generates, solves and filters one case in a worker process.
+    :param make_case - function (params, size, seed) returning the cnf and a dictionary
+    describing it: name (prefix of the case name), comment, n_vars and the fields of a bench.py
+    manifest instance that regenerate it (family, seed, ...)
+    :param task - a dictionary with index, seed, size, params, engine, time_budget,
+    decision_budget, window (min, max seconds or None), statuses (answers kept),
+    out_dir, extension and use_cache
+
+    :returns a record dictionary: the case description, status (SAT, NONSAT, UNKNOWN, invalid
+    or error), reason, seconds, cached, accepted, path and solution of the written files
+    '''
+    record = {'index' : task['index'], 'seed' : task['seed'], 'search_size' : task['size'], 'status' : 'error',
+              'reason' : None, 'seconds' : None, 'cached' : False, 'accepted' : False, 'path' : None, 'solution' : None}
+    try:
+        cnf, meta = make_case(task['params'], task['size'], task['seed'])
+        comment = meta.pop('comment', '')
+        n_vars = meta.pop('n_vars', 0)
+        record.update(meta)
+
+        stats = None
+        if task['time_budget'] or task['decision_budget']:
+            stats = Stats(max_seconds=task['time_budget'], max_decisions=task['decision_budget'])
+        def run():
+            sat, vals = solver.solve(cnf, task['engine'], True, True, stats=stats)
+            return sat, vals, stats.as_dict() if stats is not None else None
+        key = fingerprint(cnf)
+        # like the files, cases are named by their fingerprint, so duplicates get the same name
+        record['name'] = meta['name'] + '_' + key[:16]
+        result_cache = ResultCache() if task['use_cache'] else None
+        sat, vals, seconds, hit = solve_cached(result_cache, key, run)
+        record.update(seconds=seconds, cached=hit)
+
+        if sat is solver.UNKNOWN:
+            record.update(status='UNKNOWN', reason=stats.reason if stats else 'interrupted')
+            return record
+        record['status'] = 'SAT' if sat else 'NONSAT'
+        if sat and not solver.verify_solution(cnf, vals):
+            record.update(status='invalid', reason='solution does not satisfy the formula')
+            return record
+        window = task['window']
+        if record['status'] not in task['statuses']:
+            record['reason'] = '{} cases are not kept'.format(record['status'])
+        elif window and not window[0] <= seconds <= window[1]:
+            record['reason'] = 'solved in {:.3f} seconds, outside {}-{}'.format(seconds, *window)
+        else:
+            base_name = os.path.join(task['out_dir'], record['name'])
+            flat = FlatCNF.from_sets(cnf)
+            flat.n_vars = max(flat.n_vars, n_vars)
+            record['path'] = base_name + task['extension']
+            save_cnf(flat, record['path'], comment)
+            if sat:
+                record['solution'] = base_name + '_solution.txt' + task['codec']
+                solver.make_solution_file(record['solution'], vals)
+            record['accepted'] = True
+    except Exception as exc:
+        record['reason'] = '{}: {}'.format(type(exc).__name__, exc)
+        record['traceback'] = traceback.format_exc()
+    return record
+
+def manifest_entry(record, out_dir):
+    '''Turns an accepted record into a bench.py manifest instance, paths relative to out_dir.'''
+    entry = {key : value for key, value in record.items() if key not in ('accepted', 'reason', 'cached', 'search_size', 'index')}
+    entry['path'] = os.path.relpath(record['path'], out_dir)
+    if record['solution']:
+        entry['solution'] = os.path.relpath(record['solution'], out_dir)
+    return entry
+
+def generate(make_case, params, cases, size, accept=None, workers=None, seed=0, engine=solver.DEFAULT_ENGINE,
+             time_budget=None, decision_budget=None, window=None, statuses=('SAT',), search=None,
+             out_dir='.', extension='.txt', codec='', use_cache=True, log=None):
+    '''Generates, solves and filters cases on a pool of worker processes.
+    Case i is made from the seed case_seed(seed, i), so a run can be
+    repeated exactly (with a SizeSearch, the sizes depend on the solving
+    times, but every record holds its size and seed). Only a few cases per
+    worker are queued at a time. Accepted cases are written to out_dir
+    together with a manifest (MANIFEST_NAME, the format of bench.py); every
+    other case is written to FAILURES_NAME with the reason it was dropped.
+    :param make_case - function generating a case, see run_case
+    :param params - parameters passed to make_case
+    :param cases - maximum number of cases generated
+    :param size - size passed to make_case (e.g. variables or vertices), the start of the search if there is one
+    :param accept - stop once this many cases are accepted, None to generate all cases
+    :param workers - number of worker processes, os.cpu_count() if None
+    :param seed - seed of the run
+    :param engine - name of the engine in solver.ENGINES
+    :param time_budget - seconds after which a case is given up as UNKNOWN, None for no limit
+    :param decision_budget - decisions after which a case is given up as UNKNOWN, None for no limit
+    :param window - (min, max) solving seconds of accepted cases, None to accept any
+    :param statuses - answers of accepted cases
+    :param search - a SizeSearch choosing the size of every new case, None to keep size
+    :param out_dir - directory of the formulas, the manifest and the failure log
+    :param extension - extension of the formula files (e.g. .txt or .bcnf), codec included
+    :param codec - compression extension of the solution files, empty for none
+    :param use_cache - flag to look up and store results in the result cache
+    :param log - function called with every record, None to stay silent
+
+    :returns accepted - the list of manifest entries
+    :returns counts - a dictionary {status : number of cases}
+    '''
+    workers = workers or os.cpu_count()
+    os.makedirs(out_dir, exist_ok=True)
+    accepted = []
+    counts = {}
+    base_task = {'params' : params, 'engine' : engine, 'time_budget' : time_budget, 'decision_budget' : decision_budget,
+                 'window' : window, 'statuses' : tuple(statuses), 'out_dir' : out_dir, 'extension' : extension,
+                 'codec' : codec, 'use_cache' : use_cache}
+    indices = iter(range(cases))
+    executor = Pool(workers, initializer=init_worker)
+    pending = set()
+    try:
+        with open(os.path.join(out_dir, FAILURES_NAME), 'w') as failures:
+            while True:
+                for index in indices:
+                    task = dict(base_task, index=index, seed=case_seed(seed, index), size=search.size if search else size)
+                    pending.add(executor.submit(run_case, make_case, task))
+                    if len(pending) >= 2 * workers:
+                        break
+                if not pending:
+                    # every worker is idle, so they can exit on their own
+                    executor.shutdown(wait=True)
+                    break
+                finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    record = future.result()
+                    counts[record['status']] = counts.get(record['status'], 0) + 1
+                    if search:
+                        search.update(record)
+                    if record['accepted']:
+                        accepted.append(manifest_entry(record, out_dir))
+                    else:
+                        failures.write(json.dumps(record) + '\n')
+                        failures.flush()
+                    if log:
+                        log(record)
+                if accept is not None and len(accepted) >= accept:
+                    break
+    finally:
+        stop(executor)
+        # written even when interrupted, so the cases accepted so far are listed
+        with open(os.path.join(out_dir, MANIFEST_NAME), 'w') as file_handle:
+            json.dump(sorted(accepted, key=lambda entry : entry['seed']), file_handle, indent=1)
+    return accepted, counts
+
+def format_record(record):
+    '''Returns a printable line describing a finished case.'''
+    return 'Case {:>4} (size {}): {:8} {:>12} {}{}'.format(
+        record['index'] + 1, record['search_size'], record['status'],
+        '{:.3f} s{}'.format(record['seconds'], '*' if record['cached'] else '') if record['seconds'] is not None else '-',
+        'written to {}'.format(record['path']) if record['accepted'] else 'dropped', ' ({})'.format(record['reason']) if record['reason'] else '')
@@ -0,0 +1,87 @@
+#!/usr/bin/python3
+
+from cdcl import CDCLSolver
+
+class Solver:
+    '''Incremental CDCL solver.
+
+    Clauses can be added between calls of solve and every call can fix some
+    literals with assumptions. The clause database, the learned clauses and
+    the branching heuristic's scores and saved phases are kept between calls,
+    so a sequence of related queries does not start from scratch every time.
+    Pure literal elimination is never used: a literal pure now need not be
+    pure once more clauses are added.
+    '''
+
+    def __init__(self, cnf=(), branch=None, phase_saving=None, stats=None):
+        '''
+        :param cnf - an iterable of disjunctions (iterables of literals) to start with
+        :param branch - name of the branching heuristic in branching.HEURISTICS, 'vsids' if None
+        :param phase_saving - flag to turn on/off phase saving, None for the heuristic's default
+        :param stats - a stats.Stats object to instrument the search with, None for no instrumentation
+        '''
+        self.engine = CDCLSolver([], purelit_elim=False, branch=branch, phase_saving=phase_saving)
+        self.engine.stats = stats
+        self.calls = 0
+        for dis in cnf:
+            self.add_clause(dis)
+
+    @property
+    def n_vars(self):
+        return self.engine.n_vars
+
+    def new_var(self):
+        '''Returns a fresh variable (e.g. to use as a selector in assumptions).'''
+        self.engine.grow(self.engine.n_vars + 1)
+        return self.engine.n_vars
+
+    def register(self, lits):
+        '''Makes the variables of lits part of the returned valuations.'''
+        engine = self.engine
+        for lit in lits:
+            if not engine.seen[abs(lit)]:
+                engine.seen[abs(lit)] = True
+                engine.order.append(abs(lit))
+
+    def add_clause(self, dis):
+        '''Adds a clause, new variables are created as they appear.
+        :param dis - an iterable of literals (one disjunction)
+
+        :returns False if the formula is now known to be unsatisfiable, True otherwise
+        '''
+        engine = self.engine
+        engine.backtrack(0)
+        lits = list(dict.fromkeys(dis))
+        engine.grow(max((abs(lit) for lit in lits), default=0))
+        # root assignments are permanent: satisfied clauses are dropped and false literals removed
+        if any(engine.value[lit] == 1 for lit in lits):
+            return not engine.empty
+        self.register([lit for lit in lits if engine.value[lit] == -1])
+        engine.add_input_clause([lit for lit in lits if engine.value[lit] == 0])
+        return not engine.empty
+
+    def solve(self, assumptions=()):
+        '''Solves the formula with the assumption literals fixed to True.
+        :param assumptions - an iterable of literals
+
+        :returns sat - boolean denoting the satisfiability of the formula under the assumptions
+        :returns vals - a dictionary containing one satisfiable valuation if sat is True,
+        otherwise the list of assumptions that together cannot hold (empty if the formula
+        is unsatisfiable without any assumption)
+        '''
+        engine = self.engine
+        assumptions = list(assumptions)
+        engine.grow(max((abs(lit) for lit in assumptions), default=0))
+        self.register(assumptions)
+        self.calls += 1
+        sat, vals = engine.solve(assumptions)
+        if not sat:
+            return False, engine.failed
+        return True, vals
+
+    def statistics(self):
+        '''Returns the counters accumulated over all calls.'''
+        engine = self.engine
+        return {'calls' : self.calls, 'decisions' : engine.decisions, 'conflicts' : engine.conflicts,
+                'propagations' : engine.propagations, 'learned' : engine.learned, 'deleted' : engine.deleted,
+                'restarts' : engine.restarts, 'learnts' : len(engine.learnts)}
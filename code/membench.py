@@ -0,0 +1,57 @@
+#!/usr/bin/python3
+
+import argparse
+import os
+import time
+import tracemalloc
+
+import solver
+from dimacs import load_cnf
+
+TEST_FILES = [
+    os.path.join('..', 'test', '4000_159410_-7349411764705733428.txt'),
+    os.path.join('..', 'test', '4350_163507_-4336599675638513225.txt'),
+]
+
+def measure(cnf, engine, unit_prop=True, purelit_elim=True):
+    '''Solves the cnf while tracing the memory allocated by the engine.
+    :param cnf - a list of sets (each set one disjunction), parsed before tracing starts
+    :param engine - name of the engine in solver.ENGINES
+    :param unit_prop - flag to turn on/off unit propagation, True by default
+    :param purelit_elim - flag to turn on/off pure literal elimination, True by default
+
+    :returns sat - boolean denoting the satisfiability of the formula
+    :returns seconds - the solving time (slowed down by tracing)
+    :returns peak - peak number of bytes allocated while solving
+    '''
+    tracemalloc.start()
+    time_begin = time.time()
+    sat, vals = solver.solve(cnf, engine, unit_prop, purelit_elim)
+    time_end = time.time()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return sat, time_end - time_begin, peak
+
+def main():
+    '''Main body of the program. Gets automatically called if this script is called from the command line.
+    '''
+    cli_parser = argparse.ArgumentParser(description='Compares the peak memory of the solving engines.')
+    cli_parser.add_argument('input_files', help='DIMACS files (the 4000 and 4350 literal colouring tests by default)', metavar='input-file', nargs='*')
+    cli_parser.add_argument('-e', '--engines', help='engines to compare, dpll and iterative by default', choices=solver.ENGINES, nargs='+', default=['dpll', 'iterative'])
+    cli_parser.add_argument('-nU', '--no-unit-prop', help='disable unit propagation', action='store_true')
+    cli_parser.add_argument('-nP', '--no-pure-elim', help='disable pure literal elimination', action='store_true')
+    cli_args = cli_parser.parse_args()
+
+    unit_prop = not cli_args.no_unit_prop
+    purelit_elim = not cli_args.no_pure_elim
+
+    print('{:<45} {:<10} {:<7} {:>10} {:>12}'.format('file', 'engine', 'result', 'seconds', 'peak MiB'))
+    for in_file_path in cli_args.input_files or TEST_FILES:
+        cnf = load_cnf(in_file_path).to_sets()
+        for engine in cli_args.engines:
+            sat, seconds, peak = measure(cnf, engine, unit_prop, purelit_elim)
+            print('{:<45} {:<10} {:<7} {:>10.2f} {:>12.2f}'.format(os.path.basename(in_file_path), engine,
+                                                                 'SAT' if sat else 'NONSAT', seconds, peak / 2**20))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,52 @@
+#!/usr/bin/python3
+
+import multiprocessing as mp
+import os
+import signal
+from concurrent.futures import ProcessPoolExecutor
+
+# kept apart from cube.py, which imports solver, so that components.py can use it without an import cycle
+
+class Pool(ProcessPoolExecutor):
+    '''A ProcessPoolExecutor whose workers report their pids when they start, so stop can kill them.'''
+
+    def __init__(self, max_workers=None, initializer=None, initargs=()):
+        '''
+        :param max_workers - number of worker processes, os.cpu_count() if None
+        :param initializer - function run in every worker when it starts, None for none
+        :param initargs - arguments of initializer
+        '''
+        self.pid_queue = mp.SimpleQueue()
+        self.pids = set()
+        super().__init__(max_workers, initializer=report_pid, initargs=(self.pid_queue, initializer, initargs))
+
+    def worker_pids(self):
+        '''Returns the pids of the workers started so far.'''
+        while not self.pid_queue.empty():
+            self.pids.add(self.pid_queue.get())
+        return self.pids
+
+    def shutdown(self, wait=True, *, cancel_futures=False):
+        super().shutdown(wait, cancel_futures=cancel_futures)
+        if wait:
+            # every worker has exited and its pid may be reused, so none is left to kill
+            self.worker_pids()
+            self.pids = set()
+
+def report_pid(pid_queue, initializer, initargs):
+    # a worker killed by stop dies quietly, whatever handler it inherited
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    pid_queue.put(os.getpid())
+    if initializer is not None:
+        initializer(*initargs)
+
+def stop(executor):
+    '''Kills the workers of a Pool, cancels its pending jobs and waits until the pool is closed.'''
+    for pid in executor.worker_pids():
+        try:
+            os.kill(pid, signal.SIGTERM)
+        except ProcessLookupError:
+            pass
+    # a single shutdown that waits: shutdown(wait=False) forgets the pool's thread, which
+    # would then be left running and race its exit hook (writing to a closed pipe)
+    executor.shutdown(wait=True, cancel_futures=True)
@@ -0,0 +1,187 @@
+#!/usr/bin/python3
+
+import multiprocessing as mp
+import queue
+import random as rd
+import signal
+from multiprocessing import shared_memory
+
+import solver
+from dimacs import FlatCNF
+from stats import Stats, BudgetExhausted
+
+# seconds between checks that some worker is still alive
+POLL_SECONDS = 0.1
+
+# configurations tried in this order, repeated with new seeds if there are more workers
+PORTFOLIO = [
+    {'engine' : 'iterative'},
+    {'engine' : 'cdcl', 'branch' : 'vsids'},
+    {'engine' : 'trail', 'branch' : 'first'},
+    {'engine' : 'cdcl', 'branch' : 'jw'},
+    {'engine' : 'iterative', 'purelit_elim' : False},
+    {'engine' : 'trail', 'branch' : 'vsids', 'polarity' : 'negative'},
+    {'engine' : 'cdcl', 'branch' : 'vsids', 'polarity' : 'random'},
+    {'engine' : 'trail', 'branch' : 'moms'},
+    {'engine' : 'cdcl', 'branch' : 'dlis', 'phase_saving' : False},
+    {'engine' : 'dpll', 'polarity' : 'negative'},
+]
+
+def make_configs(n_workers):
+    '''Returns n_workers configurations, the later rounds with new random seeds.
+
+    Every configuration is a dictionary with the keys engine, unit_prop,
+    purelit_elim, branch, phase_saving, polarity ('default', 'negative' or
+    'random') and seed. A non-zero seed shuffles the order of the clauses.
+    '''
+    configs = []
+    for i in range(n_workers):
+        config = {'unit_prop' : True, 'purelit_elim' : True, 'branch' : None,
+                  'phase_saving' : None, 'polarity' : 'default', 'seed' : i // len(PORTFOLIO)}
+        config.update(PORTFOLIO[i % len(PORTFOLIO)])
+        configs.append(config)
+    return configs
+
+def describe(config):
+    '''Returns a one line description of a configuration.'''
+    return ' '.join('{}={}'.format(key, config[key]) for key in
+                    ('engine', 'branch', 'polarity', 'seed', 'unit_prop', 'purelit_elim', 'phase_saving'))
+
+def apply_config(cnf, config):
+    '''Shuffles the clauses and flips variables as the configuration says.
+    Flipping a variable (replacing it by its negation everywhere) makes the
+    engines try its other value first.
+    :param cnf - a list of sets (each set one disjunction)
+    :param config - a configuration from make_configs
+
+    :returns cnf - the new list of sets
+    :returns flipped - the set of flipped variables
+    '''
+    gen = rd.Random(config['seed'])
+    variables = {abs(lit) for dis in cnf for lit in dis}
+    if config['polarity'] == 'negative':
+        flipped = variables
+    elif config['polarity'] == 'random':
+        flipped = {var for var in variables if gen.getrandbits(1)}
+    else:
+        flipped = set()
+    if flipped:
+        cnf = [{-lit if abs(lit) in flipped else lit for lit in dis} for dis in cnf]
+    if config['seed']:
+        cnf = list(cnf)
+        gen.shuffle(cnf)
+    return cnf, flipped
+
+def share(flat):
+    '''Copies the arrays of a FlatCNF into shared memory blocks.
+
+    :returns blocks - the SharedMemory objects (to be closed and unlinked by the caller)
+    :returns layout - (lits block name, number of literals, offsets block name, number of clauses + 1, n_vars)
+    '''
+    blocks = []
+    layout = []
+    for arr in (flat.lits, flat.offsets):
+        block = shared_memory.SharedMemory(create=True, size=max(1, len(arr) * arr.itemsize))
+        block.buf[:len(arr) * arr.itemsize] = arr.tobytes()
+        blocks.append(block)
+        layout.extend((block.name, len(arr)))
+    layout.append(flat.n_vars)
+    return blocks, tuple(layout)
+
+def attach(layout):
+    '''Rebuilds the list of sets from the shared memory blocks described by layout.'''
+    lits_name, n_lits, offsets_name, n_offsets, n_vars = layout
+    lits_block = shared_memory.SharedMemory(name=lits_name)
+    offsets_block = shared_memory.SharedMemory(name=offsets_name)
+    lits = lits_block.buf[:n_lits * 4].cast('i')
+    offsets = offsets_block.buf[:n_offsets * 8].cast('q')
+    cnf = FlatCNF(lits, offsets, n_vars).to_sets()
+    lits.release()
+    offsets.release()
+    lits_block.close()
+    offsets_block.close()
+    return cnf
+
+def worker(index, layout, config, results, budgets=None):
+    '''Solves the shared formula with one configuration and puts (index, sat, vals, counters) in results.
+    counters are the counters of the run (Stats.as_dict), None if there are no budgets (keyword arguments of Stats).
+    '''
+    # the parent handles interrupts and terminates the workers
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    cnf, flipped = apply_config(attach(layout), config)
+    stats = Stats(**budgets) if budgets is not None else None
+    sat, vals = solver.solve(cnf, config['engine'], config['unit_prop'], config['purelit_elim'],
+                             branch=config['branch'], phase_saving=config['phase_saving'], stats=stats)
+    if sat:
+        vals = {var : (not val if var in flipped else val) for var, val in vals.items()}
+    results.put((index, sat, vals, stats.as_dict() if stats is not None else None))
+
+def wait_result(results, workers, stats=None):
+    '''Takes the next answer from the results queue while any worker is alive.
+    With stats, its time and memory budgets are checked while waiting.
+
+    :returns the (index, sat, vals, counters) of the answer
+    :raises stats.BudgetExhausted once no worker is left or a budget ran out
+    '''
+    while True:
+        try:
+            return results.get(timeout=POLL_SECONDS)
+        except queue.Empty:
+            pass
+        if stats is not None:
+            stats.tick()
+        if not any(process.is_alive() for process in workers):
+            # a worker may have put its answer just before exiting
+            try:
+                return results.get(timeout=POLL_SECONDS)
+            except queue.Empty:
+                codes = ', '.join(str(process.exitcode) for process in workers)
+                raise BudgetExhausted('every portfolio worker died (exit codes {})'.format(codes))
+
+def solve_portfolio(cnf, n_workers, configs=None, stats=None):
+    '''Races n_workers differently configured solvers on the cnf and returns the first answer.
+    The formula is put into shared memory once instead of being pickled for
+    every worker. As soon as one worker answers, the others are terminated.
+    With stats, its time budget is checked while waiting and every worker
+    gets its decision and memory budgets; the counters of the workers that
+    finished are added to it. A worker out of budget gives up, the run only
+    when all of them did.
+    :param cnf - a list of sets (each set one disjunction)
+    :param n_workers - number of worker processes
+    :param configs - list of configurations, make_configs(n_workers) if None
+    :param stats - a stats.Stats object collecting the counters and holding the budgets, None by default
+
+    :returns sat - boolean denoting the satisfiability of the formula
+    :returns vals - a dictionary containing one satisfiable valuation, None if sat is False
+    :returns config - the configuration of the winning worker
+    :raises stats.BudgetExhausted if a budget ran out or every worker died without an answer (e.g. dpll running out of stack)
+    '''
+    if configs is None:
+        configs = make_configs(n_workers)
+    blocks, layout = share(FlatCNF.from_sets(cnf))
+    results = mp.Queue()
+    budgets = stats.budgets() if stats is not None else None
+    workers = [mp.Process(target=worker, args=(i, layout, configs[i], results, budgets), daemon=True)
+               for i in range(len(configs))]
+    try:
+        for process in workers:
+            process.start()
+        for n_answers in range(1, len(workers) + 1):
+            index, sat, vals, counters = wait_result(results, workers, stats)
+            if counters is not None:
+                stats.merge(counters)
+            if sat is not solver.UNKNOWN:
+                break
+            if n_answers == len(workers):
+                raise BudgetExhausted(counters['reason'])
+    finally:
+        for process in workers:
+            if process.is_alive():
+                process.terminate()
+        for process in workers:
+            process.join()
+        for block in blocks:
+            block.close()
+            block.unlink()
+    return sat, vals, configs[index]
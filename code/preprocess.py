@@ -0,0 +1,232 @@
+#!/usr/bin/python3
+
+import time
+
+class Preprocessor:
+    '''Simplifies a cnf before solving, SatELite style.
+
+    Clauses are kept as frozensets in a list (None once deleted) together
+    with occurrence lists mapping each literal to the indices of the
+    clauses containing it, so every pass only looks at clauses sharing a
+    literal with the clause or variable at hand. Eliminated variables are
+    pushed on a stack with the clauses removed with them, which is what
+    extend_model needs to rebuild their values. The passes check the
+    budgets of the stats attribute (a stats.Stats object, None by default)
+    as they go.
+    '''
+
+    def __init__(self, cnf):
+        '''Normalizes the cnf: tautologies and duplicate clauses are dropped.
+        :param cnf - a list of sets (each set one disjunction)
+        '''
+        self.clauses = []
+        self.occ = {}
+        self.stack = []
+        self.counts = {'tautologies' : 0, 'duplicates' : 0, 'subsumed' : 0,
+                       'strengthened' : 0, 'eliminated' : 0, 'resolvents' : 0}
+        self.empty = False
+        self.stats = None
+
+        seen = set()
+        for dis in cnf:
+            clause = frozenset(dis)
+            if any(-lit in clause for lit in clause if lit > 0):
+                self.counts['tautologies'] += 1
+                continue
+            if clause in seen:
+                self.counts['duplicates'] += 1
+                continue
+            seen.add(clause)
+            self.add(clause)
+
+    def add(self, clause):
+        '''Adds a clause and returns its index.'''
+        idx = len(self.clauses)
+        self.clauses.append(clause)
+        for lit in clause:
+            self.occ.setdefault(lit, set()).add(idx)
+        if not clause:
+            self.empty = True
+        return idx
+
+    def remove(self, idx):
+        for lit in self.clauses[idx]:
+            self.occ[lit].discard(idx)
+        self.clauses[idx] = None
+
+    def strengthen(self, idx, lit):
+        '''Removes lit from the clause at idx.'''
+        self.occ[lit].discard(idx)
+        self.clauses[idx] = self.clauses[idx] - {lit}
+        if not self.clauses[idx]:
+            self.empty = True
+        self.counts['strengthened'] += 1
+
+    def cnf(self):
+        '''Returns the simplified cnf as a list of sets (each set one disjunction).'''
+        return [set(clause) for clause in self.clauses if clause is not None]
+
+    def subsume(self, queue, subsumption=True, strengthening=True):
+        '''Backward subsumption and self-subsuming resolution with the clauses in queue.
+        Every clause D containing a queued clause C is deleted. With
+        strengthening, if C with one literal l negated is contained in D, -l
+        is removed from D (D resolved with C subsumes D), and D is queued
+        again since it got shorter.
+        :param queue - a list of clause indices
+        :param subsumption - flag to turn on/off subsumption, True by default
+        :param strengthening - flag to turn on/off self-subsuming resolution, True by default
+        '''
+        clauses = self.clauses
+        occ = self.occ
+        queue = sorted(queue, key=lambda idx : len(clauses[idx]) if clauses[idx] is not None else 0, reverse=True)
+        queued = set(queue)
+        stats = self.stats
+        while queue:
+            if stats is not None:
+                stats.tick()
+            idx = queue.pop()
+            queued.discard(idx)
+            clause = clauses[idx]
+            if not clause:
+                continue
+
+            # clauses containing every literal of clause, smallest occurrence list first
+            lits = sorted(clause, key=lambda lit : len(occ[lit]))
+            if subsumption:
+                for other in set.intersection(*[occ[lit] for lit in lits]):
+                    if other != idx:
+                        self.remove(other)
+                        self.counts['subsumed'] += 1
+
+            if not strengthening:
+                continue
+            for lit in lits:
+                candidates = occ.get(-lit)
+                if not candidates:
+                    continue
+                for other in candidates.intersection(*[occ[rest] for rest in lits if rest != lit]):
+                    self.strengthen(other, -lit)
+                    if other not in queued:
+                        queued.add(other)
+                        queue.append(other)
+
+    def resolvents(self, var, max_resolvents, max_length):
+        '''Computes the non-tautological resolvents of the clauses of var and -var.
+
+        :returns a list of resolvents, None if there are more than max_resolvents or one is longer than max_length
+        '''
+        clauses = self.clauses
+        result = []
+        for pos in self.occ.get(var, ()):
+            pos_rest = clauses[pos] - {var}
+            for neg in self.occ.get(-var, ()):
+                resolvent = pos_rest | (clauses[neg] - {-var})
+                if any(-lit in resolvent for lit in resolvent if lit > 0):
+                    continue
+                if len(resolvent) > max_length or len(result) >= max_resolvents:
+                    return None
+                result.append(frozenset(resolvent))
+        return result
+
+    def eliminate(self, max_occurrences=20, max_length=20, subsumption=True, strengthening=True):
+        '''Bounded variable elimination: a variable is replaced by all resolvents of
+        its clauses if that does not increase the number of clauses.
+        Variables are tried in order of the product of their positive and
+        negative occurrence counts.
+        :param max_occurrences - variables with more occurrences of one sign are skipped
+        :param max_length - eliminations producing a longer resolvent are skipped
+        :param subsumption - flag to turn on/off subsumption with the resolvents
+        :param strengthening - flag to turn on/off self-subsuming resolution with the resolvents
+        '''
+        occ = self.occ
+        variables = {abs(lit) for lit in occ if occ[lit]}
+        order = sorted(variables, key=lambda var : len(occ.get(var, ())) * len(occ.get(-var, ())))
+        stats = self.stats
+        for var in order:
+            if self.empty:
+                return
+            if stats is not None:
+                stats.tick()
+            pos = occ.get(var, set())
+            neg = occ.get(-var, set())
+            if not pos and not neg:
+                continue
+            if len(pos) > max_occurrences or len(neg) > max_occurrences:
+                continue
+            resolvents = self.resolvents(var, len(pos) + len(neg), max_length)
+            if resolvents is None:
+                continue
+            removed = list(pos | neg)
+            self.stack.append((var, [self.clauses[idx] for idx in removed]))
+            for idx in removed:
+                self.remove(idx)
+            added = [self.add(resolvent) for resolvent in set(resolvents)]
+            self.counts['eliminated'] += 1
+            self.counts['resolvents'] += len(added)
+            if subsumption or strengthening:
+                self.subsume(added, subsumption, strengthening)
+
+
+def count_vars(cnf):
+    return len({abs(lit) for dis in cnf for lit in dis})
+
+def preprocess(cnf, subsumption=True, strengthening=True, elimination=True, max_occurrences=20, max_length=20, stats=None):
+    '''Runs the preprocessing passes on a cnf.
+    :param cnf - a list of sets (each set one disjunction)
+    :param subsumption - flag to turn on/off subsumption, True by default
+    :param strengthening - flag to turn on/off self-subsuming resolution, True by default
+    :param elimination - flag to turn on/off bounded variable elimination, True by default
+    :param max_occurrences - elimination skips variables with more occurrences of one sign, 20 by default
+    :param max_length - elimination skips variables that produce a longer resolvent, 20 by default
+    :param stats - a stats.Stats object whose budgets are checked, None by default
+
+    :returns new_cnf - the simplified list of sets (each set one disjunction)
+    :returns stack - the elimination stack needed by extend_model
+    :returns summary - a dictionary with the reduction summary
+    '''
+    time_begin = time.time()
+    prep = Preprocessor(cnf)
+    prep.stats = stats
+    if subsumption or strengthening:
+        prep.subsume(range(len(prep.clauses)), subsumption, strengthening)
+    if elimination and not prep.empty:
+        prep.eliminate(max_occurrences, max_length, subsumption, strengthening)
+    new_cnf = prep.cnf()
+    # variables left only in dropped tautologies or subsumed clauses are pushed
+    # without clauses, last, so extend_model sets them False before anything else
+    kept = {abs(lit) for dis in new_cnf for lit in dis} | {var for var, _ in prep.stack}
+    prep.stack.extend((var, []) for var in sorted({abs(lit) for dis in cnf for lit in dis} - kept))
+    time_end = time.time()
+
+    summary = dict(prep.counts)
+    summary.update({'vars_before' : count_vars(cnf), 'clauses_before' : len(cnf),
+                    'vars_after' : count_vars(new_cnf), 'clauses_after' : len(new_cnf),
+                    'seconds' : time_end - time_begin})
+    return new_cnf, prep.stack, summary
+
+def extend_model(vals, stack):
+    '''Extends a model of the preprocessed cnf to a model of the original cnf.
+    Eliminated variables are set in reverse order of elimination: False,
+    unless one of the clauses removed with the variable is then falsified.
+    Variables missing from vals are taken as False. Variables of the
+    original cnf that vanished without being eliminated (only found in
+    tautologies or subsumed clauses) are on the stack with no clauses.
+    :param vals - a dictionary containing a satisfiable valuation of the preprocessed cnf
+    :param stack - the elimination stack returned by preprocess
+
+    :returns vals - a new dictionary that also assigns the eliminated variables
+    '''
+    vals = dict(vals)
+    for var, clauses in reversed(stack):
+        vals[var] = False
+        for clause in clauses:
+            if not any(vals.setdefault(abs(lit), False) == (lit > 0) for lit in clause):
+                vals[var] = True
+                break
+    return vals
+
+def format_summary(summary):
+    '''Returns the reduction summary as printable lines.'''
+    return ('Preprocessing: {vars_before} -> {vars_after} variables, {clauses_before} -> {clauses_after} clauses in {seconds:f} seconds\n'
+            '  tautologies: {tautologies}, duplicates: {duplicates}, subsumed: {subsumed}, strengthened: {strengthened}, '
+            'eliminated variables: {eliminated} ({resolvents} resolvents)').format(**summary)
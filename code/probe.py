@@ -0,0 +1,357 @@
+#!/usr/bin/python3
+
+import argparse
+import glob
+import os
+import sys
+import time
+
+from trail import TrailSolver
+from dimacs import load_cnf
+from preprocess import count_vars
+
+# default time budget of the probing stage in seconds
+DEFAULT_MAX_SECONDS = 10
+
+class Prober:
+    '''Failed literal probing and equivalent literal substitution.
+
+    Every candidate literal is assigned on the trail of a TrailSolver at a
+    new decision level and propagated, then undone. A literal whose
+    propagation conflicts is a failed literal and its negation is fixed at
+    the root; a literal implied by both phases of a variable is fixed too.
+    Below the root, probing goes on up to the given depth: a literal y that
+    fails under a probed literal x yields the clause (-x, -y), with the
+    negations of the probes enclosing x added below depth 2 (y only fails
+    under all of them). The binary clauses form an implication graph whose strongly connected
+    components are sets of equivalent literals, each replaced by one
+    representative. Rounds are repeated while they find something and the
+    time budget lasts. Every probe also checks the budgets of the stats
+    attribute (a stats.Stats object, None by default).
+    '''
+
+    def __init__(self, cnf, depth=1, max_seconds=DEFAULT_MAX_SECONDS, width=20):
+        '''
+        :param cnf - a list of sets (each set one disjunction)
+        :param depth - probing depth, 1 probes single literals at the root
+        :param max_seconds - time budget, None for no limit
+        :param width - number of the most frequent free variables probed below the root
+        '''
+        self.clauses = [set(dis) for dis in cnf]
+        self.depth = depth
+        self.deadline = time.perf_counter() + max_seconds if max_seconds is not None else None
+        self.width = width
+        # root assignments {variable : boolean} and substitutions [(variable, literal)] in the order made
+        self.fixed = {}
+        self.equivalent = []
+        self.learned = []
+        self.unsat = False
+        self.stats = None
+        self.counts = {'failed' : 0, 'implied' : 0, 'equivalent' : 0, 'learned' : 0, 'probes' : 0, 'rounds' : 0}
+
+    def out_of_time(self):
+        return self.deadline is not None and time.perf_counter() > self.deadline
+
+    def fix(self, engine, lit):
+        '''Assigns lit at the root and propagates, returns False on a conflict.'''
+        if engine.value[lit] == 1:
+            return True
+        if engine.value[lit] == -1:
+            return False
+        engine.enqueue(lit)
+        return engine.propagate() is None
+
+    def probe_lit(self, engine, lit, depth, candidates, path=()):
+        '''Assigns lit at a new decision level, propagates and probes below it up to depth.
+        path holds the probed literals lit is assigned under, outermost first.
+
+        :returns the literals implied by lit (lit included), None if lit fails
+        '''
+        level = engine.decision_level()
+        engine.new_decision_level()
+        lim = len(engine.trail)
+        engine.enqueue(lit)
+        self.counts['probes'] += 1
+        if self.stats is not None:
+            self.stats.tick()
+        failed = engine.propagate() is not None
+        if not failed and depth > 1:
+            value = engine.value
+            for var in [var for var in candidates if not value[var]][:self.width]:
+                if value[var]:
+                    continue
+                inner = path + (lit,)
+                pos = self.probe_lit(engine, var, depth - 1, candidates, inner)
+                neg = self.probe_lit(engine, -var, depth - 1, candidates, inner)
+                if pos is None and neg is None:
+                    failed = True
+                    break
+                if pos is None or neg is None:
+                    # lit (under the enclosing probes) implies the negation of the failed literal
+                    other = var if pos is None else -var
+                    self.learned.append({-probed for probed in inner} | {-other})
+                    engine.enqueue(-other)
+                    if engine.propagate() is not None:
+                        failed = True
+                        break
+        implied = None if failed else engine.trail[lim:]
+        engine.backtrack(level)
+        return implied
+
+    def probe_round(self):
+        '''Probes every free variable once, most frequent first.
+
+        :returns True if anything was fixed or learned
+        '''
+        engine = TrailSolver(self.clauses, purelit_elim=False)
+        if not engine.simplify_root():
+            self.unsat = True
+            return False
+        occurrences = {}
+        for dis in self.clauses:
+            for lit in dis:
+                occurrences[abs(lit)] = occurrences.get(abs(lit), 0) + 1
+        candidates = sorted(occurrences, key=lambda var : -occurrences[var])
+        value = engine.value
+        n_learned = len(self.learned)
+        for var in candidates:
+            if self.out_of_time():
+                break
+            if value[var]:
+                continue
+            pos = self.probe_lit(engine, var, self.depth, candidates)
+            neg = self.probe_lit(engine, -var, self.depth, candidates)
+            if pos is None and neg is None:
+                self.unsat = True
+                return False
+            if pos is None or neg is None:
+                self.counts['failed'] += 1
+                if not self.fix(engine, var if neg is None else -var):
+                    self.unsat = True
+                    return False
+                continue
+            for lit in set(pos).intersection(neg):
+                self.counts['implied'] += 1
+                if not self.fix(engine, lit):
+                    self.unsat = True
+                    return False
+
+        new_fixed = {abs(lit) : lit > 0 for lit in engine.trail}
+        self.fixed.update(new_fixed)
+        self.counts['learned'] += len(self.learned) - n_learned
+        self.clauses.extend(self.learned[n_learned:])
+        self.assign(new_fixed)
+        return bool(new_fixed) or len(self.learned) > n_learned
+
+    def assign(self, fixed):
+        '''Drops the clauses satisfied by fixed and removes its false literals from the rest.'''
+        clauses = []
+        for dis in self.clauses:
+            if any(fixed.get(abs(lit)) == (lit > 0) for lit in dis if abs(lit) in fixed):
+                continue
+            clauses.append({lit for lit in dis if abs(lit) not in fixed})
+        self.clauses = clauses
+        if any(not dis for dis in clauses):
+            self.unsat = True
+
+    def substitute_equivalences(self):
+        '''Replaces every strongly connected component of the binary implication graph by one literal.
+
+        :returns True if any literal was substituted
+        '''
+        graph = {}
+        for dis in self.clauses:
+            if len(dis) == 2:
+                a, b = dis
+                graph.setdefault(-a, []).append(b)
+                graph.setdefault(-b, []).append(a)
+        substitute = {}
+        for component in strongly_connected(graph):
+            if len(component) < 2:
+                continue
+            if len({abs(lit) for lit in component}) < len(component):
+                # a literal equivalent to its own negation
+                self.unsat = True
+                return False
+            rep = min(component, key=abs)
+            for lit in component:
+                if lit != rep and abs(lit) not in substitute:
+                    substitute[abs(lit)] = rep if lit > 0 else -rep
+        if not substitute:
+            return False
+        clauses = []
+        seen = set()
+        for dis in self.clauses:
+            new_dis = frozenset(substitute.get(lit, lit) if lit > 0 else -substitute.get(-lit, -lit) for lit in dis)
+            if any(-lit in new_dis for lit in new_dis if lit > 0) or new_dis in seen:
+                continue
+            seen.add(new_dis)
+            clauses.append(set(new_dis))
+        self.clauses = clauses
+        self.equivalent.extend(substitute.items())
+        self.counts['equivalent'] += len(substitute)
+        return True
+
+    def run(self, equivalences=True):
+        '''Alternates probing rounds and substitution until neither finds anything or time runs out.'''
+        while not self.unsat:
+            self.counts['rounds'] += 1
+            changed = self.probe_round()
+            if self.unsat:
+                break
+            if equivalences:
+                changed = self.substitute_equivalences() or changed
+            if not changed or self.out_of_time():
+                break
+
+def strongly_connected(graph):
+    '''Tarjan's algorithm with an explicit stack.
+    :param graph - a dictionary {node : list of successors}
+
+    :returns a list of strongly connected components (lists of nodes)
+    '''
+    index = {}
+    low = {}
+    stack = []
+    on_stack = set()
+    components = []
+    for start in graph:
+        if start in index:
+            continue
+        index[start] = low[start] = len(index)
+        stack.append(start)
+        on_stack.add(start)
+        work = [(start, iter(graph.get(start, ())))]
+        while work:
+            node, successors = work[-1]
+            for succ in successors:
+                if succ not in index:
+                    index[succ] = low[succ] = len(index)
+                    stack.append(succ)
+                    on_stack.add(succ)
+                    work.append((succ, iter(graph.get(succ, ()))))
+                    break
+                if succ in on_stack:
+                    low[node] = min(low[node], index[succ])
+            else:
+                work.pop()
+                if work:
+                    parent = work[-1][0]
+                    low[parent] = min(low[parent], low[node])
+                if low[node] == index[node]:
+                    component = []
+                    while True:
+                        member = stack.pop()
+                        on_stack.discard(member)
+                        component.append(member)
+                        if member == node:
+                            break
+                    components.append(component)
+    return components
+
+def probe(cnf, depth=1, max_seconds=DEFAULT_MAX_SECONDS, equivalences=True, stats=None):
+    '''Runs the probing stage on a cnf.
+    :param cnf - a list of sets (each set one disjunction)
+    :param depth - probing depth, 1 (root only) by default
+    :param max_seconds - time budget, DEFAULT_MAX_SECONDS by default, None for no limit
+    :param equivalences - flag to turn on/off equivalent literal substitution, True by default
+    :param stats - a stats.Stats object whose budgets are checked, None by default
+
+    :returns new_cnf - the simplified list of sets, [set()] if the cnf was found unsatisfiable
+    :returns reconstruction - (fixed, equivalent, free), what extend_model needs
+    :returns summary - a dictionary with the counters and the reduction summary
+    '''
+    time_begin = time.time()
+    prober = Prober(cnf, depth, max_seconds)
+    prober.stats = stats
+    prober.run(equivalences)
+    new_cnf = [set()] if prober.unsat else prober.clauses
+    # variables whose clauses were all satisfied by the fixed ones can take any value
+    substituted = {var for var, _ in prober.equivalent}
+    remaining = {abs(lit) for dis in new_cnf for lit in dis}
+    free = [var for var in {abs(lit) for dis in cnf for lit in dis}
+            if var not in remaining and var not in prober.fixed and var not in substituted]
+    time_end = time.time()
+
+    summary = dict(prober.counts)
+    summary.update({'unsat' : prober.unsat, 'fixed' : len(prober.fixed),
+                    'vars_before' : count_vars(cnf), 'clauses_before' : len(cnf),
+                    'vars_after' : count_vars(new_cnf), 'clauses_after' : len(new_cnf),
+                    'seconds' : time_end - time_begin})
+    return new_cnf, (prober.fixed, prober.equivalent, free), summary
+
+def extend_model(vals, reconstruction):
+    '''Extends a model of the probed cnf to a model of the original cnf.
+    Fixed variables get their root values, free ones False and substituted
+    variables the value of their representative literal, latest
+    substitution first.
+    :param vals - a dictionary containing a satisfiable valuation of the probed cnf
+    :param reconstruction - the reconstruction returned by probe
+
+    :returns vals - a new dictionary that also assigns the fixed and substituted variables
+    '''
+    fixed, equivalent, free = reconstruction
+    vals = dict(vals)
+    vals.update(fixed)
+    for var in free:
+        vals.setdefault(var, False)
+    for var, lit in reversed(equivalent):
+        vals[var] = vals.setdefault(abs(lit), False) == (lit > 0)
+    return vals
+
+def check(cnf, new_cnf, reconstruction, engine='cdcl'):
+    '''Tells whether probing kept the answer: the probed cnf is satisfiable exactly when
+    the original is, and its models extend to models of the original.
+    :param cnf - the original cnf
+    :param new_cnf, reconstruction - what probe returned for it
+    :param engine - name of the engine in solver.ENGINES solving both
+
+    :returns True if the answers agree
+    '''
+    # solver imports this module, so it is only imported when a check runs
+    import solver
+    sat, _ = solver.solve([set(dis) for dis in cnf], engine)
+    new_sat, vals = solver.solve([set(dis) for dis in new_cnf], engine)
+    if bool(sat) != bool(new_sat):
+        return False
+    return not new_sat or solver.verify_solution(cnf, extend_model(vals, reconstruction))
+
+def format_summary(summary):
+    '''Returns the probing summary as printable lines.'''
+    return ('Probing: {vars_before} -> {vars_after} variables, {clauses_before} -> {clauses_after} clauses in {seconds:f} seconds{verdict}\n'
+            '  fixed variables: {fixed} ({failed} failed literals, {implied} implied by both phases), '
+            'equivalent literals: {equivalent}, learned clauses: {learned}, probes: {probes}, rounds: {rounds}').format(
+                verdict=', unsatisfiable' if summary['unsat'] else '', **summary)
+
+def main():
+    '''Main body of the program. Gets automatically called if this script is called from the command line.
+    '''
+    cli_parser = argparse.ArgumentParser(description='Reports what probing finds on DIMACS files.')
+    cli_parser.add_argument('files', help='DIMACS files, the test directories by default', metavar='file', nargs='*')
+    cli_parser.add_argument('-d', '--depth', help='probing depth, 1 by default', type=int, default=1)
+    cli_parser.add_argument('-t', '--time-budget', help='seconds per file, {} by default'.format(DEFAULT_MAX_SECONDS),
+                            metavar='SECONDS', type=float, default=DEFAULT_MAX_SECONDS)
+    cli_parser.add_argument('--no-equivalences', help='disable equivalent literal substitution', action='store_true')
+    cli_parser.add_argument('-c', '--check', help='also solve every file with and without probing and fail if the answers differ', action='store_true')
+    cli_args = cli_parser.parse_args()
+
+    files = cli_args.files or sorted(path for pattern in (os.path.join('..', 'test', '*'), os.path.join('test', '*'))
+                                     for path in glob.glob(pattern) if not path.endswith('_solution.txt'))
+    print('{:<48} {:>7} {:>7} {:>7} {:>7} {:>9} {:>9} {:>9}'.format('file', 'vars', 'fixed', 'failed', 'equiv', 'clauses', 'after', 'seconds'))
+    mismatches = 0
+    for path in files:
+        cnf = load_cnf(path).to_sets()
+        new_cnf, reconstruction, summary = probe(cnf, cli_args.depth, cli_args.time_budget, not cli_args.no_equivalences)
+        verdict = '  UNSAT' if summary['unsat'] else ''
+        if cli_args.check and not check(cnf, new_cnf, reconstruction):
+            mismatches += 1
+            verdict += '  MISMATCH'
+        print('{:<48} {:>7} {:>7} {:>7} {:>7} {:>9} {:>9} {:>9.3f}{}'.format(
+            path, summary['vars_before'], summary['fixed'], summary['failed'], summary['equivalent'],
+            summary['clauses_before'], summary['clauses_after'], summary['seconds'], verdict), flush=True)
+    if mismatches:
+        print('{} files answered differently after probing'.format(mismatches))
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -2,11 +2,13 @@
 
 import argparse
 import random as rd
+import signal
 import sys
-import time
 import os
 
+import genpool
 import solver
+from dimacs import FlatCNF, BINARY_EXTENSION, CODECS, is_binary, write_binary, open_file
 
 GEN_PATH = os.path.join('..', 'randgenerated')
 
@@ -46,90 +48,129 @@ def cnf_to_dimacs(cnf, n_lits, n_clauses, dis_size, file_name, params=''):
     :param n_lits - number of literals we want in the formula (some may be skipped)
     :param n_clauses - number of clauses we want the formula to contain
     :param dis_size - the max number of literals we want in one clause
-    :param file_name - the name of the file we want to create
+    :param file_name - the name of the file we want to create, binary if it ends with dimacs.BINARY_EXTENSION, compressed if it ends with one of dimacs.CODECS
     :param params - additional information we want to add as a comment, empty by default
 
     :returns None
     '''
-    dimacs = open(file_name, 'w+')
-    dimacs.write('c This file was generated automatically by randgen.py\n')
-    dimacs.write('c\n')
-    dimacs.write('c params: ' + params + '\n')
-    dimacs.write('p cnf: {0} {1}, max disjunction size {2}\n'.format(str(n_lits),
-                                                                   str(n_clauses),
-                                                                   str(dis_size)))
-    for dis in cnf:
-        for lit in dis:
-            dimacs.write(str(lit) + ' ')
-        dimacs.write('0\n')
-    dimacs.close()
+    if is_binary(file_name):
+        # the binary format has no room for the comments
+        flat = FlatCNF.from_sets(cnf)
+        flat.n_vars = max(flat.n_vars, n_lits)
+        write_binary(flat, file_name)
+        return
+    lines = ['c This file was generated automatically by randgen.py', 'c', 'c params: ' + params,
+             'p cnf: {0} {1}, max disjunction size {2}'.format(str(n_lits), str(n_clauses), str(dis_size))]
+    lines.extend(' '.join(map(str, [*dis, 0])) for dis in cnf)
+    with open_file(file_name, 'w') as dimacs:
+        dimacs.write('\n'.join(lines) + '\n')
+
+def generate_ksat(n_lits, n_clauses, dis_size):
+    '''Generates a uniform random k-SAT formula, with no planted solution.
+    Every clause has dis_size distinct variables, each negated with probability 1/2.
+    Around n_clauses / n_lits = 4.26 (for dis_size 3) half of these formulas
+    are satisfiable and they are the hardest to solve.
+    :param n_lits - number of variables
+    :param n_clauses - number of clauses
+    :param dis_size - number of literals in every clause
+
+    :returns cnf - a list of sets (each set one disjunction)
+    '''
+    variables = range(1, n_lits + 1)
+    return [{lit if rd.getrandbits(1) else -lit for lit in rd.sample(variables, dis_size)} for _ in range(n_clauses)]
+
+def make_case(params, n_lits, seed):
+    '''Generates one case for genpool.generate.
+    :param params - a dictionary with dis_size, uniform (flag to use generate_ksat instead of
+    generate_cnf) and either clauses (number of clauses) or ratio (a (low, high) range the
+    clause to variable ratio is drawn from)
+    :param n_lits - number of variables
+    :param seed - seed of the case
+
+    :returns cnf - a list of sets (each set one disjunction)
+    :returns meta - the description of the case, see genpool.run_case
+    '''
+    n_clauses = params['clauses']
+    if params['ratio']:
+        n_clauses = max(1, round(rd.Random(seed).uniform(*params['ratio']) * n_lits))
+    dis_size = params['dis_size']
+    # bench.py regenerates the formula from vars, clauses, size and seed
+    rd.seed(seed)
+    if params['uniform']:
+        cnf = generate_ksat(n_lits, n_clauses, dis_size)
+    else:
+        cnf = generate_cnf(n_lits, n_clauses, dis_size)
+    meta = {'name' : '{}_{}_{}'.format(n_lits, n_clauses, dis_size), 'family' : 'ksat' if params['uniform'] else 'random',
+            'vars' : n_lits, 'clauses' : n_clauses, 'size' : dis_size, 'n_vars' : n_lits,
+            'comment' : 'This file was generated automatically by randgen.py\n\nparams: vars={} clauses={} size={} seed={}'.format(
+                n_lits, n_clauses, dis_size, seed)}
+    return cnf, meta
 
 def main():
     '''Main body of the program. Gets automatically called if this script is called from the command line.
     '''
-    # create directory for dumping
-    if not os.path.exists(GEN_PATH):
-        os.mkdir(GEN_PATH)
-
     # parse command line arguments
     cli_parser = argparse.ArgumentParser()
-    cli_parser.add_argument('num_lits', help='number of literals', metavar='num-lits')
-    cli_parser.add_argument('num_clauses', help='number of clauses', metavar='num-clauses')
-    cli_parser.add_argument('dis_size', help='max size of disjunctions', metavar='dis-size')
-    cli_parser.add_argument('repeat', help='number of repetitions', metavar='rep')
+    cli_parser.add_argument('num_lits', help='number of literals, where the search starts with --adapt', metavar='num-lits')
+    cli_parser.add_argument('num_clauses', help='number of clauses (unless --ratio is given)', metavar='num-clauses')
+    cli_parser.add_argument('dis_size', help='max size of disjunctions (the size of all of them with --uniform)', metavar='dis-size')
+    cli_parser.add_argument('repeat', help='number of cases generated', metavar='rep')
+    cli_parser.add_argument('-e', '--engine', help='solving engine, {} by default'.format(solver.DEFAULT_ENGINE), choices=solver.ENGINES, default=solver.DEFAULT_ENGINE)
+    cli_parser.add_argument('-t', '--time-budget', help='discard cases not solved within SECONDS, 90 by default', metavar='SECONDS', type=float, default=90)
+    cli_parser.add_argument('-d', '--decision-budget', help='discard cases needing more than N decisions', metavar='N', type=int)
+    cli_parser.add_argument('-b', '--binary', help='write the formulas in the binary format ({})'.format(BINARY_EXTENSION), action='store_true')
+    cli_parser.add_argument('-z', '--compress', help='compress the formula and solution files', choices=[codec[1:] for codec in CODECS])
+    cli_parser.add_argument('--no-cache', help='do not look up or store results in the result cache', action='store_true')
+    cli_parser.add_argument('-j', '--jobs', help='number of worker processes, all cores by default', metavar='N', type=int)
+    cli_parser.add_argument('--seed', help='seed of the run, 0 by default; case i always gets the same formula', type=int, default=0)
+    cli_parser.add_argument('-w', '--window', help='keep cases solved within MIN to MAX seconds, 1 to 90 by default', metavar=('MIN', 'MAX'), type=float, nargs=2, default=[1, 90])
+    cli_parser.add_argument('--adapt', help='adapt the number of literals until cases are solved within the window', action='store_true')
+    cli_parser.add_argument('--ratio', help='draw the clause to literal ratio of every case from LOW to HIGH instead of using num-clauses', metavar=('LOW', 'HIGH'), type=float, nargs=2)
+    cli_parser.add_argument('-u', '--uniform', help='uniform random k-SAT (no planted solution, every clause of dis-size literals)', action='store_true')
+    cli_parser.add_argument('--keep-nonsat', help='also keep unsatisfiable cases', action='store_true')
+    cli_parser.add_argument('-n', '--accept', help='stop once N cases are kept', metavar='N', type=int)
+    cli_parser.add_argument('-o', '--output-dir', help='directory of the kept cases, the manifest and the failure log, {} by default'.format(GEN_PATH), default=GEN_PATH)
     cli_args = cli_parser.parse_args()
 
     n_lits = int(cli_args.num_lits)
-    n_clauses= int(cli_args.num_clauses)
+    n_clauses = int(cli_args.num_clauses)
     dis_size = int(cli_args.dis_size)
     rep = int(cli_args.repeat)
 
-    GOOD_CASES = {}
-    SATS = 0
-    NONSATS = 0
-
-    for i in range(rep):
-        try:
-            print('Case {0}/{1}: '.format(str(i+1), str(rep)), end='')
-            cnf = generate_cnf(n_lits, n_clauses, dis_size)
-
-            time_begin = time.time()
-            sat, vals = solver.dpll(cnf, {}, True, True)
-            time_end = time.time()
-
-            print("DPLL algorithm ran for {:f} seconds: ".format(time_end-time_begin), end='')
-
-            if sat:
-                print("SAT")
-                check = solver.verify_solution(cnf,vals)
-                SATS += 1
-                if check:
-                    print("Solution is valid.")
-                    base_name = str(n_lits) + '_' + str(n_clauses) + '_' + str(dis_size) + '_' + str(hash(str(cnf)))
-                    if time_end - time_begin > 1 and time_end - time_begin < 90:
-                        GOOD_CASES[base_name] = time_end - time_begin
-                    else:
-                        continue
-                    file_name = os.path.join(GEN_PATH, base_name)
-                    cnf_to_dimacs(cnf, n_lits, n_clauses, dis_size, file_name + '.txt', '')
-                    solver.make_solution_file(file_name + '_solution.txt', vals)
-                    print("Solution written to {}".format(file_name + '_solution.txt'))
-                else:
-                    print("Solution NOT valid!")
-
-            else:
-                print("NONSAT")
-                NONSATS += 1
-        except:
-            continue
-    report = open(os.path.join(GEN_PATH, '00report.txt'), 'w+')
+    ratio = cli_args.ratio
+    if cli_args.adapt and not ratio:
+        # a fixed number of clauses over a changing number of literals would change the ratio instead
+        ratio = (n_clauses / n_lits, n_clauses / n_lits)
+    params = {'clauses' : n_clauses, 'ratio' : ratio, 'dis_size' : dis_size, 'uniform' : cli_args.uniform}
+    search = genpool.SizeSearch(n_lits, *cli_args.window, min_size=dis_size) if cli_args.adapt else None
+    extension = BINARY_EXTENSION if cli_args.binary else '.txt'
+    codec = '.' + cli_args.compress if cli_args.compress else ''
+
+    def log(record):
+        print(genpool.format_record(record))
+        if record['status'] == 'error':
+            print(record['traceback'], end='')
+
+    # SIGTERM stops the run like Ctrl-C: the manifest still lists the cases kept so far
+    signal.signal(signal.SIGTERM, signal.default_int_handler)
+    try:
+        accepted, counts = genpool.generate(make_case, params, rep, n_lits, cli_args.accept, cli_args.jobs, cli_args.seed, cli_args.engine,
+                                            cli_args.time_budget, cli_args.decision_budget, cli_args.window,
+                                            ('SAT', 'NONSAT') if cli_args.keep_nonsat else ('SAT',), search,
+                                            cli_args.output_dir, extension + codec, codec, not cli_args.no_cache, log)
+    except KeyboardInterrupt:
+        print('Interrupted, the manifest lists the cases kept so far.')
+        sys.exit(130)
     print('Good cases:')
-    for case in GOOD_CASES:
-        print(case, GOOD_CASES[case])
-        report.write(case + '  :  ' + str(GOOD_CASES[case]) + '\n')
-    report.close()
-    print('Satisfiable: ' + str(SATS))
-    print('Not satisfiable: ' + str(NONSATS))
+    for entry in accepted:
+        print(entry['path'], entry['seconds'])
+    print('Satisfiable: ' + str(counts.get('SAT', 0)))
+    print('Not satisfiable: ' + str(counts.get('NONSAT', 0)))
+    print('Discarded as too hard: ' + str(counts.get('UNKNOWN', 0)))
+    print('Errors: ' + str(counts.get('error', 0) + counts.get('invalid', 0)))
+    if search:
+        print('Number of literals reached: ' + str(search.size))
+    print('Manifest written to ' + os.path.join(cli_args.output_dir, genpool.MANIFEST_NAME))
 
 if __name__ == '__main__':
     main()
@@ -0,0 +1,180 @@
+#!/usr/bin/python3
+
+import random as rd
+
+ALGORITHMS = ['walksat', 'probsat']
+
+class LocalSearch:
+    '''Stochastic local search for satisfying assignments (WalkSAT and ProbSAT).
+
+    Starting from a random assignment, the search repeatedly picks a random
+    falsified clause and flips one of its variables. The falsified clauses
+    are kept in a list with a position index, so adding and removing one
+    takes constant time. For every clause the number of true literals and
+    the XOR of their variables are kept; a clause with one true literal
+    therefore knows its critical variable, and the break count of every
+    variable (the number of clauses that flipping it would falsify) is
+    updated on each flip instead of being recounted. Local search cannot
+    prove unsatisfiability, it gives up after a given number of flips.
+    '''
+
+    def __init__(self, cnf, algorithm='walksat', seed=0, noise=0.567, cb=2.3, eps=1.0, restart_flips=None):
+        '''Builds the occurrence lists.
+        :param cnf - a list of sets (each set one disjunction)
+        :param algorithm - 'walksat' or 'probsat'
+        :param seed - seed of the random generator of this search
+        :param noise - WalkSAT: probability of a random flip when every variable breaks something
+        :param cb - ProbSAT: a variable is picked with probability proportional to (eps + break)^-cb
+        :param eps - ProbSAT: see cb
+        :param restart_flips - flips between restarts from a fresh random assignment, None for 100 per variable
+        '''
+        if algorithm not in ALGORITHMS:
+            raise ValueError('unknown local search algorithm {}'.format(algorithm))
+        self.algorithm = algorithm
+        self.random = rd.Random(seed)
+        self.noise = noise
+        # tautologies are always true and would confuse the critical variables
+        self.clauses = [list(dis) for dis in cnf if not any(-lit in dis for lit in dis)]
+        self.empty = any(not clause for clause in self.clauses)
+        self.variables = sorted({abs(lit) for dis in cnf for lit in dis})
+        self.n_vars = max(self.variables, default=0)
+        self.restart_flips = restart_flips or 100 * max(1, len(self.variables))
+
+        # clauses of every literal, indexed by the literal as in trail.TrailSolver
+        self.occurs = [[] for _ in range(2 * self.n_vars + 1)]
+        for c, clause in enumerate(self.clauses):
+            for lit in clause:
+                self.occurs[lit].append(c)
+        longest = max((len(occ) for occ in self.occurs), default=0)
+        self.weights = [(eps + b) ** -cb for b in range(longest + 1)]
+
+        self.value = [False] * (self.n_vars + 1)
+        self.true_count = [0] * len(self.clauses)
+        self.true_xor = [0] * len(self.clauses)
+        self.breaks = [0] * (self.n_vars + 1)
+        self.unsat = []
+        self.unsat_pos = [-1] * len(self.clauses)
+
+        self.flips = 0
+        self.restarts = 0
+        # a stats.Stats object, set by the caller; every flip counts as a decision
+        self.stats = None
+
+    def restart(self):
+        '''Starts over from a fresh random assignment and recomputes all counters.'''
+        rand = self.random.random
+        value = self.value
+        for var in self.variables:
+            value[var] = rand() < 0.5
+        self.breaks = [0] * (self.n_vars + 1)
+        self.unsat = []
+        for c, clause in enumerate(self.clauses):
+            count = xor = 0
+            for lit in clause:
+                if value[abs(lit)] == (lit > 0):
+                    count += 1
+                    xor ^= abs(lit)
+            self.true_count[c] = count
+            self.true_xor[c] = xor
+            if count == 0:
+                self.unsat_pos[c] = len(self.unsat)
+                self.unsat.append(c)
+            else:
+                self.unsat_pos[c] = -1
+                if count == 1:
+                    self.breaks[xor] += 1
+
+    def flip(self, var):
+        '''Flips a variable and updates the counters of the clauses it occurs in.'''
+        value = self.value
+        true_count = self.true_count
+        true_xor = self.true_xor
+        breaks = self.breaks
+        unsat = self.unsat
+        unsat_pos = self.unsat_pos
+        value[var] = not value[var]
+        made_true = var if value[var] else -var
+        self.flips += 1
+
+        for c in self.occurs[made_true]:
+            count = true_count[c] + 1
+            true_count[c] = count
+            if count == 1:
+                # no longer falsified: swap the last falsified clause into its place
+                last = unsat.pop()
+                if last != c:
+                    pos = unsat_pos[c]
+                    unsat[pos] = last
+                    unsat_pos[last] = pos
+                unsat_pos[c] = -1
+                breaks[var] += 1
+            elif count == 2:
+                breaks[true_xor[c]] -= 1
+            true_xor[c] ^= var
+
+        for c in self.occurs[-made_true]:
+            count = true_count[c] - 1
+            true_count[c] = count
+            xor = true_xor[c] ^ var
+            true_xor[c] = xor
+            if count == 0:
+                unsat_pos[c] = len(unsat)
+                unsat.append(c)
+                breaks[var] -= 1
+            elif count == 1:
+                breaks[xor] += 1
+
+    def pick_walksat(self, clause):
+        '''WalkSAT (SKC) choice: a variable that breaks nothing, else random with probability noise, else the least breaking.'''
+        breaks = self.breaks
+        counts = [breaks[abs(lit)] for lit in clause]
+        best = min(counts)
+        if best > 0 and self.random.random() < self.noise:
+            return abs(self.random.choice(clause))
+        return abs(self.random.choice([lit for lit, count in zip(clause, counts) if count == best]))
+
+    def pick_probsat(self, clause):
+        '''ProbSAT choice: a variable drawn with probability proportional to weights[break count].'''
+        breaks = self.breaks
+        weights = self.weights
+        scores = [weights[breaks[abs(lit)]] for lit in clause]
+        threshold = self.random.random() * sum(scores)
+        for lit, score in zip(clause, scores):
+            threshold -= score
+            if threshold <= 0:
+                return abs(lit)
+        return abs(clause[-1])
+
+    def model(self):
+        '''Returns the current assignment as a dictionary of the variables of the formula.'''
+        value = self.value
+        return {var : value[var] for var in self.variables}
+
+    def solve(self, max_flips):
+        '''Searches until every clause is satisfied or max_flips flips are spent.
+        :param max_flips - number of flips to give up after
+
+        :returns sat - True if a model was found, False if the formula has an empty clause, None if the search gave up
+        :returns vals - a dictionary containing one satisfiable valuation, None if sat is not True
+        '''
+        if self.empty:
+            return False, None
+        pick = self.pick_probsat if self.algorithm == 'probsat' else self.pick_walksat
+        clauses = self.clauses
+        randrange = self.random.randrange
+        stats = self.stats
+        self.restart()
+        next_restart = self.flips + self.restart_flips
+        end = self.flips + max_flips
+        while self.unsat:
+            if self.flips >= end:
+                return None, None
+            if self.flips >= next_restart:
+                self.restarts += 1
+                self.restart()
+                next_restart = self.flips + self.restart_flips
+            var = pick(clauses[self.unsat[randrange(len(self.unsat))]])
+            self.flip(var)
+            if stats is not None:
+                stats.flip()
+        return True, self.model()
@@ -1,38 +1,49 @@
 #!/usr/bin/python3
 
 import argparse
+import os
+import signal
 import time
 from functools import reduce
 
+from trail import TrailSolver
+from cdcl import CDCLSolver
+from sls import LocalSearch, ALGORITHMS
+from branching import HEURISTICS
+from dimacs import read_dimacs, load_cnf, open_file
+from verify import verify
+from preprocess import preprocess, extend_model, format_summary
+import probe
+from stats import Stats, BudgetExhausted
+from cache import ResultCache, fingerprint, CACHE_PATH, DEFAULT_MAX_BYTES
+import portfolio
+import cube
+import components
+
 def parse_dimacs(dimacs_file):
     '''Takes in dimacs file handle and returns a cnf formula as a list of sets.
-    :param dimacs_file - a plaintext dimacs file handle
+    The whole file is read at once and tokenized in bulk by dimacs.tokenize,
+    so any whitespace, comments anywhere and % terminators are accepted.
+    A gzip, bzip2 or xz compressed file is decompressed while it is parsed,
+    see dimacs.read_dimacs.
+    :param dimacs_file - a plaintext (or binary) dimacs file handle
 
     :returns cnf - a list of sets (each set one disjunction)
     '''
-    cnf = []
-    for line in dimacs_file:
-        if line[0] in ('c', 'p'):
-            continue
-        literals = set(map(int, line.strip().split(' ')[:-1]))
-        cnf.append(literals)
-    return cnf
+    return read_dimacs(dimacs_file).to_sets()
 
 def make_solution_file(f_name, vals):
-    '''Creates a dimacs compliant solution file.
+    '''Creates a dimacs compliant solution file, compressed if f_name ends with .gz, .bz2 or .xz.
     :param f_name - string file name
     :param vals - dpll created dictionary of values
 
     :returns None
     '''
-    with open(f_name, 'w+') as f_handle:
+    with open_file(f_name, 'w') as f_handle:
         if not vals:
             f_handle.write('0')
             return
-        for lit in vals:
-            coef = 1 if vals[lit] else -1
-            f_handle.write(str(coef*lit))
-            f_handle.write(' ')
+        f_handle.write(''.join('{} '.format(lit if vals[lit] else -lit) for lit in vals))
 
 
 def select_lit(cnf):
@@ -169,12 +180,15 @@ def assign_pure_literals(cnf):
     return cnf, {}
 
 
-def dpll(cnf, assign={}, unit_prop=True, purelit_elim=True):
+def dpll(cnf, assign={}, unit_prop=True, purelit_elim=True, stats=None, depth=0, split=False):
     '''The core dpll algorithm.
     :param cnf - a list of sets (each set one disjunction)
     :param assign - a dictionary of assignments in a given recursive step, empty by default
     :param unit_prop - flag to turn on/off unit propagation, True by default
     :param purelit_elim - flag to turn on/off pure literal elimination, True by default (set to False if program taking too long)
+    :param stats - a stats.Stats object collecting the counters, None by default
+    :param depth - number of decisions above this recursive step, 0 by default
+    :param split - flag to split the cnf into variable-disjoint components in every step and solve them separately, False by default
 
     :returns sat - boolean denoting the satisfiability of the formula
     :returns assign - a dictionary containing one satisfiable valuation, None if sat is False
@@ -185,50 +199,397 @@ def dpll(cnf, assign={}, unit_prop=True, purelit_elim=True):
 
     # cnf containing any empty disjunction is false
     if any([len(dis) == 0 for dis in cnf]):
+        if stats is not None:
+            stats.conflict()
         return False, None
 
 
     # unit propagation
     if unit_prop:
+        if stats is not None:
+            time_begin = time.perf_counter()
         cnf, new_assign = assign_unit_clauses(cnf)
         assign = {**assign, **new_assign}
+        if stats is not None:
+            stats.propagations += len(new_assign)
+            stats.tick()
+            stats.phase('unit_prop', time.perf_counter() - time_begin)
 
         if len(cnf) == 0:
             return True, assign
 
         if any([len(dis) == 0 for dis in cnf]):
+            if stats is not None:
+                stats.conflict()
             return False, None
 
     # pure literal elimination
     if purelit_elim:
+        if stats is not None:
+            time_begin = time.perf_counter()
         cnf, new_assign = assign_pure_literals(cnf)
         assign = {**assign, **new_assign}
+        if stats is not None:
+            stats.pure_literals += len(new_assign)
+            stats.phase('pure_literals', time.perf_counter() - time_begin)
 
         if len(cnf) == 0:
             return True, assign
 
         if any([len(dis) == 0 for dis in cnf]):
+            if stats is not None:
+                stats.conflict()
             return False, None
 
+    # independent components: the first unsatisfiable one refutes the step, the others are not retried
+    if split:
+        parts = components.find_components(cnf)
+        if len(parts) > 1:
+            assign = dict(assign)
+            for part in parts:
+                sat, vals = dpll(part, {}, unit_prop, purelit_elim, stats, depth, split)
+                if not sat:
+                    return False, None
+                assign.update(vals)
+            return True, assign
+
 
     # branching literal assignment
+    if stats is not None:
+        stats.decision(depth + 1)
+        time_begin = time.perf_counter()
     lit = select_lit(cnf)
 
     # true branch
     new_cnf = assign_lit(cnf, lit, True)
-    sat, vals = dpll(new_cnf, {**assign, lit:True}, unit_prop, purelit_elim)
+    if stats is not None:
+        stats.phase('branching', time.perf_counter() - time_begin)
+    sat, vals = dpll(new_cnf, {**assign, lit:True}, unit_prop, purelit_elim, stats, depth + 1, split)
     if sat:
         return sat, vals
 
     # false branch
+    if stats is not None:
+        time_begin = time.perf_counter()
     new_cnf = assign_lit(cnf, lit, False)
-    sat, vals = dpll(new_cnf, {**assign, lit:False}, unit_prop, purelit_elim)
+    if stats is not None:
+        stats.phase('branching', time.perf_counter() - time_begin)
+    sat, vals = dpll(new_cnf, {**assign, lit:False}, unit_prop, purelit_elim, stats, depth + 1, split)
     if sat:
         return sat, vals
 
     return False, None
 
 
+def dpll_iterative(cnf, unit_prop=True, purelit_elim=True, stats=None):
+    '''The dpll algorithm with an explicit stack instead of recursion.
+    The cnf is never copied: a single assignment is kept together with
+    counters that are updated incrementally when a literal is assigned or
+    unassigned. For each disjunction it counts its true and false literals,
+    for each literal its occurrences in disjunctions not yet satisfied, and
+    the unit and empty disjunctions are kept in live sets. Unit propagation,
+    pure literal elimination and conflict detection therefore cost time
+    proportional to what changed, not to the size of the formula.
+    Decisions are pushed on a stack with the length of the trail of assigned
+    literals, and backtracking undoes the trail down to that mark, so memory
+    does not grow with the search depth either.
+    :param cnf - a list of sets (each set one disjunction)
+    :param unit_prop - flag to turn on/off unit propagation, True by default
+    :param purelit_elim - flag to turn on/off pure literal elimination, True by default
+    :param stats - a stats.Stats object collecting the counters, None by default
+
+    :returns sat - boolean denoting the satisfiability of the formula
+    :returns assign - a dictionary containing one satisfiable valuation, None if sat is False
+    '''
+    clauses = [list(dis) for dis in cnf]
+    n_vars = max((abs(lit) for dis in clauses for lit in dis), default=0)
+    value = [0] * (2 * n_vars + 1)
+    # disjunctions containing each literal, and occurrences in unsatisfied disjunctions
+    occ = [[] for _ in range(2 * n_vars + 1)]
+    count = [0] * (2 * n_vars + 1)
+    for idx, dis in enumerate(clauses):
+        for lit in dis:
+            occ[lit].append(idx)
+            count[lit] += 1
+    n_true = [0] * len(clauses)
+    n_false = [0] * len(clauses)
+    units = {idx for idx, dis in enumerate(clauses) if len(dis) == 1}
+    empty = {idx for idx, dis in enumerate(clauses) if len(dis) == 0}
+    pure_candidates = {lit for lit in range(-n_vars, n_vars + 1) if lit and count[lit] and not count[-lit]}
+    n_sat = 0
+    trail = []
+
+    def assign(lit):
+        nonlocal n_sat
+        value[lit] = 1
+        value[-lit] = -1
+        trail.append(lit)
+        for idx in occ[lit]:
+            n_true[idx] += 1
+            if n_true[idx] == 1:
+                n_sat += 1
+                units.discard(idx)
+                for other in clauses[idx]:
+                    count[other] -= 1
+                    if count[other] == 0:
+                        pure_candidates.add(-other)
+        for idx in occ[-lit]:
+            n_false[idx] += 1
+            if n_true[idx] == 0:
+                n_free = len(clauses[idx]) - n_false[idx]
+                if n_free == 1:
+                    units.add(idx)
+                elif n_free == 0:
+                    units.discard(idx)
+                    empty.add(idx)
+
+    def unassign(lit):
+        nonlocal n_sat
+        value[lit] = 0
+        value[-lit] = 0
+        for idx in occ[-lit]:
+            n_false[idx] -= 1
+            if n_true[idx] == 0:
+                n_free = len(clauses[idx]) - n_false[idx]
+                if n_free == 1:
+                    empty.discard(idx)
+                    units.add(idx)
+                elif n_free == 2:
+                    units.discard(idx)
+        for idx in occ[lit]:
+            n_true[idx] -= 1
+            if n_true[idx] == 0:
+                n_sat -= 1
+                for other in clauses[idx]:
+                    count[other] += 1
+                if len(clauses[idx]) - n_false[idx] == 1:
+                    units.add(idx)
+        pure_candidates.add(lit)
+        pure_candidates.add(-lit)
+
+    # first disjunction that may still be unsatisfied, restored on backtracking
+    head = 0
+    # decision frames [trail length, head, variable, false branch taken]
+    stack = []
+
+    # the time since mark is spent in the phase of the previous step
+    phase = None
+    if stats is not None:
+        mark = time.perf_counter()
+
+    while True:
+        if stats is not None and phase is not None:
+            now = time.perf_counter()
+            stats.phase(phase, now - mark)
+            mark = now
+        conflict = bool(empty)
+
+        # unit propagation
+        if not conflict and unit_prop and units:
+            idx = next(iter(units))
+            assign(next(lit for lit in clauses[idx] if value[lit] == 0))
+            if stats is not None:
+                stats.propagations += 1
+                stats.tick()
+                phase = 'unit_prop'
+            continue
+
+        # pure literal elimination
+        if not conflict and purelit_elim and pure_candidates:
+            pure_literals = [lit for lit in pure_candidates if value[lit] == 0 and count[lit] and not count[-lit]]
+            pure_candidates.clear()
+            if pure_literals:
+                for lit in pure_literals:
+                    assign(lit)
+                if stats is not None:
+                    stats.pure_literals += len(pure_literals)
+                    phase = 'pure_literals'
+                continue
+
+        if not conflict:
+            # every disjunction is satisfied
+            if n_sat == len(clauses):
+                return True, {abs(lit) : (lit > 0) for lit in trail}
+
+            # branching literal assignment, true branch first
+            while n_true[head]:
+                head += 1
+            lit = abs(next(lit for lit in clauses[head] if value[lit] == 0))
+            stack.append([len(trail), head, lit, False])
+            assign(lit)
+            if stats is not None:
+                stats.decision(len(stack))
+                phase = 'branching'
+            continue
+
+        # backtrack to the last decision whose false branch is not yet explored
+        if stats is not None:
+            stats.conflict()
+            phase = 'backtrack'
+        while stack and stack[-1][3]:
+            stack.pop()
+        if not stack:
+            return False, None
+        frame = stack[-1]
+        while len(trail) > frame[0]:
+            unassign(trail.pop())
+        head = frame[1]
+        frame[3] = True
+        assign(-frame[2])
+
+
+def dpll_trail(cnf, unit_prop=True, purelit_elim=True, branch=None, phase_saving=None, stats=None):
+    '''Trail based dpll with two watched literals, see trail.TrailSolver.
+    :param cnf - a list of sets (each set one disjunction)
+    :param unit_prop - flag to turn on/off unit propagation, True by default
+    :param purelit_elim - flag to turn on/off pure literal elimination at the root, True by default
+    :param branch - name of the branching heuristic in branching.HEURISTICS, 'first' by default
+    :param phase_saving - flag to turn on/off phase saving, None for the heuristic's default
+    :param stats - a stats.Stats object collecting the counters, None by default
+
+    :returns sat - boolean denoting the satisfiability of the formula
+    :returns assign - a dictionary containing one satisfiable valuation, None if sat is False
+    '''
+    engine = TrailSolver(cnf, unit_prop, purelit_elim, branch, phase_saving)
+    engine.stats = stats
+    sat, vals = engine.solve()
+    if stats is not None:
+        stats.propagations = engine.propagations
+    return sat, vals
+
+
+def cdcl(cnf, unit_prop=True, purelit_elim=True, branch=None, phase_saving=None, stats=None):
+    '''Conflict driven clause learning, see cdcl.CDCLSolver.
+    :param cnf - a list of sets (each set one disjunction)
+    :param unit_prop - ignored, clause learning always uses unit propagation
+    :param purelit_elim - flag to turn on/off pure literal elimination at the root, True by default
+    :param branch - name of the branching heuristic in branching.HEURISTICS, 'vsids' by default
+    :param phase_saving - flag to turn on/off phase saving, None for the heuristic's default
+    :param stats - a stats.Stats object collecting the counters, None by default
+
+    :returns sat - boolean denoting the satisfiability of the formula
+    :returns assign - a dictionary containing one satisfiable valuation, None if sat is False
+    '''
+    engine = CDCLSolver(cnf, unit_prop, purelit_elim, branch, phase_saving)
+    engine.stats = stats
+    sat, vals = engine.solve()
+    if stats is not None:
+        stats.propagations = engine.propagations
+    return sat, vals
+
+
+# flips the sls engine gives up after, and those of the local search stage of the hybrid engine
+SLS_MAX_FLIPS = 10**7
+HYBRID_MAX_FLIPS = 10**5
+
+def sls(cnf, unit_prop=True, purelit_elim=True, algorithm='walksat', max_flips=None, seed=0, stats=None, **options):
+    '''Stochastic local search, see sls.LocalSearch. It cannot prove unsatisfiability:
+    when the flips run out, the result is UNKNOWN with the reason "flip budget".
+    :param cnf - a list of sets (each set one disjunction)
+    :param unit_prop - ignored
+    :param purelit_elim - ignored
+    :param algorithm - 'walksat' or 'probsat'
+    :param max_flips - number of flips to give up after, SLS_MAX_FLIPS if None
+    :param seed - seed of the random walk
+    :param stats - a stats.Stats object collecting the counters (flips have their own counter, not limited by the decision budget), None by default
+
+    :returns sat - True, or False if the formula contains an empty clause
+    :returns assign - a dictionary containing one satisfiable valuation, None if sat is False
+    '''
+    engine = LocalSearch(cnf, algorithm, seed)
+    engine.stats = stats
+    sat, vals = engine.solve(max_flips or SLS_MAX_FLIPS)
+    if sat is UNKNOWN:
+        raise BudgetExhausted('flip budget')
+    return sat, vals
+
+def hybrid(cnf, unit_prop=True, purelit_elim=True, complete='cdcl', algorithm='walksat', max_flips=None, seed=0, stats=None, **options):
+    '''Local search first, for satisfiable formulas, then a complete engine if it finds no model.
+    :param cnf - a list of sets (each set one disjunction)
+    :param unit_prop - flag to turn on/off unit propagation in the complete engine, True by default
+    :param purelit_elim - flag to turn on/off pure literal elimination in the complete engine, True by default
+    :param complete - name of the complete engine in ENGINES, cdcl by default
+    :param algorithm - local search algorithm, see sls
+    :param max_flips - flips of the local search stage, HYBRID_MAX_FLIPS if None
+    :param seed - seed of the random walk
+    :param stats - a stats.Stats object collecting the counters of both stages, None by default
+    :param options - keyword arguments of the complete engine
+
+    :returns sat - boolean denoting the satisfiability of the formula
+    :returns assign - a dictionary containing one satisfiable valuation, None if sat is False
+    '''
+    engine = LocalSearch(cnf, algorithm, seed)
+    engine.stats = stats
+    sat, vals = engine.solve(max_flips or HYBRID_MAX_FLIPS)
+    if sat is not UNKNOWN:
+        return sat, vals
+    return ENGINES[complete](cnf, unit_prop, purelit_elim, stats=stats, **options)
+
+
+DEFAULT_ENGINE = 'iterative'
+
+# third result of solve, when a budget ran out or the run was interrupted
+UNKNOWN = None
+
+ENGINES = {
+    'dpll' : lambda cnf, unit_prop, purelit_elim, stats=None, split=False, **options : dpll(cnf, {}, unit_prop, purelit_elim, stats, split=split),
+    'iterative' : lambda cnf, unit_prop, purelit_elim, stats=None, **options : dpll_iterative(cnf, unit_prop, purelit_elim, stats),
+    'trail' : dpll_trail,
+    'cdcl' : cdcl,
+    'sls' : sls,
+    'hybrid' : hybrid,
+}
+
+def solve(cnf, engine=DEFAULT_ENGINE, unit_prop=True, purelit_elim=True, **options):
+    '''Solves the cnf with the chosen engine.
+    :param cnf - a list of sets (each set one disjunction)
+    :param engine - name of the engine in ENGINES, DEFAULT_ENGINE by default
+    :param unit_prop - flag to turn on/off unit propagation, True by default
+    :param purelit_elim - flag to turn on/off pure literal elimination, True by default
+    :param options - keyword arguments: stats (a stats.Stats object, also holding the budgets) for all engines,
+                     branch and phase_saving for trail and cdcl, split for dpll (see dpll),
+                     components (solve the components left after root simplification separately) and workers
+                     (worker processes for the components) for all engines, see components.solve_components
+
+    :returns sat - True, False or UNKNOWN if a budget ran out (stats.reason tells which) or the run was interrupted
+    :returns vals - a dictionary containing one satisfiable valuation, None if sat is not True
+    '''
+    stats = options.get('stats')
+    decompose = options.pop('components', False)
+    try:
+        if decompose:
+            sat, vals = components.solve_components(cnf, engine, unit_prop, purelit_elim, **options)
+        else:
+            options.pop('workers', None)
+            sat, vals = ENGINES[engine](cnf, unit_prop, purelit_elim, **options)
+    except BudgetExhausted as exc:
+        sat, vals = UNKNOWN, None
+        if stats is not None:
+            stats.reason = exc.reason
+    if stats is not None:
+        stats.finish()
+    return sat, vals
+
+# pid of the process that installed raise_interrupted, see catch_interrupts
+interrupt_pid = None
+
+def raise_interrupted(signum, frame):
+    '''Signal handler ending the current solve with an UNKNOWN result.
+    Worker processes forked by the portfolio and cube pools inherit it until
+    they reset their handlers; signalled in between, they just exit.
+    '''
+    if os.getpid() != interrupt_pid:
+        os._exit(128 + signum)
+    raise BudgetExhausted('interrupted by {}'.format(signal.Signals(signum).name))
+
+def catch_interrupts():
+    '''Makes SIGINT and SIGTERM end the run of this process with UNKNOWN (see raise_interrupted).'''
+    global interrupt_pid
+    interrupt_pid = os.getpid()
+    signal.signal(signal.SIGINT, raise_interrupted)
+    signal.signal(signal.SIGTERM, raise_interrupted)
+
+
 def verify_solution(cnf, vals):
     '''Function to verify sat solutions on the fly.
     :param cnf - a list of sets (each set one disjunction)
@@ -254,42 +615,177 @@ def main():
     cli_parser.add_argument('-o', help='output file to write solution if SAT', metavar='output-file')
     cli_parser.add_argument('-nU', '--no-unit-prop', help='disable unit propagation', action='store_true')
     cli_parser.add_argument('-nP', '--no-pure-elim', help='disable pure literal elimination', action='store_true')
+    cli_parser.add_argument('-C', '--cdcl', help='use conflict driven clause learning (same as -e cdcl)', action='store_true')
+    cli_parser.add_argument('-e', '--engine', help='solving engine, {} by default'.format(DEFAULT_ENGINE), choices=ENGINES, default=DEFAULT_ENGINE)
+    cli_parser.add_argument('--branch', help='branching heuristic of the trail and cdcl engines', choices=HEURISTICS)
+    cli_parser.add_argument('--phase-saving', help='turn phase saving on/off (default depends on the heuristic)', action=argparse.BooleanOptionalAction)
+    cli_parser.add_argument('--hybrid', help='run local search first and the engine given by -e only if it finds no model', action='store_true')
+    cli_parser.add_argument('--sls', help='local search algorithm of the sls and hybrid engines, walksat by default', choices=ALGORITHMS, default='walksat')
+    cli_parser.add_argument('--max-flips', help='flips after which local search gives up ({} for sls, {} for hybrid by default)'.format(SLS_MAX_FLIPS, HYBRID_MAX_FLIPS),
+                            metavar='N', type=int)
+    cli_parser.add_argument('--portfolio', help='race N differently configured workers and take the first answer', metavar='N', type=int)
+    cli_parser.add_argument('--cubes', help='cube and conquer: split the formula by lookahead to depth D and solve the cubes in parallel', metavar='D', type=int)
+    cli_parser.add_argument('--components', help='solve the independent parts of the formula separately: found once after root simplification, or also after every decision (dpll engine only)',
+                            choices=['root', 'all'])
+    cli_parser.add_argument('-j', '--jobs', help='number of worker processes for --cubes (all CPUs by default) and --components (1 by default)', metavar='N', type=int)
+    cli_parser.add_argument('--progress', help='print a status line every SECONDS seconds', metavar='SECONDS', type=float)
+    cli_parser.add_argument('--stats-json', help='write the search counters to a JSON file', metavar='stats-file')
+    cli_parser.add_argument('--time-budget', help='give up with UNKNOWN after SECONDS of wall-clock time', metavar='SECONDS', type=float)
+    cli_parser.add_argument('--decision-budget', help='give up with UNKNOWN after N decisions', metavar='N', type=int)
+    cli_parser.add_argument('--memory-budget', help='give up with UNKNOWN when the process uses more than MiB of memory', metavar='MiB', type=float)
+    cli_parser.add_argument('--no-cache', help='neither read nor write the result cache', action='store_true')
+    cli_parser.add_argument('--cache-dir', help='result cache directory, {} by default'.format(CACHE_PATH), default=CACHE_PATH)
+    cli_parser.add_argument('--cache-size', help='size limit of the result cache in MiB, {} by default'.format(DEFAULT_MAX_BYTES // 2**20),
+                            metavar='MiB', type=float, default=DEFAULT_MAX_BYTES // 2**20)
+    cli_parser.add_argument('--probe', help='fix failed and implied literals and substitute equivalent literals before solving', action='store_true')
+    cli_parser.add_argument('--probe-depth', help='probe below the root up to depth D, 1 (root only) by default', metavar='D', type=int, default=1)
+    cli_parser.add_argument('--probe-budget', help='time budget of probing, {} seconds by default'.format(probe.DEFAULT_MAX_SECONDS),
+                            metavar='SECONDS', type=float, default=probe.DEFAULT_MAX_SECONDS)
+    cli_parser.add_argument('-p', '--preprocess', help='simplify the formula before solving', action='store_true')
+    cli_parser.add_argument('--no-subsumption', help='disable subsumption when preprocessing', action='store_true')
+    cli_parser.add_argument('--no-strengthening', help='disable self-subsuming resolution when preprocessing', action='store_true')
+    cli_parser.add_argument('--no-elimination', help='disable bounded variable elimination when preprocessing', action='store_true')
     cli_args = cli_parser.parse_args()
 
     in_file_path = cli_args.input_file
     out_file_path = cli_args.o
     unit_prop = not cli_args.no_unit_prop
     purelit_elim = not cli_args.no_pure_elim
-
-    with open(in_file_path, 'r') as file_handle:
-        print("Parsing input file {}\n".format(in_file_path))
-        cnf = parse_dimacs(file_handle)
-
-        status_string = lambda x : "ENABLED" if x else "DISABLED"
-        print("Unit propagation: {}".format(status_string(unit_prop)))
-        print("Pure literal elimination: {}\n".format(status_string(purelit_elim)))
-        print("Attempting solution...")
-
+    engine = 'cdcl' if cli_args.cdcl else cli_args.engine
+    options = {'branch' : cli_args.branch, 'phase_saving' : cli_args.phase_saving}
+    if cli_args.hybrid:
+        if engine in ('sls', 'hybrid'):
+            cli_parser.error('--hybrid needs a complete engine')
+        options['complete'] = engine
+        engine = 'hybrid'
+    if engine in ('sls', 'hybrid'):
+        if cli_args.cubes:
+            cli_parser.error('cube and conquer needs a complete engine')
+        options.update(algorithm=cli_args.sls, max_flips=cli_args.max_flips)
+    if cli_args.components:
+        if cli_args.cubes or cli_args.portfolio:
+            cli_parser.error('--components cannot be combined with --cubes or --portfolio')
+        if cli_args.components == 'all':
+            if engine != 'dpll':
+                cli_parser.error('--components all needs the dpll engine')
+            options['split'] = True
+        options.update(components=True, workers=cli_args.jobs)
+    # instrumentation is only switched on when asked for (budgets are checked by it too)
+    stats = None
+    max_memory = cli_args.memory_budget * 2**20 if cli_args.memory_budget else None
+    if cli_args.progress or cli_args.stats_json or cli_args.time_budget or cli_args.decision_budget or max_memory:
+        stats = Stats(cli_args.progress, max_seconds=cli_args.time_budget,
+                      max_decisions=cli_args.decision_budget, max_memory=max_memory)
+
+    print("Parsing input file {}\n".format(in_file_path))
+    flat = load_cnf(in_file_path)
+    cnf = flat.to_sets()
+
+    status_string = lambda x : "ENABLED" if x else "DISABLED"
+    print("Unit propagation: {}".format(status_string(unit_prop)))
+    print("Pure literal elimination: {}".format(status_string(purelit_elim)))
+    if cli_args.portfolio:
+        print("Portfolio: {} workers\n".format(cli_args.portfolio))
+    else:
+        if cli_args.cubes:
+            print("Cube and conquer: depth {}".format(cli_args.cubes))
+        if cli_args.components:
+            print("Components: {} ({} workers)".format('after every decision' if cli_args.components == 'all' else 'at the root', cli_args.jobs or 1))
+        if engine == 'hybrid':
+            print("Engine: hybrid ({}, then {})".format(cli_args.sls, options.get('complete', 'cdcl')))
+        else:
+            print("Engine: {}".format(engine))
+        print("Branching heuristic: {}\n".format(cli_args.branch or 'default'))
+
+    # a formula solved before is answered from the result cache
+    result_cache = None if cli_args.no_cache else ResultCache(cli_args.cache_dir, cli_args.cache_size * 2**20)
+    key = fingerprint(cnf) if result_cache is not None else None
+    entry = result_cache.get(key) if result_cache is not None else None
+    if entry is not None:
+        print("Found in the result cache ({}), solved before in {:f} seconds".format(key[:16], entry['seconds'] or 0))
+        sat, vals = entry['sat'], entry['vals']
+        time_begin = time_end = time.time()
+    else:
+        # SIGINT and SIGTERM end the run with UNKNOWN, so do budgets running out while simplifying
+        catch_interrupts()
+        reason = None
         time_begin = time.time()
-        sat, vals = dpll(cnf, {}, unit_prop, purelit_elim)
+        try:
+            solve_cnf = cnf
+            if cli_args.probe:
+                solve_cnf, reconstruction, summary = probe.probe(cnf, cli_args.probe_depth, cli_args.probe_budget, stats=stats)
+                print(probe.format_summary(summary) + "\n")
+            if cli_args.preprocess:
+                solve_cnf, elim_stack, summary = preprocess(solve_cnf, not cli_args.no_subsumption, not cli_args.no_strengthening,
+                                                            not cli_args.no_elimination, stats=stats)
+                print(format_summary(summary) + "\n")
+
+            print("Attempting solution...")
+            time_begin = time.time()
+            if cli_args.portfolio:
+                sat, vals, winner = portfolio.solve_portfolio(solve_cnf, cli_args.portfolio, stats=stats)
+                print("Winning configuration: {}".format(portfolio.describe(winner)))
+                if stats is not None:
+                    stats.finish()
+            elif cli_args.cubes:
+                progress = lambda done, total : print("\rCubes: {}/{} done, {} remaining".format(done, total, total - done), end='', flush=True)
+                sat, vals = cube.solve_cubes(solve_cnf, cli_args.cubes, cli_args.jobs, engine, progress, stats)
+                print()
+                if stats is not None:
+                    stats.finish()
+            else:
+                sat, vals = solve(solve_cnf, engine, unit_prop, purelit_elim, stats=stats, **options)
+                reason = stats and stats.reason
+        except BudgetExhausted as exc:
+            sat, vals, reason = UNKNOWN, None, exc.reason
+            # solve turns budgets running out into UNKNOWN itself, so stats is not finished yet
+            if stats is not None:
+                stats.reason = reason
+                stats.finish()
+            if cli_args.cubes:
+                print()
         time_end = time.time()
+        signal.signal(signal.SIGINT, signal.default_int_handler)
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)
 
-        print("DPLL algorithm ran for {:f} seconds: ".format(time_end-time_begin), end='')
-
-        if sat:
-            print("SAT")
-            check = verify_solution(cnf,vals)
-            if check:
-                print("Solution is valid.")
-            else:
-                print("Solution NOT valid!")
+        if sat and cli_args.preprocess:
+            vals = extend_model(vals, elim_stack)
+        if sat and cli_args.probe:
+            vals = probe.extend_model(vals, reconstruction)
 
-            if out_file_path:
-                make_solution_file(out_file_path, vals)
-                print("Solution written to {}".format(out_file_path))
+    print("DPLL algorithm ran for {:f} seconds: ".format(time_end-time_begin), end='')
 
+    falsified = []
+    if sat:
+        print("SAT")
+        falsified, unassigned = verify(flat, vals)
+        if not falsified:
+            print("Solution is valid.")
         else:
-            print("NONSAT")
+            print("Solution NOT valid! {} falsified clauses, first: {}".format(len(falsified), falsified[0]))
+        if unassigned:
+            print("{} variables left unassigned.".format(len(unassigned)))
+
+        if out_file_path:
+            make_solution_file(out_file_path, vals)
+            print("Solution written to {}".format(out_file_path))
+
+    elif sat is UNKNOWN:
+        print("UNKNOWN ({})".format(reason or 'interrupted'))
+
+    else:
+        print("NONSAT")
+
+    # only verified answers are cached
+    if result_cache is not None and entry is None and sat is not UNKNOWN and not falsified:
+        result_cache.put(key, sat, vals, time_end - time_begin, stats.as_dict() if stats is not None else None)
+
+    if stats is not None and entry is None:
+        print(stats.format())
+        if cli_args.stats_json:
+            status = 'UNKNOWN' if sat is UNKNOWN else 'SAT' if sat else 'NONSAT'
+            stats.dump_json(cli_args.stats_json, file=in_file_path, engine=engine, status=status)
+            print("Statistics written to {}".format(cli_args.stats_json))
 
 #        print('Done.')
 #        print('Checking satisfiability...', end='')
@@ -0,0 +1,175 @@
+#!/usr/bin/python3
+
+import json
+import os
+import resource
+import sys
+import time
+
+# events hooks can be attached to, with the arguments the hooks get after the Stats object
+EVENTS = {
+    'decision' : 'depth',
+    'conflict' : '',
+    'phase' : 'phase name, seconds',
+    'progress' : '',
+    'finish' : '',
+}
+
+# seconds between checks of the wall-clock and memory budgets
+CHECK_INTERVAL = 0.05
+
+class BudgetExhausted(Exception):
+    '''Raised inside an engine when a budget runs out or the run is interrupted.'''
+
+    def __init__(self, reason):
+        super().__init__(reason)
+        self.reason = reason
+
+
+def memory_usage():
+    '''Returns the resident set size of this process in bytes (the peak if the current one is unknown).'''
+    try:
+        with open('/proc/self/statm', 'r') as file_handle:
+            return int(file_handle.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError):
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+class Stats:
+    '''Search counters, time per phase and hook points of one solver run.
+
+    Engines only touch a Stats object when one is passed to them, so a run
+    without instrumentation pays at most one "is not None" test per step.
+    External profilers attach with add_hook: every hook is called with the
+    Stats object followed by the arguments listed in EVENTS.
+    Budgets are checked on every decision and conflict, and from the
+    propagation, preprocessing and probing loops through tick; when one runs
+    out BudgetExhausted is raised, which solver.solve turns into an UNKNOWN result.
+    '''
+
+    def __init__(self, progress=None, out=sys.stdout, max_seconds=None, max_decisions=None, max_memory=None):
+        '''
+        :param progress - seconds between status lines, None for no status lines
+        :param out - file the status lines are printed to, stdout by default
+        :param max_seconds - wall-clock budget in seconds, None for no limit
+        :param max_decisions - decision budget, None for no limit
+        :param max_memory - resident memory budget in bytes, None for no limit
+        '''
+        self.decisions = 0
+        self.propagations = 0
+        self.conflicts = 0
+        self.pure_literals = 0
+        self.flips = 0
+        self.max_depth = 0
+        self.phase_time = {}
+        self.seconds = 0
+
+        self.hooks = {event : [] for event in EVENTS}
+        self.progress = progress
+        self.out = out
+        self.time_begin = time.perf_counter()
+        self.next_report = self.time_begin + progress if progress else None
+
+        self.max_seconds = max_seconds
+        self.max_decisions = max_decisions
+        self.max_memory = max_memory
+        self.next_check = self.time_begin if max_seconds is not None or max_memory is not None else None
+        # why the run ended early, None if it did not
+        self.reason = None
+
+    def add_hook(self, event, hook):
+        '''Calls hook(stats, *args) on every event, see EVENTS.'''
+        self.hooks[event].append(hook)
+
+    def decision(self, depth):
+        '''Counts a decision made at the given depth, prints a status line when one is due and checks the budgets.'''
+        self.decisions += 1
+        if depth > self.max_depth:
+            self.max_depth = depth
+        for hook in self.hooks['decision']:
+            hook(self, depth)
+        if self.next_report is not None and time.perf_counter() >= self.next_report:
+            self.report()
+        if self.max_decisions is not None and self.decisions > self.max_decisions:
+            raise BudgetExhausted('decision budget')
+        self.tick()
+
+    def flip(self):
+        '''Counts a local search flip, prints a status line when one is due and checks the time and memory budgets.
+        Flips are not decisions: the decision budget only limits the search engines.'''
+        self.flips += 1
+        if self.next_report is not None and time.perf_counter() >= self.next_report:
+            self.report()
+        self.tick()
+
+    def tick(self):
+        '''Checks the wall-clock and memory budgets when a check is due, cheap enough for inner loops.'''
+        if self.next_check is not None and time.perf_counter() >= self.next_check:
+            self.check()
+
+    def check(self):
+        '''Checks the wall-clock and memory budgets.'''
+        now = time.perf_counter()
+        self.next_check = now + CHECK_INTERVAL
+        if self.max_seconds is not None and now - self.time_begin > self.max_seconds:
+            raise BudgetExhausted('time budget')
+        if self.max_memory is not None and memory_usage() > self.max_memory:
+            raise BudgetExhausted('memory budget')
+
+    def budgets(self):
+        '''Returns the decision and memory budgets as keyword arguments of Stats, for the Stats of a
+        worker process. The wall-clock budget is checked by the process waiting for the workers.'''
+        return {'max_decisions' : self.max_decisions, 'max_memory' : self.max_memory}
+
+    def merge(self, counters):
+        '''Adds the counters of a run in a worker process, a dictionary returned by its as_dict.'''
+        for name in ('decisions', 'propagations', 'conflicts', 'pure_literals', 'flips'):
+            setattr(self, name, getattr(self, name) + counters[name])
+        self.max_depth = max(self.max_depth, counters['max_depth'])
+        for name, seconds in counters['phase_time'].items():
+            self.phase_time[name] = self.phase_time.get(name, 0) + seconds
+
+    def conflict(self):
+        self.conflicts += 1
+        for hook in self.hooks['conflict']:
+            hook(self)
+        self.tick()
+
+    def phase(self, name, seconds):
+        '''Adds seconds spent in the named phase.'''
+        self.phase_time[name] = self.phase_time.get(name, 0) + seconds
+        for hook in self.hooks['phase']:
+            hook(self, name, seconds)
+
+    def report(self):
+        '''Prints a status line.'''
+        now = time.perf_counter()
+        if self.progress:
+            self.next_report = now + self.progress
+        print('[{:9.1f} s] decisions: {}, propagations: {}, conflicts: {}, pure literals: {}, flips: {}, max depth: {}'.format(
+            now - self.time_begin, self.decisions, self.propagations, self.conflicts, self.pure_literals, self.flips, self.max_depth),
+            file=self.out, flush=True)
+        for hook in self.hooks['progress']:
+            hook(self)
+
+    def finish(self):
+        '''Stops the clock at the end of the run.'''
+        self.seconds = time.perf_counter() - self.time_begin
+        for hook in self.hooks['finish']:
+            hook(self)
+
+    def as_dict(self):
+        return {'decisions' : self.decisions, 'propagations' : self.propagations, 'conflicts' : self.conflicts,
+                'pure_literals' : self.pure_literals, 'flips' : self.flips, 'max_depth' : self.max_depth,
+                'seconds' : self.seconds, 'phase_time' : dict(self.phase_time), 'reason' : self.reason}
+
+    def dump_json(self, file_name, **extra):
+        '''Writes the counters (and any extra fields) to a JSON file.'''
+        with open(file_name, 'w') as file_handle:
+            json.dump({**self.as_dict(), **extra}, file_handle, indent=1)
+
+    def format(self):
+        '''Returns the counters as printable lines.'''
+        phases = ', '.join('{}: {:f} s'.format(name, seconds) for name, seconds in sorted(self.phase_time.items()))
+        return ('Decisions: {}, propagations: {}, conflicts: {}, pure literals: {}, flips: {}, max depth: {}\n'
+                'Time per phase: {}').format(self.decisions, self.propagations, self.conflicts,
+                                             self.pure_literals, self.flips, self.max_depth, phases or '-')
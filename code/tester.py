@@ -1,15 +1,16 @@
 #!/usr/bin/python3
 
 import sys
-import solver
+from dimacs import FlatCNF, open_file
+from verify import verify, verify_file
 
 def vals_from_sol(sol_file_name):
-    '''Creates a value set from the solution file.
+    '''Creates a value set from the solution file, which may be compressed.
     :param sol_file_name - the solution file name
 
     :returns the set of integers representing this valuation
     '''
-    with open(sol_file_name, 'r') as s_file:
+    with open_file(sol_file_name, 'r') as s_file:
         content = s_file.read().strip()
         if content[0] == '0':
             return {}
@@ -18,22 +19,12 @@ def vals_from_sol(sol_file_name):
 
 def check_solution(cnf, vals):
     '''Verifies that the given valuation satisfies the formula.
+    A disjunction is only satisfied by a literal the valuation makes true.
     :param cnf - a list of sets (each set one disjunction)
     :param vals - the set representing the valuation
     '''
-    # go through each disjunction
-    for dis in cnf:
-        dis_flag = False
-        # scan each literal
-        for lit in dis:
-            # if one literal is correct, the whole disjunction is true -> break
-            if (-1)*lit not in vals:
-                dis_flag = True
-                break
-        # if one disjunction is false, the whole conjunction is false
-        if not dis_flag:
-            return False
-    return True
+    falsified, _ = verify(FlatCNF.from_sets(cnf), vals)
+    return not falsified
 
 def main(argv):
     '''Main body of the program. Gets automatically called if this script is called from the command line.
@@ -43,16 +34,21 @@ def main(argv):
         return
     problem_file_name = argv[1]
     solution_file_name = argv[2]
-    with open(problem_file_name, 'r') as p_file:
-        cnf = solver.parse_dimacs(p_file)
-        vals = vals_from_sol(solution_file_name)
-        if not vals:
-            print('Solution file claims unsatisfiability!')
-            return
-        if check_solution(cnf, vals):
-            print('This is a solution.')
-            return
-        print('This is NOT a solution.')
+    vals = vals_from_sol(solution_file_name)
+    if not vals:
+        print('Solution file claims unsatisfiability!')
+        return
+    # the problem file is streamed, so it does not have to fit in memory
+    falsified, unassigned = verify_file(problem_file_name, vals)
+    if unassigned:
+        print('{} variables are not assigned: {}'.format(len(unassigned), ' '.join(map(str, unassigned[:20]))
+                                                         + (' ...' if len(unassigned) > 20 else '')))
+    if not falsified:
+        print('This is a solution.')
+        return
+    print('This is NOT a solution.')
+    print('{} falsified clauses (numbered from 0): {}'.format(len(falsified), ' '.join(map(str, falsified[:20]))
+                                                             + (' ...' if len(falsified) > 20 else '')))
 
 if __name__ == '__main__':
     main(sys.argv)
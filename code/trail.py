@@ -0,0 +1,304 @@
+#!/usr/bin/python3
+
+import time
+
+from branching import make_heuristic
+
+def stats_phase(stats, name, mark):
+    '''Adds the time since mark to the named phase of stats and returns the new mark.'''
+    now = time.perf_counter()
+    stats.phase(name, now - mark)
+    return now
+
+class TrailSolver:
+    '''DPLL engine working on a single clause database and an assignment trail.
+
+    Unit propagation uses two watched literals per clause and backtracking
+    undoes assignments on the trail, so nothing is copied during search.
+    Literals are signed integers and every per-literal table is a list of
+    length 2*n_vars+1 indexed directly by the literal (negative literals
+    wrap around to the upper half of the list).
+    '''
+
+    default_branch = 'first'
+
+    def __init__(self, cnf, unit_prop=True, purelit_elim=True, branch=None, phase_saving=None):
+        '''Builds the clause database and the watch lists.
+        :param cnf - a list of sets (each set one disjunction)
+        :param unit_prop - flag to turn on/off unit propagation, True by default
+        :param purelit_elim - flag to turn on/off pure literal elimination (done once at the root), True by default
+        :param branch - name of the branching heuristic in branching.HEURISTICS, default_branch if None
+        :param phase_saving - flag to turn on/off phase saving, None for the heuristic's default
+        '''
+        self.unit_prop = unit_prop
+        self.purelit_elim = purelit_elim
+
+        self.n_vars = max((abs(lit) for dis in cnf for lit in dis), default=0)
+        size = 2 * self.n_vars + 1
+
+        self.value = [0] * size
+        self.watches = [[] for _ in range(size)]
+        self.level = [0] * (self.n_vars + 1)
+        self.reason = [None] * (self.n_vars + 1)
+
+        self.trail = []
+        self.trail_lim = []
+        self.qhead = 0
+
+        self.clauses = []
+        self.units = []
+        self.empty = False
+
+        # variables in order of first appearance
+        self.order = []
+        self.seen = [False] * (self.n_vars + 1)
+
+        self.decisions = 0
+        self.propagations = 0
+        self.conflicts = 0
+        # a stats.Stats object, set by the caller to instrument the search
+        self.stats = None
+
+        for dis in cnf:
+            self.add_input_clause(dis)
+
+        self.heuristic = make_heuristic(branch or self.default_branch, self, phase_saving)
+
+    def add_input_clause(self, dis):
+        '''Adds a clause of the original formula at decision level 0.
+        :param dis - an iterable of literals (one disjunction)
+
+        :returns the stored clause list, None if the clause is not stored
+        '''
+        lits = list(dict.fromkeys(dis))
+        for lit in lits:
+            var = abs(lit)
+            if not self.seen[var]:
+                self.seen[var] = True
+                self.order.append(var)
+        if any(-lit in lits for lit in lits if lit > 0):
+            return None
+        if not lits:
+            self.empty = True
+            return None
+        if len(lits) == 1:
+            self.units.append(lits[0])
+            return None
+        self.watches[lits[0]].append(lits)
+        self.watches[lits[1]].append(lits)
+        self.clauses.append(lits)
+        return lits
+
+    def grow(self, n_vars):
+        '''Makes room for the variables up to n_vars, all unassigned.
+        The literal indexed tables are rebuilt since negative literals are
+        stored at the end.
+        '''
+        if n_vars <= self.n_vars:
+            return
+        size = 2 * n_vars + 1
+        value = [0] * size
+        watches = [[] for _ in range(size)]
+        for lit in range(-self.n_vars, self.n_vars + 1):
+            value[lit] = self.value[lit]
+            watches[lit] = self.watches[lit]
+        self.value = value
+        self.watches = watches
+        extra = n_vars - self.n_vars
+        self.level.extend([0] * extra)
+        self.reason.extend([None] * extra)
+        self.seen.extend([False] * extra)
+        self.n_vars = n_vars
+        self.heuristic.grow(n_vars)
+
+    def enqueue(self, lit, reason=None):
+        '''Assigns lit True at the current decision level and pushes it on the trail.'''
+        var = abs(lit)
+        self.value[lit] = 1
+        self.value[-lit] = -1
+        self.level[var] = len(self.trail_lim)
+        self.reason[var] = reason
+        self.trail.append(lit)
+
+    def new_decision_level(self):
+        self.heuristic.new_level()
+        self.trail_lim.append(len(self.trail))
+
+    def decision_level(self):
+        return len(self.trail_lim)
+
+    def backtrack(self, level):
+        '''Undoes all assignments made above the given decision level.'''
+        if len(self.trail_lim) <= level:
+            return
+        value = self.value
+        reason = self.reason
+        lim = self.trail_lim[level]
+        undone = self.trail[lim:]
+        for lit in undone:
+            value[lit] = 0
+            value[-lit] = 0
+            reason[abs(lit)] = None
+        self.heuristic.backtrack(level, undone)
+        del self.trail[lim:]
+        del self.trail_lim[level:]
+        self.qhead = len(self.trail)
+
+    def propagate(self):
+        '''Runs unit propagation over the watch lists for all literals not yet processed on the trail.
+
+        :returns the conflicting clause, None if there is no conflict
+        '''
+        value = self.value
+        watches = self.watches
+        trail = self.trail
+        unit_prop = self.unit_prop
+        while self.qhead < len(trail):
+            false_lit = -trail[self.qhead]
+            self.qhead += 1
+            ws = watches[false_lit]
+            n = len(ws)
+            i = j = 0
+            while i < n:
+                clause = ws[i]
+                i += 1
+                # keep the falsified watch in the second position
+                if clause[0] == false_lit:
+                    clause[0] = clause[1]
+                    clause[1] = false_lit
+                first = clause[0]
+                if value[first] == 1:
+                    ws[j] = clause
+                    j += 1
+                    continue
+                # look for a replacement watch
+                for k in range(2, len(clause)):
+                    lit = clause[k]
+                    if value[lit] != -1:
+                        clause[1] = lit
+                        clause[k] = false_lit
+                        watches[lit].append(clause)
+                        break
+                else:
+                    ws[j] = clause
+                    j += 1
+                    if value[first] == -1:
+                        # conflict, keep the remaining watches untouched
+                        while i < n:
+                            ws[j] = ws[i]
+                            j += 1
+                            i += 1
+                        del ws[j:]
+                        self.qhead = len(trail)
+                        self.conflicts += 1
+                        return clause
+                    if unit_prop and value[first] == 0:
+                        self.enqueue(first, clause)
+                        self.propagations += 1
+            del ws[j:]
+        return None
+
+    def pure_literals(self):
+        '''Finds the pure literals of the clauses not yet satisfied at the root.
+
+        :returns a list of pure literals
+        '''
+        value = self.value
+        signed_literals = set()
+        for clause in self.clauses:
+            if any(value[lit] == 1 for lit in clause):
+                continue
+            signed_literals.update(lit for lit in clause if value[lit] == 0)
+        return [lit for lit in signed_literals if -lit not in signed_literals]
+
+    def pick_branch_lit(self):
+        '''Asks the branching heuristic for the next decision.
+
+        :returns the literal to branch on, 0 if there is nothing left to branch on
+        '''
+        return self.heuristic.pick()
+
+    def simplify_root(self):
+        '''Assigns unit clauses (and pure literals) at decision level 0.
+
+        :returns False if the formula is found unsatisfiable, True otherwise
+        '''
+        if self.empty:
+            return False
+        for lit in self.units:
+            if self.value[lit] == -1:
+                return False
+            if self.value[lit] == 0:
+                self.enqueue(lit)
+        if self.propagate() is not None:
+            return False
+        if self.purelit_elim:
+            pure_literals = [lit for lit in self.pure_literals() if self.value[lit] == 0]
+            for lit in pure_literals:
+                self.enqueue(lit)
+            if self.stats is not None:
+                self.stats.pure_literals += len(pure_literals)
+            if self.propagate() is not None:
+                return False
+        return True
+
+    def model(self):
+        '''Returns the current assignment as a dictionary of the variables of the formula.
+
+        Variables left unassigned once every clause is satisfied are set to False.
+        '''
+        value = self.value
+        return {var : value[var] == 1 for var in self.order}
+
+    def solve(self):
+        '''Chronological DPLL search over the trail.
+
+        :returns sat - boolean denoting the satisfiability of the formula
+        :returns vals - a dictionary containing one satisfiable valuation, None if sat is False
+        '''
+        if not self.simplify_root():
+            return False, None
+
+        # flipped[d] tells whether the decision of level d+1 is already the second branch
+        flipped = []
+        stats = self.stats
+        if stats is not None:
+            mark = time.perf_counter()
+        while True:
+            conflict = self.propagate()
+            if stats is not None:
+                mark = stats_phase(stats, 'propagate', mark)
+                stats.propagations = self.propagations
+                stats.tick()
+            if conflict is not None:
+                if stats is not None:
+                    stats.conflict()
+                for lit in conflict:
+                    self.heuristic.bump(abs(lit))
+                self.heuristic.decay()
+                while flipped and flipped[-1]:
+                    flipped.pop()
+                    self.backtrack(len(flipped))
+                if not flipped:
+                    self.backtrack(0)
+                    return False, None
+                lit = self.trail[self.trail_lim[-1]]
+                flipped.pop()
+                self.backtrack(len(flipped))
+                self.new_decision_level()
+                flipped.append(True)
+                self.enqueue(-lit)
+                if stats is not None:
+                    mark = stats_phase(stats, 'backtrack', mark)
+                continue
+
+            lit = self.pick_branch_lit()
+            if lit == 0:
+                return True, self.model()
+            self.decisions += 1
+            self.new_decision_level()
+            flipped.append(False)
+            self.enqueue(lit)
+            if stats is not None:
+                stats.decision(self.decision_level())
+                mark = stats_phase(stats, 'branching', mark)
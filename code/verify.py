@@ -0,0 +1,142 @@
+#!/usr/bin/python3
+
+from array import array
+from bisect import bisect_right
+
+from dimacs import FlatCNF, stream_dimacs, is_binary, load_binary, open_file
+
+# NumPy is optional, without it the same checks run in pure Python
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# number of literals checked in one vectorized pass
+CHUNK_LITERALS = 1 << 22
+
+class Assignment:
+    '''A valuation stored as one value per variable: 1 true, -1 false, 0 unassigned.'''
+
+    def __init__(self, vals, n_vars=0):
+        '''
+        :param vals - a dictionary {variable : boolean} (as returned by dpll) or an iterable of signed literals (as in solution files)
+        :param n_vars - number of variables of the formula, the largest assigned variable if smaller
+        '''
+        if isinstance(vals, dict):
+            pairs = [(var, 1 if val else -1) for var, val in vals.items()]
+        else:
+            pairs = [(abs(lit), 1 if lit > 0 else -1) for lit in vals]
+        size = max(n_vars, max((var for var, _ in pairs), default=0)) + 1
+        self.values = array('b', bytes(size))
+        for var, val in pairs:
+            self.values[var] = val
+        self.array = np.frombuffer(self.values, dtype=np.int8) if np is not None else None
+
+    def grow(self, n_vars):
+        '''Makes room for the variables up to n_vars (unassigned).'''
+        if n_vars >= len(self.values):
+            # the NumPy view has to go before the array can be resized
+            self.array = None
+            self.values.extend(bytes(n_vars + 1 - len(self.values)))
+            if np is not None:
+                self.array = np.frombuffer(self.values, dtype=np.int8)
+
+
+def check_chunk_numpy(flat, assignment):
+    '''Checks the clauses of a FlatCNF with a few vectorized passes.
+
+    :returns falsified - array of the indices of falsified clauses
+    :returns unassigned - array of the unassigned variables occurring in them
+    '''
+    lits = np.frombuffer(flat.lits, dtype=np.int32)
+    offsets = np.frombuffer(flat.offsets, dtype=np.int64)
+    starts, ends = offsets[:-1], offsets[1:]
+    if not len(lits):
+        return np.arange(len(starts)), np.empty(0, dtype=np.int64)
+
+    variables = np.abs(lits)
+    lit_values = assignment.array[variables]
+    true_lits = (lit_values * np.sign(lits).astype(np.int8)) == 1
+    # a trailing false entry keeps the starts of empty clauses at the end valid; empty clauses are falsified
+    satisfied = np.maximum.reduceat(np.append(true_lits.view(np.int8), np.int8(0)), starts)
+    satisfied[starts == ends] = 0
+    return np.flatnonzero(satisfied == 0), np.unique(variables[lit_values == 0])
+
+def check_chunk_python(flat, assignment):
+    '''Pure Python version of check_chunk_numpy.'''
+    values = assignment.values
+    lits = flat.lits
+    offsets = flat.offsets
+    falsified = []
+    unassigned = set()
+    for i in range(len(offsets) - 1):
+        satisfied = False
+        for lit in lits[offsets[i]:offsets[i + 1]]:
+            value = values[abs(lit)]
+            if value == 0:
+                unassigned.add(abs(lit))
+            elif (value == 1) == (lit > 0):
+                satisfied = True
+        if not satisfied:
+            falsified.append(i)
+    return falsified, sorted(unassigned)
+
+def check_flat(flat, assignment, base=0):
+    '''Checks a FlatCNF in slices of about CHUNK_LITERALS literals.
+    :param flat - a FlatCNF
+    :param assignment - an Assignment
+    :param base - index of the first clause of flat in the whole formula
+
+    :returns falsified - list of the indices (from 0) of falsified clauses
+    :returns unassigned - set of the unassigned variables occurring in the formula
+    '''
+    assignment.grow(flat.n_vars)
+    check_chunk = check_chunk_numpy if np is not None else check_chunk_python
+    falsified = []
+    unassigned = set()
+    offsets = flat.offsets
+    first = 0
+    while first < len(flat):
+        # clauses first..last-1 hold at most CHUNK_LITERALS literals (or are a single longer clause)
+        last = max(first + 1, bisect_right(offsets, offsets[first] + CHUNK_LITERALS) - 1)
+        lo, hi = offsets[first], offsets[last]
+        chunk_offsets = array('q', (offset - lo for offset in offsets[first:last + 1]))
+        chunk_falsified, chunk_unassigned = check_chunk(FlatCNF(flat.lits[lo:hi], chunk_offsets, 0), assignment)
+        falsified.extend(int(idx) + base + first for idx in chunk_falsified)
+        unassigned.update(int(var) for var in chunk_unassigned)
+        first = last
+    return falsified, unassigned
+
+def verify(flats, vals, n_vars=0):
+    '''Verifies a valuation against a formula given as one or more FlatCNF pieces.
+    :param flats - a FlatCNF or an iterable of FlatCNF objects holding consecutive clauses
+    :param vals - a dictionary {variable : boolean} or an iterable of signed literals
+    :param n_vars - number of variables of the formula, 0 if unknown
+
+    :returns falsified - list of the indices (from 0) of falsified clauses, empty if vals is a solution
+    :returns unassigned - sorted list of the variables of the formula vals does not assign
+    '''
+    if isinstance(flats, FlatCNF):
+        flats = [flats]
+    assignment = Assignment(vals, n_vars)
+    falsified = []
+    unassigned = set()
+    base = 0
+    for flat in flats:
+        flat_falsified, flat_unassigned = check_flat(flat, assignment, base)
+        falsified.extend(flat_falsified)
+        unassigned.update(flat_unassigned)
+        base += len(flat)
+    return falsified, sorted(unassigned)
+
+def verify_file(file_name, vals, chunk_size=1 << 24):
+    '''Verifies a valuation against a DIMACS file streamed in chunks, so the file may be bigger than memory.
+    A compressed file is decompressed while it is streamed, and a binary CNF
+    file (see dimacs.load_cnf) is mapped into memory instead.
+
+    :returns falsified, unassigned - see verify
+    '''
+    if is_binary(file_name):
+        return verify(load_binary(file_name), vals)
+    with open_file(file_name, 'rb') as file_handle:
+        return verify(stream_dimacs(file_handle, chunk_size), vals)